@@ -0,0 +1,349 @@
+# core/control_charts.py
+# Cartas de controle incrementais para recuperações de QC (Ítrio e demais surrogates)
+# - Uma carta por (equipamento, método, surrogate)
+# - Média e variância acumuladas (Welford) + estado das regras de Westgard
+# - Atualização em O(pontos novos) a cada lote, sem reler o histórico
+# - Estado compacto em JSON (uma lista curta de números por carta)
+# - A tabela avaliada de cada lote incorporado fica no estado: reavaliar o lote a devolve igual
+# - Gravação com trava de arquivo (interface e serviço de ingestão podem dividir o estado)
+
+import json
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import numpy as np
+import pandas as pd
+
+
+CHART_STATE_PATH = Path("estado/cartas_controle.json")
+STATE_VERSION = 1
+
+# Pontos necessários antes de aplicar as regras (fase de formação da carta)
+MIN_POINTS = 10
+
+# Lotes incorporados lembrados (reavaliar um lote não conta os pontos de novo)
+MAX_LOTS = 2000
+
+# Colunas opcionais que identificam o equipamento (repassadas por core.qc.evaluate_qc)
+INSTRUMENT_COLS = ["Equipamento", "Instrumento"]
+
+# Regras de Westgard
+RULE_1_2S = "1-2s"     # alerta: ponto além de ±2s
+RULE_1_3S = "1-3s"     # ponto além de ±3s
+RULE_2_2S = "2-2s"     # 2 pontos seguidos além de 2s do mesmo lado
+RULE_R_4S = "R-4s"     # diferença entre pontos seguidos maior que 4s
+RULE_4_1S = "4-1s"     # 4 pontos seguidos além de 1s do mesmo lado
+RULE_10X = "10x"       # 10 pontos seguidos do mesmo lado da média
+RULE_7T = "7T"         # 7 pontos seguidos em tendência (subindo ou descendo)
+
+REJECTION_RULES = [RULE_1_3S, RULE_2_2S, RULE_R_4S, RULE_4_1S, RULE_10X, RULE_7T]
+
+# Campos de cada carta no arquivo (ordem fixa)
+_FIELDS = ["n", "mean", "m2", "last_z", "last_val", "run_1s", "run_mean", "run_trend", "ultimo_lote"]
+
+# Campos de cada ponto avaliado guardado por lote (ordem fixa)
+_POINT_FIELDS = ["Id", "Equipamento", "Método de Análise", "Regra", "Recuperação (%)", "n", "Média", "DP", "z", "Regras"]
+
+_LOCK = threading.Lock()
+
+log = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------
+# Estado persistente
+# ---------------------------------------------------------
+
+def empty_state():
+    return {"versao": STATE_VERSION, "lotes": [], "cartas": {}, "pontos": {}}
+
+
+def chart_key(instrument, method, surrogate) -> str:
+    return "|".join(str(p or "").strip() for p in (instrument, method, surrogate))
+
+
+def _set_aside(path, reason):
+    """Move um estado ilegível para <nome>.<data>.bak, para a próxima gravação não apagar o histórico."""
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    bak = path.with_name(f"{path.name}.{stamp}.bak")
+    i = 1
+    while bak.exists():
+        bak = path.with_name(f"{path.name}.{stamp}-{i}.bak")
+        i += 1
+    path.replace(bak)
+    log.warning("Estado das cartas de controle %s (%s): movido para %s; cartas reiniciadas", path, reason, bak)
+
+
+def load_chart_state(path=CHART_STATE_PATH):
+    """
+    Lê o estado gravado. Um arquivo corrompido ou de outra versão é movido para
+    .bak (nunca sobrescrito) e as cartas recomeçam vazias.
+    """
+    path = Path(path)
+    if not path.exists():
+        return empty_state()
+    try:
+        raw = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        _set_aside(path, f"ilegível: {e}")
+        return empty_state()
+    if not isinstance(raw, dict) or raw.get("versao") != STATE_VERSION:
+        versao = raw.get("versao") if isinstance(raw, dict) else None
+        _set_aside(path, f"versão {versao!r}, esperada {STATE_VERSION}")
+        return empty_state()
+    return {
+        "versao": STATE_VERSION,
+        "lotes": list(raw.get("lotes", [])),
+        "cartas": {k: dict(zip(_FIELDS, v)) for k, v in raw.get("cartas", {}).items()},
+        "pontos": dict(raw.get("pontos", {})),
+    }
+
+
+def save_chart_state(state, path=CHART_STATE_PATH):
+    """Grava o estado de forma atômica (arquivo temporário + rename)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = {
+        "versao": STATE_VERSION,
+        "lotes": state["lotes"][-MAX_LOTS:],
+        "cartas": {k: [c[f] for f in _FIELDS] for k, c in state["cartas"].items()},
+        "pontos": state.get("pontos", {}),
+    }
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+    tmp.replace(path)
+
+
+@contextmanager
+def _file_lock(path):
+    """Trava exclusiva entre processos (<estado>.lock) para o ciclo ler-atualizar-gravar."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_name(path.name + ".lock"), "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _new_chart():
+    return {"n": 0, "mean": 0.0, "m2": 0.0, "last_z": None, "last_val": None,
+            "run_1s": 0, "run_mean": 0, "run_trend": 0, "ultimo_lote": ""}
+
+
+def chart_sd(chart):
+    return math.sqrt(chart["m2"] / (chart["n"] - 1)) if chart["n"] > 1 else float("nan")
+
+
+# ---------------------------------------------------------
+# Atualização ponto a ponto
+# ---------------------------------------------------------
+
+def _run(prev, up, down):
+    """Sequência com sinal: cresce enquanto o lado se mantém, reinicia ao trocar."""
+    if up:
+        return prev + 1 if prev > 0 else 1
+    if down:
+        return prev - 1 if prev < 0 else -1
+    return 0
+
+
+def _push(chart, x, lote):
+    """
+    Avalia x contra a carta (estatística anterior ao ponto) e atualiza o estado.
+    Retorna (média, dp, z, regras violadas).
+    """
+    mean, sd = chart["mean"], chart_sd(chart)
+    ready = chart["n"] >= MIN_POINTS and sd > 0
+    z = (x - mean) / sd if ready else None
+    rules = []
+
+    last_val = chart["last_val"]
+    chart["run_trend"] = _run(
+        chart["run_trend"],
+        last_val is not None and x > last_val,
+        last_val is not None and x < last_val,
+    )
+
+    if ready:
+        last_z = chart["last_z"]
+        chart["run_1s"] = _run(chart["run_1s"], z > 1, z < -1)
+        chart["run_mean"] = _run(chart["run_mean"], z > 0, z < 0)
+
+        if abs(z) > 3:
+            rules.append(RULE_1_3S)
+        if last_z is not None:
+            if abs(z) > 2 and abs(last_z) > 2 and z * last_z > 0:
+                rules.append(RULE_2_2S)
+            if abs(z - last_z) > 4:
+                rules.append(RULE_R_4S)
+        if abs(chart["run_1s"]) >= 4:
+            rules.append(RULE_4_1S)
+        if abs(chart["run_mean"]) >= 10:
+            rules.append(RULE_10X)
+        if abs(chart["run_trend"]) >= 6:
+            rules.append(RULE_7T)
+        if not rules and abs(z) > 2:
+            rules.append(RULE_1_2S)
+    else:
+        chart["run_1s"] = 0
+        chart["run_mean"] = 0
+
+    chart["last_z"] = z
+    chart["last_val"] = x
+    chart["ultimo_lote"] = lote
+
+    # Pontos 1-3s não entram na média/variância (não deslocam os limites)
+    if RULE_1_3S not in rules:
+        chart["n"] += 1
+        delta = x - chart["mean"]
+        chart["mean"] += delta / chart["n"]
+        chart["m2"] += delta * (x - chart["mean"])
+
+    return mean if ready else None, sd if ready else None, z, rules
+
+
+def chart_points(qc_df, instrument=""):
+    """
+    Pontos de carta a partir da tabela de core.qc.evaluate_qc
+    (um por recuperação válida, na ordem do lote).
+    """
+    if qc_df is None or qc_df.empty:
+        return pd.DataFrame(columns=["Id", "Equipamento", "Método de Análise", "Regra", "Recuperação (%)"])
+
+    col = next((c for c in INSTRUMENT_COLS if c in qc_df.columns), None)
+    equip = qc_df[col].fillna(instrument).astype(str) if col else pd.Series(instrument, index=qc_df.index)
+
+    pts = pd.DataFrame({
+        "Id": qc_df["Id"].to_numpy(),
+        "Equipamento": equip.to_numpy(),
+        "Método de Análise": qc_df["Método de Análise"].to_numpy(),
+        "Regra": qc_df["Regra"].to_numpy(),
+        "Recuperação (%)": pd.to_numeric(qc_df["Recuperação (%)"], errors="coerce").to_numpy(dtype=float),
+    })
+    return pts[pts["Recuperação (%)"].notna()].reset_index(drop=True)
+
+
+def _py(v):
+    """Valor JSON-serializável (escalares numpy viram tipos Python)."""
+    return v.item() if isinstance(v, np.generic) else v
+
+
+def _evaluated(lote, records):
+    """Tabela de pontos avaliados a partir dos registros (_POINT_FIELDS)."""
+    out = pd.DataFrame(records, columns=_POINT_FIELDS)
+    rules = [list(r) for r in out.pop("Regras")]
+    out.insert(0, "Lote", lote)
+    out["Regras violadas"] = [", ".join(r) for r in rules]
+
+    rej = np.array([any(x in REJECTION_RULES for x in r) for r in rules], dtype=bool)
+    alert = np.array([RULE_1_2S in r for r in rules], dtype=bool)
+    forming = out["z"].isna().to_numpy(dtype=bool)
+
+    out["Status"] = np.select([forming, rej, alert], ["Sem dados", "NÃO CONFORME", "ATENÇÃO"], default="OK")
+    out["Observação"] = np.select(
+        [forming, rej, alert],
+        [f"Carta em formação (mínimo {MIN_POINTS} pontos)", "Violação de regra de Westgard", "Alerta 1-2s"],
+        default="",
+    )
+    return out
+
+
+def update_control_charts(qc_df, lote="", instrument="", state=None, path=CHART_STATE_PATH, commit=True):
+    """
+    Incorpora os pontos de QC de um lote às cartas e avalia as regras de Westgard.
+    state=None: lê e grava o arquivo em `path` (com trava de arquivo); com state,
+    atualiza só em memória.
+    commit=False: prévia — avalia contra as cartas atuais sem alterá-las.
+    A tabela avaliada de um lote incorporado fica guardada no estado: avaliações
+    posteriores do mesmo lote devolvem essa tabela, sem empurrar os pontos de novo.
+    Retorna a tabela de pontos avaliados.
+    """
+    pts = chart_points(qc_df, instrument)
+    persist = state is None
+
+    with _LOCK, (_file_lock(path) if persist and commit else nullcontext()):
+        state = load_chart_state(path) if persist else state
+        state.setdefault("pontos", {})
+
+        saved = state["pontos"].get(lote) if lote else None
+        if saved is not None:
+            return _evaluated(lote, saved)
+
+        # Prévia, ou lote incorporado por um estado anterior sem a tabela guardada:
+        # avalia em cópias das cartas
+        read_only = not commit or (bool(lote) and lote in state["lotes"])
+        cartas = state["cartas"]
+        scratch = {}
+        records = []
+        for e, m, r, i, x in zip(pts["Equipamento"], pts["Método de Análise"], pts["Regra"],
+                                 pts["Id"], pts["Recuperação (%)"].to_numpy()):
+            key = chart_key(e, m, r)
+            if read_only:
+                chart = scratch.setdefault(key, dict(cartas.get(key) or _new_chart()))
+            else:
+                chart = cartas.setdefault(key, _new_chart())
+            mean, sd, z, rules = _push(chart, float(x), lote)
+            records.append([_py(i), e, m, r, float(x), chart["n"], mean, sd, z, list(rules)])
+
+        if not read_only and lote:
+            state["lotes"].append(lote)
+            state["pontos"][lote] = records
+            del state["lotes"][:-MAX_LOTS]
+            keep = set(state["lotes"])
+            for old in [k for k in state["pontos"] if k not in keep]:
+                del state["pontos"][old]
+        if persist and not read_only and len(pts):
+            save_chart_state(state, path)
+
+    return _evaluated(lote, records)
+
+
+def is_incorporated(lote, path=CHART_STATE_PATH) -> bool:
+    """True se o lote já foi incorporado às cartas gravadas em `path`."""
+    return bool(lote) and lote in load_chart_state(path)["lotes"]
+
+
+def chart_summary(state):
+    """Uma linha por carta: n, média, DP e limites de alerta (±2s) e controle (±3s)."""
+    rows = []
+    for key, c in state["cartas"].items():
+        equip, metodo, regra = (key.split("|") + ["", "", ""])[:3]
+        sd = chart_sd(c)
+        rows.append({
+            "Equipamento": equip,
+            "Método de Análise": metodo,
+            "Regra": regra,
+            "n": c["n"],
+            "Média": c["mean"] if c["n"] else float("nan"),
+            "DP": sd,
+            "LIC (-3s)": c["mean"] - 3 * sd,
+            "LIA (-2s)": c["mean"] - 2 * sd,
+            "LSA (+2s)": c["mean"] + 2 * sd,
+            "LSC (+3s)": c["mean"] + 3 * sd,
+            "Último lote": c["ultimo_lote"],
+        })
+    return pd.DataFrame(rows)
@@ -0,0 +1,369 @@
+# core/cross_rules.py
+# Regras de consistência entre analitos sobre a matriz Id × (analito, fração)
+# - Expressões como "[cromo:T] >= [cromo hexavalente] + [cromo trivalente]"
+# - Compiladas uma vez em operações de array (aritmética de intervalos)
+# - Valores <LQ entram como o intervalo [0, LQ]: a regra só é decidida quando
+#   o resultado vale para qualquer valor real abaixo do LQ; senão, INCONCLUSIVO
+# - Modelos com "*" expandem para cada analito que tem as frações referenciadas
+# - Regras que não se aplicam a nenhum Id do lote são relatadas como "Não aplicada"
+
+import ast
+import re
+
+import numpy as np
+import pandas as pd
+
+from .matrix import FRAC_DISS, FRAC_TOT, FRAC_OUTRO, analyte_base
+from .normalize import normalize_analito
+
+
+# Cada regra:
+#   - nome: rótulo exibido
+#   - expr: expressão com referências [analito:fração]; fração D ou T
+#     (omitida: Total se houver, senão Dissolvido); funções abs, max, min
+#   - status: status quando a regra é violada (padrão "Não conforme")
+# Cr VI e Cr III vêm de métodos específicos (fração "" na matriz): sem fração fixa
+DEFAULT_CROSS_RULES = [
+    {"nome": "Cr VI ≤ Cr total", "expr": "[cromo hexavalente] <= [cromo:T]"},
+    {"nome": "Cr VI + Cr III ≈ Cr total",
+     "expr": "abs([cromo hexavalente] + [cromo trivalente] - [cromo:T]) <= 0.1 * [cromo:T]",
+     "status": "ATENÇÃO"},
+    {"nome": "Dissolvido ≤ Total (+10%)", "expr": "[*:D] <= 1.1 * [*:T]"},
+]
+
+STATUS_OK = "Conforme"
+STATUS_FAIL = "Não conforme"
+STATUS_UNK = "INCONCLUSIVO"
+STATUS_NA = "Não aplicada"
+
+# Códigos da matriz de resultados
+RES_NA = 0      # regra não aplicável (referência ausente)
+RES_OK = 1
+RES_FAIL = 2
+RES_UNK = 3
+
+_REF = re.compile(r"\[([^\[\]:]+)(?::\s*([A-Za-z]*))?\s*\]")
+
+_FUNCS = {"abs", "max", "min"}
+
+
+class RuleError(ValueError):
+    """Expressão de regra inválida."""
+
+
+# ---------------------------------------------------------
+# Aritmética de intervalos (arrays lo/hi)
+# ---------------------------------------------------------
+
+def _add(a, b):
+    return a[0] + b[0], a[1] + b[1]
+
+
+def _sub(a, b):
+    return a[0] - b[1], a[1] - b[0]
+
+
+def _mul(a, b):
+    p = np.stack([a[0] * b[0], a[0] * b[1], a[1] * b[0], a[1] * b[1]])
+    return p.min(axis=0), p.max(axis=0)
+
+
+def _div(a, b):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        inv = (1.0 / b[1], 1.0 / b[0])
+        lo, hi = _mul(a, inv)
+    zero = (b[0] <= 0) & (b[1] >= 0)
+    return np.where(zero, -np.inf, lo), np.where(zero, np.inf, hi)
+
+
+def _neg(a):
+    return -a[1], -a[0]
+
+
+def _abs(a):
+    lo = np.where(a[0] >= 0, a[0], np.where(a[1] <= 0, -a[1], 0.0))
+    return lo, np.maximum(np.abs(a[0]), np.abs(a[1]))
+
+
+def _max(*xs):
+    return np.maximum.reduce([x[0] for x in xs]), np.maximum.reduce([x[1] for x in xs])
+
+
+def _min(*xs):
+    return np.minimum.reduce([x[0] for x in xs]), np.minimum.reduce([x[1] for x in xs])
+
+
+# Comparações: (certamente verdadeiro, certamente falso)
+def _lt(a, b):
+    return a[1] < b[0], a[0] >= b[1]
+
+
+def _le(a, b):
+    return a[1] <= b[0], a[0] > b[1]
+
+
+_BIN = {ast.Add: _add, ast.Sub: _sub, ast.Mult: _mul, ast.Div: _div}
+_CMP = {
+    ast.Lt: _lt,
+    ast.LtE: _le,
+    ast.Gt: lambda a, b: _lt(b, a),
+    ast.GtE: lambda a, b: _le(b, a),
+}
+
+
+# ---------------------------------------------------------
+# Compilação
+# ---------------------------------------------------------
+
+def parse_refs(expr):
+    """Referências (analito normalizado, fração) na ordem em que aparecem."""
+    refs = []
+    for m in _REF.finditer(expr):
+        anal = m.group(1).strip()
+        frac = (m.group(2) or "").strip().upper()
+        if frac not in (FRAC_DISS, FRAC_TOT, FRAC_OUTRO):
+            raise RuleError(f"Fração inválida '{m.group(2)}' em '{expr}' (use D ou T).")
+        base = anal if anal == "*" else analyte_base(normalize_analito(anal))
+        refs.append((base, frac))
+    return refs
+
+
+def _compile_node(node, slots):
+    """Converte o nó da AST em uma função (lo, hi) -> intervalo ou (verdadeiro, falso)."""
+    if isinstance(node, ast.Expression):
+        return _compile_node(node.body, slots)
+
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        c = float(node.value)
+        return lambda lo, hi: (c, c)
+
+    if isinstance(node, ast.Name) and node.id in slots:
+        j = slots[node.id]
+        return lambda lo, hi: (lo[:, j], hi[:, j])
+
+    if isinstance(node, ast.BinOp) and type(node.op) in _BIN:
+        op = _BIN[type(node.op)]
+        a, b = _compile_node(node.left, slots), _compile_node(node.right, slots)
+        return lambda lo, hi: op(a(lo, hi), b(lo, hi))
+
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        a = _compile_node(node.operand, slots)
+        return lambda lo, hi: _neg(a(lo, hi))
+
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        a = _compile_node(node.operand, slots)
+        return lambda lo, hi: tuple(reversed(a(lo, hi)))
+
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in _FUNCS and not node.keywords:
+        args = [_compile_node(x, slots) for x in node.args]
+        if node.func.id == "abs":
+            if len(args) != 1:
+                raise RuleError("abs() recebe um argumento.")
+            return lambda lo, hi: _abs(args[0](lo, hi))
+        fn = _max if node.func.id == "max" else _min
+        return lambda lo, hi: fn(*[f(lo, hi) for f in args])
+
+    if isinstance(node, ast.Compare) and all(type(o) in _CMP for o in node.ops):
+        # Comparação encadeada (a <= b <= c) vira conjunção
+        terms = [_compile_node(x, slots) for x in [node.left] + node.comparators]
+        ops = [_CMP[type(o)] for o in node.ops]
+
+        def cmp(lo, hi):
+            vals = [t(lo, hi) for t in terms]
+            t_all, f_any = None, None
+            for op, a, b in zip(ops, vals, vals[1:]):
+                t, f = op(a, b)
+                t_all = t if t_all is None else t_all & t
+                f_any = f if f_any is None else f_any | f
+            return t_all, f_any
+
+        return cmp
+
+    if isinstance(node, ast.BoolOp):
+        parts = [_compile_node(x, slots) for x in node.values]
+        is_and = isinstance(node.op, ast.And)
+
+        def boolop(lo, hi):
+            res = [p(lo, hi) for p in parts]
+            ts = np.logical_and.reduce if is_and else np.logical_or.reduce
+            fs = np.logical_or.reduce if is_and else np.logical_and.reduce
+            return ts([r[0] for r in res]), fs([r[1] for r in res])
+
+        return boolop
+
+    raise RuleError(f"Construção não suportada na regra: {ast.dump(node)[:60]}")
+
+
+def compile_rule(rule, cols):
+    """
+    Compila uma regra para as colunas de uma matriz (core.matrix.build_matrix).
+    Modelos com "*" geram uma regra por analito que tem todas as frações referenciadas.
+    Retorna lista de regras compiladas {nome, expr, status, cols, fn}
+    (vazia quando falta alguma referência no lote).
+    """
+    expr = rule["expr"]
+    refs = parse_refs(expr)
+    if not refs:
+        raise RuleError(f"Regra sem referências [analito:fração]: '{expr}'.")
+
+    col_index = {k: j for j, k in enumerate(cols)}
+
+    # Corpo da expressão com as referências trocadas por nomes (_r0, _r1, ...)
+    slots = {}
+    counter = iter(range(len(refs)))
+
+    def _slot(m):
+        name = f"_r{next(counter)}"
+        slots[name] = len(slots)
+        return name
+
+    body = _REF.sub(_slot, expr)
+    try:
+        tree = ast.parse(body.strip(), mode="eval")
+    except SyntaxError as e:
+        raise RuleError(f"Expressão inválida '{expr}': {e.msg}") from e
+    fn = _compile_node(tree, slots)
+
+    if any(a == "*" for a, _ in refs):
+        analitos = sorted({a for a, _ in cols})
+    else:
+        analitos = [None]
+
+    nome = rule.get("nome") or expr
+    compiled = []
+    for anal in analitos:
+        keys = [_resolve(anal if a == "*" else a, f, col_index) for a, f in refs]
+        if any(k is None for k in keys):
+            continue
+        compiled.append({
+            "nome": nome if anal is None else f"{nome} ({anal})",
+            "expr": expr if anal is None else _REF.sub(lambda m: m.group(0).replace("*", anal), expr),
+            "status": rule.get("status", STATUS_FAIL),
+            "cols": np.array([col_index[k] for k in keys], dtype=np.int64),
+            "fn": fn,
+        })
+    return compiled
+
+
+def _resolve(anal, frac, col_index):
+    """Coluna de uma referência; sem fração: Total, senão Dissolvido, senão sem fração."""
+    fracs = [frac] if frac else [FRAC_TOT, FRAC_DISS, FRAC_OUTRO]
+    return next(((anal, f) for f in fracs if (anal, f) in col_index), None)
+
+
+def compile_rules(rules, cols):
+    """Compila todas as regras; cada regra compilada guarda em "regra" o índice da regra de origem."""
+    out = []
+    for i, r in enumerate(rules):
+        for c in compile_rule(r, cols):
+            c["regra"] = i
+            out.append(c)
+    return out
+
+
+def _not_applied_reason(rule, cols):
+    """Motivo de uma regra não se aplicar: referências sem coluna na matriz, ou nenhum Id com todas."""
+    refs = parse_refs(rule["expr"])
+    col_index = {k: j for j, k in enumerate(cols)}
+    if any(a == "*" for a, _ in refs):
+        fracs = sorted({f for _, f in refs})
+        if not any(all((a, f) in col_index for f in fracs) for a, _ in cols):
+            return "Nenhum analito com todas as frações referenciadas"
+        return "Nenhum Id com todas as referências"
+    missing = [f"[{a}:{f}]" if f else f"[{a}]" for a, f in refs if _resolve(a, f, col_index) is None]
+    if missing:
+        return "Referência ausente no lote: " + ", ".join(missing)
+    return "Nenhum Id com todas as referências"
+
+
+# ---------------------------------------------------------
+# Avaliação
+# ---------------------------------------------------------
+
+def evaluate_rules(matrix, rules=None):
+    """
+    Avalia as regras sobre a matriz do lote.
+    Retorna (regras compiladas, códigos [n_ids × n_regras] com RES_NA/OK/FAIL/UNK).
+    """
+    rules = DEFAULT_CROSS_RULES if rules is None else rules
+    compiled = compile_rules(rules, matrix["cols"])
+
+    values = matrix["values"]
+    cens = matrix["censored"]
+    # Intervalo de cada célula: [v, v] quantificado; [0, LQ] censurado
+    lo_all = np.where(cens, 0.0, values)
+    hi_all = values
+
+    codes = np.full((len(matrix["ids"]), len(compiled)), RES_NA, dtype=np.int8)
+    for k, r in enumerate(compiled):
+        c = r["cols"]
+        lo, hi = lo_all[:, c], hi_all[:, c]
+        present = ~np.isnan(hi).any(axis=1)
+        t, f = r["fn"](lo, hi)
+        codes[:, k] = np.where(~present, RES_NA, np.where(t, RES_OK, np.where(f, RES_FAIL, RES_UNK)))
+
+    return compiled, codes
+
+
+def rules_table(matrix, compiled, codes, only_issues=False):
+    """
+    Tabela longa (Id, Regra, Expressão, Status, Observação) das regras aplicáveis.
+    only_issues=True mantém só violações e inconclusivos.
+    """
+    keep = codes != RES_NA
+    if only_issues:
+        keep &= codes != RES_OK
+    rows, ks = np.nonzero(keep)
+
+    code = codes[rows, ks]
+    fail_status = np.array([r["status"] for r in compiled], dtype=object)
+
+    return pd.DataFrame({
+        "Id": matrix["ids"].to_numpy()[rows],
+        "Regra": np.array([r["nome"] for r in compiled], dtype=object)[ks],
+        "Expressão": np.array([r["expr"] for r in compiled], dtype=object)[ks],
+        "Status": np.select(
+            [code == RES_OK, code == RES_FAIL],
+            [STATUS_OK, fail_status[ks].astype(str)],
+            default=STATUS_UNK,
+        ),
+        "Observação": np.where(code == RES_UNK, "Valores <LQ impedem a conclusão", ""),
+    })
+
+
+def unapplied_rules(matrix, compiled, codes, rules=None):
+    """
+    Regras que não se aplicaram a nenhum Id do lote (Regra, Expressão, Status, Observação).
+    Sem estas linhas, uma referência errada (analito ou fração) some em silêncio do painel.
+    """
+    rules = DEFAULT_CROSS_RULES if rules is None else rules
+    applied = {r["regra"] for k, r in enumerate(compiled) if (codes[:, k] != RES_NA).any()}
+
+    rows = []
+    for i, rule in enumerate(rules):
+        if i in applied:
+            continue
+        rows.append({
+            "Regra": rule.get("nome") or rule["expr"],
+            "Expressão": rule["expr"],
+            "Status": STATUS_NA,
+            "Observação": _not_applied_reason(rule, matrix["cols"]),
+        })
+    return pd.DataFrame(rows, columns=["Regra", "Expressão", "Status", "Observação"])
+
+
+def cross_analyte_check(df_raw, rules=None, prepared=False, only_issues=False):
+    """
+    Matriz do lote + avaliação das regras em um passo. Retorna a tabela longa,
+    com uma linha "Não aplicada" (Id vazio) por regra que não se aplicou a nenhum Id.
+    """
+    from .matrix import build_matrix
+
+    matrix = build_matrix(df_raw, prepared=prepared)
+    compiled, codes = evaluate_rules(matrix, rules)
+    out = rules_table(matrix, compiled, codes, only_issues=only_issues)
+    na = unapplied_rules(matrix, compiled, codes, rules)
+    if na.empty:
+        return out
+    na.insert(0, "Id", "")
+    return pd.concat([out, na], ignore_index=True)
@@ -0,0 +1,252 @@
+# core/cube.py
+# Cubo agregado de status: contagens por (Lote, Id, Módulo, Analito, Status)
+# - Emitido a cada avaliação (poucas células por lote, em vez de todas as linhas)
+# - Painéis, filtros e resumo do lote leem o cubo em O(células)
+# - Mesclável de forma incremental (reavaliação de um lote, vários lotes)
+
+import numpy as np
+import pandas as pd
+
+from .utils import STATUS_CODES, STATUS_FAIL, STATUS_WARN, status_code
+
+
+CUBE_COLS = ["Lote", "Id", "Modulo", "Analito", "Status"]
+
+# Módulos
+MOD_DT = "Dissolvido vs Total"
+MOD_QC = "QC"
+MOD_DUP = "Duplicatas"
+MOD_LEG = "Legislação"
+
+# Módulos cujas células são de um par de amostras ("a × b"), não de um Id:
+# entram nas contagens e no status do lote, mas não nas tabelas por Id
+PAIR_MODULES = (MOD_DUP,)
+
+# Severidade agregada por célula
+SEV_OK = 0
+SEV_WARN = 1
+SEV_FAIL = 2
+
+
+def empty_cube():
+    return pd.DataFrame({
+        "Lote": pd.Categorical([]),
+        "Id": pd.Categorical([]),
+        "Modulo": pd.Categorical([]),
+        "Analito": pd.Categorical([]),
+        "Status": np.array([], dtype=np.int16),
+        "n": np.array([], dtype=np.int64),
+    })
+
+
+def cube_from_table(table, module, lote="", id_col="Id", analyte_col="Analito", status_col="Status"):
+    """
+    Agrega uma tabela de resultados (uma linha por avaliação) em células do cubo.
+    """
+    if table is None or table.empty or status_col not in table.columns:
+        return empty_cube()
+
+    n = len(table)
+    ids = table[id_col].astype(str) if id_col in table.columns else pd.Series([""] * n, index=table.index)
+    anal = table[analyte_col].astype(str) if analyte_col in table.columns else pd.Series([""] * n, index=table.index)
+
+    cells = (
+        pd.DataFrame({
+            "Id": ids.to_numpy(),
+            "Analito": anal.to_numpy(),
+            "Status": status_code(table[status_col]),
+        })
+        .groupby(["Id", "Analito", "Status"], sort=False, observed=True)
+        .size()
+        .reset_index(name="n")
+    )
+    cells.insert(0, "Lote", str(lote))
+    cells.insert(2, "Modulo", module)
+    return _compact(cells)
+
+
+def _compact(cube):
+    cube = cube[CUBE_COLS + ["n"]].copy()
+    for c in ["Lote", "Id", "Modulo", "Analito"]:
+        cube[c] = cube[c].astype(str).astype("category")
+    cube["Status"] = cube["Status"].astype(np.int16)
+    cube["n"] = cube["n"].astype(np.int64)
+    return cube.reset_index(drop=True)
+
+
+def lot_cube(res, lote=""):
+    """Cubo de uma avaliação de lote (core.lot.evaluate_lot): D/T + QC."""
+    return merge_cubes(
+        cube_from_table(res.get("dt"), MOD_DT, lote),
+        cube_from_table(res.get("qc"), MOD_QC, lote, analyte_col="Análise"),
+        replace=False,
+    )
+
+
+def legislation_cube(leg_results, lote="", specs=None):
+    """
+    Cubo de {especificação: (tabela, resumo)} (core.legislation.apply_legislation_multi).
+    specs: especificações que entram no cubo (padrão: todas).
+    """
+    return merge_cubes(
+        *[
+            cube_from_table(out, f"{MOD_LEG}: {spec}", lote)
+            for spec, (out, _) in leg_results.items()
+            if specs is None or spec in specs
+        ],
+        replace=False,
+    )
+
+
+def duplicates_cube(dup_results, lote=""):
+    """Cubo de {(amostra, duplicata): tabela}; o Id da célula é o par de amostras."""
+    cubes = []
+    for (a, b), out in dup_results.items():
+        if out is None or out.empty:
+            continue
+        out = out.assign(Id=f"{a} × {b}")
+        cubes.append(cube_from_table(out, MOD_DUP, lote))
+    return merge_cubes(*cubes, replace=False)
+
+
+def merge_cubes(*cubes, replace=True):
+    """
+    Mescla cubos somando as contagens.
+    replace=True: cada (Lote, Módulo) presente em um cubo posterior substitui o
+    mesmo (Lote, Módulo) dos anteriores (reavaliação de um lote).
+    """
+    cubes = [c for c in cubes if c is not None and not c.empty]
+    if not cubes:
+        return empty_cube()
+
+    if replace and len(cubes) > 1:
+        kept = []
+        for i, c in enumerate(cubes):
+            later = set()
+            for d in cubes[i + 1:]:
+                later |= set(zip(d["Lote"].astype(str), d["Modulo"].astype(str)))
+            if later:
+                keys = pd.Series(list(zip(c["Lote"].astype(str), c["Modulo"].astype(str))), index=c.index)
+                c = c[~keys.isin(later)]
+            kept.append(c)
+        cubes = kept
+
+    allc = pd.concat([c.astype({k: str for k in ["Lote", "Id", "Modulo", "Analito"]}) for c in cubes], ignore_index=True)
+    merged = allc.groupby(CUBE_COLS, sort=False, observed=True)["n"].sum().reset_index()
+    return _compact(merged)
+
+
+def load_cube(path):
+    """Lê um cubo gravado em CSV (ex.: partições acrescentadas lote a lote) e consolida as células."""
+    raw = pd.read_csv(path, dtype={"Lote": str, "Id": str, "Modulo": str, "Analito": str})
+    return merge_cubes(_compact(raw.fillna({"Id": "", "Analito": ""})), replace=False)
+
+
+# ---------------------------------------------------------
+# Consultas (O(células))
+# ---------------------------------------------------------
+
+def _severity(codes):
+    codes = np.asarray(codes)
+    sev = np.full(len(codes), SEV_OK, dtype=np.int8)
+    sev[np.isin(codes, list(STATUS_WARN))] = SEV_WARN
+    sev[np.isin(codes, list(STATUS_FAIL))] = SEV_FAIL
+    return sev
+
+
+_SEV_LABEL = np.array(["APROVADO", "ATENÇÃO", "REPROVADO"], dtype=object)
+
+
+def id_module_status(cube):
+    """
+    Status agregado por (Lote, Id, Módulo): REPROVADO / ATENÇÃO / APROVADO.
+    Células de pares de amostras (PAIR_MODULES) não entram.
+    """
+    cube = cube[~cube["Modulo"].astype(str).isin(PAIR_MODULES)] if not cube.empty else cube
+    if cube.empty:
+        return pd.DataFrame(columns=["Lote", "Id", "Modulo", "Status"])
+
+    sev = pd.Series(_severity(cube["Status"]), index=cube.index)
+    worst = sev.groupby([cube["Lote"], cube["Id"], cube["Modulo"]], observed=True, sort=False).max()
+    out = worst.reset_index(name="sev")
+    out["Status"] = _SEV_LABEL[out["sev"].to_numpy()]
+    return out.drop(columns="sev")
+
+
+def id_status_table(cube):
+    """Tabela larga: uma linha por (Lote, Id), uma coluna por módulo + status final."""
+    ims = id_module_status(cube)
+    if ims.empty:
+        return pd.DataFrame()
+
+    wide = ims.pivot_table(index=["Lote", "Id"], columns="Modulo", values="Status",
+                           aggfunc="first", observed=True)
+    wide.columns = [str(c) for c in wide.columns]
+
+    sev = {lbl: i for i, lbl in enumerate(_SEV_LABEL)}
+    worst = wide.apply(lambda col: col.map(sev)).max(axis=1).fillna(0).astype(int)
+    wide["Status final"] = _SEV_LABEL[worst.to_numpy()]
+    return wide.reset_index()
+
+
+def status_counts(cube, by=("Modulo",)):
+    """Contagem de resultados por status (rótulos legíveis) e pelas dimensões pedidas."""
+    if cube.empty:
+        return pd.DataFrame()
+    labels = np.array(list(STATUS_CODES.keys()), dtype=object)
+    t = cube.assign(StatusNome=labels[cube["Status"].to_numpy()])
+    return (
+        t.pivot_table(index=list(by), columns="StatusNome", values="n", aggfunc="sum",
+                      fill_value=0, observed=True)
+        .reset_index()
+    )
+
+
+def filter_ids(cube, failed=(), passed=()):
+    """
+    IDs (Lote, Id) reprovados em pelo menos um módulo de cada prefixo de
+    `failed` e aprovados em todos os módulos de cada prefixo de `passed`.
+    Um módulo casa por prefixo (ex.: "Legislação" casa com todas as especificações).
+    Ex.: filter_ids(cubo, failed=["Legislação"], passed=["QC"])
+    """
+    ims = id_module_status(cube)
+    if ims.empty:
+        return pd.DataFrame(columns=["Lote", "Id"])
+
+    key = ["Lote", "Id"]
+    mods = ims["Modulo"].astype(str)
+    sel = ims[key].drop_duplicates()
+
+    for m in failed:
+        hit = ims[mods.str.startswith(m) & (ims["Status"] == "REPROVADO")][key].drop_duplicates()
+        sel = sel.merge(hit, on=key)
+
+    for m in passed:
+        rows = ims[mods.str.startswith(m)]
+        bad = rows[rows["Status"] != "APROVADO"][key].drop_duplicates()
+        ok = rows[key].drop_duplicates().merge(bad, on=key, how="left", indicator=True)
+        ok = ok[ok["_merge"] == "left_only"][key]
+        sel = sel.merge(ok, on=key)
+
+    return sel.reset_index(drop=True)
+
+
+def lot_status(cube):
+    """
+    Status por lote: pior severidade entre as células do lote.
+    Única definição do veredito do lote (interface, ingestão e core.lot.evaluate_lot).
+    Módulos de Legislação não entram: dependem da especificação aplicável a cada
+    amostra e contam no status por ID.
+    """
+    if not cube.empty:
+        cube = cube[~cube["Modulo"].astype(str).str.startswith(MOD_LEG)]
+    if cube.empty:
+        return {}
+    sev = pd.Series(_severity(cube["Status"]), index=cube.index)
+    worst = sev.groupby(cube["Lote"], observed=True).max()
+    return {str(k): _SEV_LABEL[v] for k, v in worst.items()}
+
+
+def lot_verdict(cube, lote):
+    """Status de um lote do cubo (APROVADO se o lote não tem células)."""
+    return lot_status(cube).get(str(lote), "APROVADO")
@@ -0,0 +1,401 @@
+# core/differential.py
+# Validação diferencial: motor "reference" (linha a linha) x motor "fast" (vetorizado)
+# - Roda os dois motores sobre lotes gerados e lotes gravados (CSV/Excel)
+# - Compara as saídas linha a linha (status e observação exatos, valores com tolerância)
+# - Informa o ganho de velocidade ao lado de cada divergência
+#
+# Uso:
+#   python -m core.differential                          # lotes gerados
+#   python -m core.differential --arquivo sample_dados.csv --lotes 5 --ids 500
+# Código de saída 1 se houver qualquer divergência ou exceção em algum motor.
+
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from .dissolved_total import compare_dissolved_total
+from .duplicates import compare_duplicates, detect_duplicate_pairs
+from .legislation import apply_legislation_multi
+from .qc import evaluate_qc_itrio
+
+
+# Tolerância para colunas numéricas
+RTOL = 1e-9
+ATOL = 1e-12
+
+# Divergências detalhadas por caso (as demais só entram na contagem)
+MAX_DETAIL = 5
+
+
+# ---------------------------------------------------------
+# Lotes gerados
+# ---------------------------------------------------------
+
+ANALITOS = [
+    "Arsênio", "Bário", "Cádmio", "Chumbo", "Cobalto", "Cobre",
+    "Crômio", "Manganês", "Mercúrio", "Níquel", "Zinco", "Alumínio",
+]
+
+UNIDADES = ["mg/L", "µg/L", "ug/L", "μg/L", "mg/kg"]
+UNIDADES_P = [0.45, 0.3, 0.1, 0.1, 0.05]
+
+
+def _fmt(v, locale, rng):
+    """Formata um número como texto no padrão do laboratório (às vezes com milhar)."""
+    casas = int(rng.integers(0, 4))
+    s = f"{v:,.{casas}f}"
+    if locale == "pt":
+        s = s.replace(",", "\0").replace(".", ",").replace("\0", ".")
+    if rng.random() < 0.3:
+        # Sem separador de milhar
+        s = s.replace("." if locale == "pt" else ",", "")
+    return s
+
+
+def generate_lot(n_ids=200, seed=0, locale="pt"):
+    """
+    Lote sintético com os casos que os motores precisam tratar:
+    pares Dissolvido/Total completos e incompletos (mesmo nome nos dois métodos,
+    às vezes em caixa diferente), valores censurados (<LQ) em um ou nos dois lados,
+    ausentes e inválidos, LQ ausente, unidades mistas (inclusive não suportadas),
+    QC de Ítrio em % e amostras de duplicata ("... DUP") com censura divergente,
+    valores ausentes nos dois lados e analitos presentes em só uma das amostras.
+    """
+    rng = np.random.default_rng(seed)
+    rows = []
+
+    def add(idv, amostra, metodo, analise, valor, unidade, lq):
+        rows.append({
+            "Id": idv,
+            "Nº Amostra": amostra,
+            "Método de Análise": metodo,
+            "Análise": analise,
+            "Valor": valor,
+            "Unidade de Medida": unidade,
+            "LQ - Limite Quantificação": lq,
+        })
+
+    amostras = []
+    for i in range(n_ids):
+        idv = 300000 + i
+        amostra = f"{32000 + i}-1/2025.0"
+        amostras.append((idv, amostra))
+
+        for anal in rng.choice(ANALITOS, size=int(rng.integers(3, len(ANALITOS))), replace=False):
+            total = float(rng.lognormal(-3, 1.5))
+            diss = total * float(rng.uniform(0.2, 1.3))
+            # O par D/T casa pelo nome normalizado: variações de caixa e espaço não o quebram
+            nomes = [str(anal), str(anal).upper(), f" {str(anal).lower()} "]
+            for metodo, v in (("Metais Dissolvidos I", diss), ("Metais Totais I", total)):
+                nome = nomes[0] if rng.random() < 0.8 else str(rng.choice(nomes[1:]))
+                r = rng.random()
+                if r < 0.08:
+                    continue  # par incompleto
+                unidade = str(rng.choice(UNIDADES, p=UNIDADES_P))
+                fator = 1000.0 if unidade != "mg/L" else 1.0
+                lq = float(rng.choice([0.001, 0.005, 0.01])) * fator
+                lq_txt = _fmt(lq, locale, rng) if rng.random() > 0.05 else None
+                if r < 0.25:
+                    valor = "< " + _fmt(lq, locale, rng)
+                elif r < 0.28:
+                    valor = str(rng.choice(["ND", "", "n.a."]))
+                elif r < 0.30:
+                    valor = None
+                else:
+                    valor = _fmt(v * fator, locale, rng)
+                add(idv, amostra, metodo, nome, valor, unidade, lq_txt)
+
+        # QC de Ítrio (recuperação em %)
+        if rng.random() < 0.7:
+            rec = float(rng.normal(100, 18))
+            valor = _fmt(rec, "pt", rng) if rng.random() > 0.05 else "—"
+            add(idv, amostra, "Metais Totais I", "Ítrio", valor, "%", None)
+
+    # Duplicatas de parte das amostras
+    for idv, amostra in amostras[: max(1, n_ids // 10)]:
+        base = [r for r in rows if r["Nº Amostra"] == amostra]
+        for orig in base:
+            r = dict(orig, Id=idv + 500000, **{"Nº Amostra": f"{amostra} DUP"})
+            u = rng.random()
+            if u < 0.05:
+                continue  # analito só na amostra original
+            if u < 0.12:
+                # Censura divergente: a duplicata sai <LQ
+                r["Valor"] = "< " + (r["LQ - Limite Quantificação"] or _fmt(0.01, locale, rng))
+            elif u < 0.17:
+                # Sem valor nos dois lados
+                orig["Valor"] = str(rng.choice(["ND", "", "n.a."]))
+                r["Valor"] = str(rng.choice(["ND", "", "n.a."]))
+            elif u < 0.6 and r["Valor"] and not str(r["Valor"]).startswith("<") and r["Unidade de Medida"] != "%":
+                try:
+                    v = float(str(r["Valor"]).replace(".", "").replace(",", ".")) if locale == "pt" \
+                        else float(str(r["Valor"]).replace(",", ""))
+                    r["Valor"] = _fmt(v * float(rng.uniform(0.7, 1.3)), locale, rng)
+                except ValueError:
+                    pass
+            rows.append(r)
+        if rng.random() < 0.5:
+            # Analito só na duplicata
+            add(idv + 500000, f"{amostra} DUP", "Metais Totais I", "Vanádio",
+                _fmt(float(rng.lognormal(-3, 1)), locale, rng), "mg/L", _fmt(0.001, locale, rng))
+
+    return pd.DataFrame(rows)
+
+
+def recorded_lot(path):
+    """Lote gravado (mesmo leitor da interface)."""
+    from .reader import read_lot
+
+    return read_lot(path)
+
+
+# ---------------------------------------------------------
+# Comparação linha a linha
+# ---------------------------------------------------------
+
+def _is_missing(v):
+    return v is None or (isinstance(v, float) and np.isnan(v)) or v is pd.NA
+
+
+def compare_frames(ref, fast, rtol=RTOL, atol=ATOL):
+    """
+    Compara duas tabelas posição a posição.
+    Retorna lista de divergências {linha, coluna, referência, rápido}.
+    Ausentes (None/NaN) são equivalentes entre si.
+    """
+    ref = pd.DataFrame() if ref is None else ref
+    fast = pd.DataFrame() if fast is None else fast
+
+    if list(ref.columns) != list(fast.columns):
+        return [{"linha": None, "coluna": "(colunas)", "referência": list(ref.columns), "rápido": list(fast.columns)}]
+    if len(ref) != len(fast):
+        return [{"linha": None, "coluna": "(linhas)", "referência": len(ref), "rápido": len(fast)}]
+
+    diffs = []
+    for col in ref.columns:
+        a = ref[col].to_numpy(dtype=object)
+        b = fast[col].to_numpy(dtype=object)
+
+        an = pd.to_numeric(ref[col], errors="coerce").to_numpy(dtype=float)
+        bn = pd.to_numeric(fast[col], errors="coerce").to_numpy(dtype=float)
+        miss_a = np.array([_is_missing(v) for v in a], dtype=bool)
+        miss_b = np.array([_is_missing(v) for v in b], dtype=bool)
+        numeric = (~np.isnan(an) | miss_a) & (~np.isnan(bn) | miss_b)
+        numeric &= ~(miss_a & miss_b)
+
+        same = miss_a & miss_b
+        with np.errstate(invalid="ignore"):
+            same |= numeric & ~miss_a & ~miss_b & np.isclose(an, bn, rtol=rtol, atol=atol)
+        texto = ~numeric & ~same
+        if texto.any():
+            same[texto] = [x == y for x, y in zip(a[texto], b[texto])]
+
+        for i in np.flatnonzero(~same):
+            diffs.append({"linha": int(i), "coluna": col, "referência": a[i], "rápido": b[i]})
+    return diffs
+
+
+def compare_values(ref, fast, nome):
+    """Compara escalares e dicionários (status de lote, status por ID)."""
+    if isinstance(ref, dict) and isinstance(fast, dict):
+        if list(ref.keys()) != list(fast.keys()):
+            return [{"linha": None, "coluna": f"{nome} (chaves)", "referência": list(ref), "rápido": list(fast)}]
+        return [
+            {"linha": k, "coluna": nome, "referência": v, "rápido": fast[k]}
+            for k, v in ref.items() if v != fast[k]
+        ]
+    if ref != fast:
+        return [{"linha": None, "coluna": nome, "referência": ref, "rápido": fast}]
+    return []
+
+
+# ---------------------------------------------------------
+# Casos: cada um roda a função pública com engine= e compara as partes do retorno
+# ---------------------------------------------------------
+
+def _case_dissolved_total(df, engine):
+    return compare_dissolved_total(df, engine=engine)
+
+
+def _diff_dissolved_total(ref, fast):
+    out = compare_frames(ref[0], fast[0])
+    out += compare_values(ref[1], fast[1], "Status do lote")
+    out += compare_values(ref[2], fast[2], "Status por ID")
+    cols = ["Valor_num", "Censurado", "Valor_mg_L", "Analito_norm"]
+    out += compare_frames(ref[3][cols], fast[3][cols])
+    return out
+
+
+def _case_duplicates(df, engine):
+    return {
+        (a, b): compare_duplicates(df, a, b, engine=engine)
+        for a, b in detect_duplicate_pairs(df)
+    }
+
+
+def _diff_duplicates(ref, fast):
+    out = compare_values(list(ref), list(fast), "Pares")
+    for k in ref:
+        if k in fast:
+            out += [dict(d, coluna=f"{k[1]}: {d['coluna']}") for d in compare_frames(ref[k], fast[k])]
+    return out
+
+
+def _case_legislation(df, engine, catalog=None):
+    return apply_legislation_multi(df, catalog or {}, engine=engine)
+
+
+def _diff_legislation(ref, fast):
+    out = []
+    for spec, (r_out, r_res) in ref.items():
+        f_out, f_res = fast[spec]
+        out += [dict(d, coluna=f"{spec}: {d['coluna']}") for d in compare_frames(r_out, f_out)]
+        out += [dict(d, coluna=f"{spec}: {d['coluna']}") for d in compare_frames(r_res, f_res)]
+    return out
+
+
+def _case_qc_itrio(df, engine):
+    return evaluate_qc_itrio(df, engine=engine)
+
+
+def _diff_qc_itrio(ref, fast):
+    out = compare_frames(ref[0], fast[0])
+    out += compare_values(ref[1], fast[1], "Status por ID")
+    out += compare_values(ref[2], fast[2], "NC global")
+    return out
+
+
+CASES = {
+    "compare_dissolved_total": (_case_dissolved_total, _diff_dissolved_total),
+    "compare_duplicates": (_case_duplicates, _diff_duplicates),
+    "apply_legislation": (_case_legislation, _diff_legislation),
+    "evaluate_qc_itrio": (_case_qc_itrio, _diff_qc_itrio),
+}
+
+
+def _timed(fn, df, engine, repeat, **kw):
+    """Melhor tempo de `repeat` execuções (cópia nova do lote a cada uma)."""
+    best = float("inf")
+    result = None
+    for _ in range(max(1, repeat)):
+        d = df.copy()
+        t0 = time.perf_counter()
+        result = fn(d, engine, **kw)
+        best = min(best, time.perf_counter() - t0)
+    return result, best
+
+
+def run_case(name, df, repeat=3, **kw):
+    """
+    Roda um caso nos dois motores.
+    Retorna {Função, Linhas, Referência (s), Rápido (s), Speedup, Divergências, Erro, Detalhes}
+    (Erro: exceções dos motores, vazio se os dois rodaram).
+    """
+    fn, diff = CASES[name]
+
+    erro = {}
+    try:
+        ref, t_ref = _timed(fn, df, "reference", repeat, **kw)
+    except Exception as e:  # noqa: BLE001 - registrado como resultado
+        ref, t_ref, erro["reference"] = None, float("nan"), f"{type(e).__name__}: {e}"
+    try:
+        fast, t_fast = _timed(fn, df, "fast", repeat, **kw)
+    except Exception as e:  # noqa: BLE001
+        fast, t_fast, erro["fast"] = None, float("nan"), f"{type(e).__name__}: {e}"
+
+    # Exceção em qualquer motor é falha do caso, nunca equivalência
+    # (uma regressão que derruba os dois motores não pode passar)
+    divs = [] if erro else diff(ref, fast)
+
+    return {
+        "Função": name,
+        "Linhas": len(df),
+        "Referência (s)": t_ref,
+        "Rápido (s)": t_fast,
+        "Speedup": t_ref / t_fast if t_fast and not np.isnan(t_fast) else float("nan"),
+        "Divergências": len(divs),
+        "Erro": "; ".join(f"{eng}: {msg}" for eng, msg in erro.items()),
+        "Detalhes": divs[:MAX_DETAIL],
+    }
+
+
+def run(lots, catalog=None, repeat=3, cases=None):
+    """
+    Roda todos os casos sobre {nome_do_lote: DataFrame}.
+    Retorna a tabela de resultados (uma linha por lote × função).
+    """
+    cases = list(CASES) if cases is None else cases
+    rows = []
+    for lot_name, df in lots.items():
+        for name in cases:
+            kw = {"catalog": catalog} if name == "apply_legislation" else {}
+            r = run_case(name, df, repeat=repeat, **kw)
+            r["Lote"] = lot_name
+            rows.append(r)
+    cols = ["Lote", "Função", "Linhas", "Referência (s)", "Rápido (s)", "Speedup", "Divergências", "Erro", "Detalhes"]
+    return pd.DataFrame(rows, columns=cols)
+
+
+def format_report(report):
+    """Relatório em texto: tempos e speedup por caso, divergências logo abaixo."""
+    lines = []
+    for _, r in report.iterrows():
+        flag = "ERR" if r["Erro"] else ("OK " if r["Divergências"] == 0 else "DIV")
+        lines.append(
+            f"[{flag}] {r['Lote']:<24} {r['Função']:<24} {r['Linhas']:>7} linhas  "
+            f"ref {r['Referência (s)']:8.4f}s  fast {r['Rápido (s)']:8.4f}s  "
+            f"x{r['Speedup']:6.1f}  divergências: {r['Divergências']}"
+        )
+        if r["Erro"]:
+            lines.append(f"      erro: {r['Erro']}")
+        for d in r["Detalhes"]:
+            lines.append(
+                f"      linha {d['linha']}, {d['coluna']}: referência={d['referência']!r} rápido={d['rápido']!r}"
+            )
+    return "\n".join(lines)
+
+
+# ---------------------------------------------------------
+# CLI
+# ---------------------------------------------------------
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Validação diferencial dos motores reference x fast")
+    ap.add_argument("--lotes", type=int, default=4, help="quantidade de lotes gerados")
+    ap.add_argument("--ids", type=int, default=200, help="IDs por lote gerado")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--arquivo", nargs="*", default=[], help="lotes gravados (CSV/Excel)")
+    ap.add_argument("--catalogo", default="catalogo_especificacoes.json")
+    ap.add_argument("--repeat", type=int, default=3, help="execuções por motor (melhor tempo)")
+    ap.add_argument("--funcao", nargs="*", choices=list(CASES), help="restringe os casos")
+    args = ap.parse_args(argv)
+
+    import json
+    from pathlib import Path
+
+    catalog = {}
+    if Path(args.catalogo).exists():
+        catalog = json.loads(Path(args.catalogo).read_text(encoding="utf-8"))
+
+    lots = {}
+    for i in range(args.lotes):
+        locale = "pt" if i % 2 == 0 else "en"
+        lots[f"gerado-{args.seed + i} ({locale})"] = generate_lot(args.ids, seed=args.seed + i, locale=locale)
+    for p in args.arquivo:
+        lots[Path(p).name] = recorded_lot(p)
+
+    report = run(lots, catalog=catalog, repeat=args.repeat, cases=args.funcao)
+    print(format_report(report))
+
+    total = int(report["Divergências"].sum())
+    erros = int((report["Erro"] != "").sum())
+    print(f"\nTotal de divergências: {total}")
+    print(f"Casos com erro: {erros}")
+    return 1 if total or erros else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
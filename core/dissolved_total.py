@@ -1,22 +1,39 @@
 # core/dissolved_total.py
 # Comparação Dissolvido vs Total com lógica científica completa
 
+import numpy as np
 import pandas as pd
-from .parsing import parse_val
-from .units import to_mg_per_L
-from .normalize import normalize_analito
+from .parsing import parse_val, parse_rows, parse_series, numeric_locale
+from .units import to_mg_per_L, to_mg_per_L_series
+from .normalize import normalize_analito, normalize_series
+from .keys import method_masks, factorize_keys, outer_join
+from .engine import resolve
 
 
-def compare_dissolved_total(df_raw):
+def compare_dissolved_total(df_raw, engine=None):
     """
     Compara Dissolvido vs Total para cada ID + Analito.
+    engine: "fast" (vetorizado) ou "reference" (linha a linha); padrão em core.engine.
     Retorna:
         - tabela detalhada
         - status global do lote
         - status por ID
         - dataframe numérico completo
     """
+    if resolve(engine) == "reference":
+        return compare_dissolved_total_reference(df_raw)
+    return compare_dissolved_total_fast(df_raw)
 
+
+def compare_dissolved_total_reference(df_raw):
+    """
+    Motor de referência (linha a linha). Mesmo retorno de compare_dissolved_total.
+    Mantém o código original (parse_val por linha, str.contains, pd.merge), sem as
+    camadas usadas pelo motor rápido, para que a validação diferencial as cubra.
+    """
+
+    # Convenção numérica detectada uma vez por arquivo (acompanha a cópia)
+    loc = numeric_locale(df_raw)
     df = df_raw.copy()
 
     # Garante coluna LQ
@@ -24,7 +41,7 @@ def compare_dissolved_total(df_raw):
         df["LQ - Limite Quantificação"] = None
 
     # Parsing e conversão
-    df["Valor_num"], df["Censurado"] = zip(*df["Valor"].map(parse_val))
+    df["Valor_num"], df["Censurado"] = parse_rows(df["Valor"], loc)
     df["Valor_mg_L"] = df.apply(lambda r: to_mg_per_L(r["Valor_num"], r["Unidade de Medida"]), axis=1)
     df["Analito_norm"] = df["Análise"].map(normalize_analito)
 
@@ -84,7 +101,7 @@ def compare_dissolved_total(df_raw):
 
             elif not d_cens and t_cens:
                 # Total < LQ → comparar Dissolvido com LQ
-                lq_num, _ = parse_val(r["LQ - Limite Quantificação_tot"])
+                lq_num, _ = parse_val(r["LQ - Limite Quantificação_tot"], loc["decimal"], loc["thousands"])
                 lq_unit = r["Unidade de Medida_tot"]
                 lq_mg = to_mg_per_L(lq_num, lq_unit)
 
@@ -146,3 +163,135 @@ def compare_dissolved_total(df_raw):
             id_status[idv] = "APROVADO"
 
     return out_df, lote_status, id_status, df
+
+
+def compare_dissolved_total_fast(df_raw):
+    """Motor vetorizado. Mesmo retorno de compare_dissolved_total_reference."""
+
+    loc = numeric_locale(df_raw)
+    df = df_raw.copy()
+
+    if "LQ - Limite Quantificação" not in df.columns:
+        df["LQ - Limite Quantificação"] = None
+
+    # Parsing e conversão em lote (cada unidade/analito distinto avaliado uma vez)
+    df["Valor_num"], df["Censurado"] = parse_series(df["Valor"], loc)
+    df["LQ_num"], _ = parse_series(df["LQ - Limite Quantificação"], loc)
+    df["Valor_mg_L"] = to_mg_per_L_series(df["Valor_num"], df["Unidade de Medida"])
+    df["Analito_norm"] = normalize_series(df["Análise"])
+
+    is_diss, is_tot = method_masks(df["Método de Análise"])
+    valid = df["Valor_mg_L"].notna().to_numpy()
+
+    cols = ["Id", "Analito_norm", "Valor_mg_L", "Censurado", "Unidade de Medida", "LQ - Limite Quantificação", "LQ_num"]
+    D = df.loc[is_diss & valid, cols]
+    T = df.loc[is_tot & valid, cols]
+
+    codes = factorize_keys(df, cols=["Id", "Analito_norm"], sort=True)[0]
+    merged = outer_join(
+        D, T,
+        on=["Id", "Analito_norm"],
+        suffixes=("_diss", "_tot"),
+        keys=(codes[is_diss & valid], codes[is_tot & valid])
+    )
+
+    d_val = pd.to_numeric(merged["Valor_mg_L_diss"], errors="coerce").to_numpy(dtype=float)
+    t_val = pd.to_numeric(merged["Valor_mg_L_tot"], errors="coerce").to_numpy(dtype=float)
+    d_cens = merged["Censurado_diss"].fillna(False).astype(bool).to_numpy()
+    t_cens = merged["Censurado_tot"].fillna(False).astype(bool).to_numpy()
+
+    d_na = np.isnan(d_val)
+    t_na = np.isnan(t_val)
+    both = ~d_na & ~t_na
+
+    # LQ do Total em mg/L (NaN se ausente ou unidade não suportada)
+    lq_mg = to_mg_per_L_series(merged["LQ_num_tot"], merged["Unidade de Medida_tot"])
+
+    with np.errstate(invalid="ignore"):
+        d_gt_t = d_val > t_val
+        d_gt_lq = d_val > lq_mg
+
+    c_none = both & ~d_cens & ~t_cens
+    c_tot = both & ~d_cens & t_cens
+    c_diss = both & d_cens & ~t_cens
+    c_all = both & d_cens & t_cens
+
+    status = np.select(
+        [
+            d_na & t_na,
+            d_na | t_na,
+            c_none & d_gt_t,
+            c_none,
+            c_tot & np.isnan(lq_mg),
+            c_tot & d_gt_lq,
+            c_tot,
+            c_diss & d_gt_t,
+            c_diss,
+            c_all,
+        ],
+        [
+            "Sem dados válidos",
+            "Sem par para comparação",
+            "NÃO CONFORME",
+            "OK",
+            "INCONCLUSIVO",
+            "POTENCIAL NÃO CONFORME",
+            "OK",
+            "INCONCLUSIVO",
+            "OK",
+            "OK",
+        ],
+        default="",
+    )
+
+    obs = np.select(
+        [
+            d_na & t_na,
+            d_na & ~t_na,
+            ~d_na & t_na,
+            c_tot & np.isnan(lq_mg),
+            c_diss,
+            c_all,
+        ],
+        [
+            "Unidade não suportada ou valor ausente",
+            "Apenas Total disponível",
+            "Apenas Dissolvido disponível",
+            "Total <LQ; LQ não informado ou unidade não suportada",
+            "Dissolvido <LQ",
+            "Ambos <LQ",
+        ],
+        default="",
+    )
+
+    out_df = pd.DataFrame({
+        "Id": merged["Id"].to_numpy(),
+        "Analito": merged["Analito_norm"].to_numpy(),
+        "Dissolvido (mg/L)": d_val,
+        "Total (mg/L)": t_val,
+        "Dissolvido <LQ?": np.where(d_cens, "Sim", "Não"),
+        "Total <LQ?": np.where(t_cens, "Sim", "Não"),
+        "Status": status,
+        "Observação": obs,
+    }).infer_objects()
+
+    is_nc = status == "NÃO CONFORME"
+    is_pot = status == "POTENCIAL NÃO CONFORME"
+
+    if is_nc.any():
+        lote_status = "REPROVADO"
+    elif is_pot.any():
+        lote_status = "ATENÇÃO (potenciais não conformidades)"
+    else:
+        lote_status = "APROVADO"
+
+    # Status por ID (ordem de primeira aparição, como na referência)
+    ids = merged["Id"]
+    flags = pd.DataFrame({"nc": is_nc, "pot": is_pot})[ids.notna().to_numpy()]
+    agg = flags.groupby(ids[ids.notna()].to_numpy(), sort=False).any()
+    id_status = {
+        idv: ("REPROVADO" if nc else "ATENÇÃO" if pot else "APROVADO")
+        for idv, nc, pot in zip(agg.index, agg["nc"], agg["pot"])
+    }
+
+    return out_df, lote_status, id_status, df
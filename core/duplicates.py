@@ -1,10 +1,14 @@
 # core/duplicates.py
 # Comparação de duplicatas (%RPD) com lógica robusta e independente
 
+import re
+import numpy as np
 import pandas as pd
-from .parsing import parse_val
-from .units import to_mg_per_L
-from .normalize import normalize_analito
+from .parsing import parse_rows, parse_series, numeric_locale
+from .units import to_mg_per_L, to_mg_per_L_series
+from .normalize import normalize_analito, normalize_series
+from .keys import outer_join
+from .engine import resolve
 
 
 def rpd(v1, v2):
@@ -16,27 +20,76 @@ def rpd(v1, v2):
     return abs(v1 - v2) / ((v1 + v2) / 2.0) * 100.0
 
 
-def prepare_numeric(df_raw):
+# Marcadores de duplicata no "Nº Amostra" (ex.: "32230-1 DUP", "32230-1-D")
+# Um "D" isolado só conta colado por hífen/espaço a um código terminado em dígito
+# ("Poço D" não é duplicata de "Poço")
+DUP_MARKER = re.compile(
+    r"(?:[\s\-_/]*\(?\b(?:dup|duplicata|dupl)\b\)?|(?<=\d)[\s\-_/]+\(?d\)?)\s*$",
+    re.IGNORECASE,
+)
+
+
+def detect_duplicate_pairs(df_raw):
+    """
+    Detecta pares (amostra, duplicata) pelo "Nº Amostra":
+    a duplicata é a amostra cujo número termina com um marcador de
+    duplicata e cujo número sem o marcador também existe no lote.
+    Retorna lista de tuplas (amostra, duplicata).
+    """
+    if "Nº Amostra" not in df_raw.columns:
+        return []
+
+    amostras = list(dict.fromkeys(df_raw["Nº Amostra"].dropna().astype(str)))
+    existentes = {a.strip(): a for a in amostras}
+
+    pairs = []
+    for a in amostras:
+        base = DUP_MARKER.sub("", a).strip()
+        if base != a.strip() and base in existentes:
+            pairs.append((existentes[base], a))
+    return pairs
+
+
+def prepare_numeric(df_raw, engine=None):
     """Converte valores e normaliza analitos para comparação."""
     df = df_raw.copy()
-    df["Valor_num"], df["Censurado"] = zip(*df["Valor"].map(parse_val))
-    df["Valor_mg_L"] = df.apply(lambda r: to_mg_per_L(r["Valor_num"], r["Unidade de Medida"]), axis=1)
-    df["Analito_norm"] = df["Análise"].map(normalize_analito)
+    if resolve(engine) == "reference":
+        df["Valor_num"], df["Censurado"] = parse_rows(df["Valor"], numeric_locale(df_raw))
+        df["Valor_mg_L"] = df.apply(lambda r: to_mg_per_L(r["Valor_num"], r["Unidade de Medida"]), axis=1)
+        df["Analito_norm"] = df["Análise"].map(normalize_analito)
+    else:
+        df["Valor_num"], df["Censurado"] = parse_series(df["Valor"], numeric_locale(df_raw))
+        df["Valor_mg_L"] = to_mg_per_L_series(df["Valor_num"], df["Unidade de Medida"])
+        df["Analito_norm"] = normalize_series(df["Análise"])
     return df
 
 
-def compare_duplicates(df_raw, sample1, sample2, tolerance_pct=20.0):
+def compare_duplicates(df_raw, sample1, sample2, tolerance_pct=20.0, engine=None):
     """
     Compara duplicatas entre duas amostras.
+    engine: "fast" (vetorizado) ou "reference" (linha a linha); padrão em core.engine.
     Retorna:
         - tabela final com %RPD
     """
+    if resolve(engine) == "reference":
+        return compare_duplicates_reference(df_raw, sample1, sample2, tolerance_pct)
+    return compare_duplicates_fast(df_raw, sample1, sample2, tolerance_pct)
 
-    df = prepare_numeric(df_raw)
 
-    # Filtra amostras
-    a1 = df[df["Nº Amostra"].astype(str) == str(sample1)].copy()
-    a2 = df[df["Nº Amostra"].astype(str) == str(sample2)].copy()
+def _pair_frames(df, sample1, sample2, reference=False):
+    """
+    Junção (Método, Analito) das duas amostras, sem unidades em %.
+    reference=True usa o pd.merge original; senão, a junção sobre chaves inteiras.
+    """
+
+    # Filtra amostras (sem a coluna opcional "Nº Amostra" não há o que comparar)
+    if "Nº Amostra" in df.columns:
+        amostra = df["Nº Amostra"].astype(str)
+        a1 = df[amostra == str(sample1)].copy()
+        a2 = df[amostra == str(sample2)].copy()
+    else:
+        a1 = df.iloc[0:0].copy()
+        a2 = df.iloc[0:0].copy()
 
     # Remove unidades em %
     a1 = a1[a1["Unidade de Medida"].astype(str).str.strip() != "%"]
@@ -57,8 +110,28 @@ def compare_duplicates(df_raw, sample1, sample2, tolerance_pct=20.0):
         "Censurado": "Cens_2"
     })
 
-    # Merge
-    comp = pd.merge(a1, a2, on=key_cols, how="outer")
+    if reference:
+        return pd.merge(a1, a2, on=key_cols, how="outer")
+
+    # Junção sobre chaves inteiras (Método, Analito)
+    return outer_join(a1, a2, on=key_cols)
+
+
+# Ordem de exibição dos status (também usada por core.replicates)
+SEVERITY_ORDER = ["Não conforme", "INCONCLUSIVO", "OK", "Conforme", "Sem dados"]
+
+
+def _sort_by_severity(out):
+    cat = pd.Categorical(out["Status"], categories=SEVERITY_ORDER, ordered=True)
+    out["__ord"] = cat
+    return out.sort_values(["__ord", "Método de Análise", "Analito"]).drop(columns="__ord")
+
+
+def compare_duplicates_reference(df_raw, sample1, sample2, tolerance_pct=20.0):
+    """Motor de referência (linha a linha). Mesmo retorno de compare_duplicates."""
+
+    df = prepare_numeric(df_raw, engine="reference")
+    comp = _pair_frames(df, sample1, sample2, reference=True)
 
     rows = []
 
@@ -78,8 +151,8 @@ def compare_duplicates(df_raw, sample1, sample2, tolerance_pct=20.0):
         obs = ""
         rpd_pct = None
 
-        # Casos especiais
-        if v1 is None and v2 is None:
+        # Casos especiais (ausente chega como None ou NaN, conforme o dtype da junção)
+        if pd.isna(v1) and pd.isna(v2):
             status = "Sem dados"
             obs = "Valores ausentes"
 
@@ -107,15 +180,52 @@ def compare_duplicates(df_raw, sample1, sample2, tolerance_pct=20.0):
             "Observação": obs,
         })
 
-    out = pd.DataFrame(rows)
+    out = pd.DataFrame(rows, columns=[
+        "Método de Análise", "Analito", "Unidade", f"Valor ({sample1}) mg/L",
+        f"Valor ({sample2}) mg/L", "%RPD", "Status", "Observação",
+    ])
 
     # Ordenação por severidade
-    cat = pd.Categorical(
-        out["Status"],
-        categories=["Não conforme", "INCONCLUSIVO", "OK", "Conforme", "Sem dados"],
-        ordered=True
-    )
-    out["__ord"] = cat
-    out = out.sort_values(["__ord", "Método de Análise", "Analito"]).drop(columns="__ord")
+    return _sort_by_severity(out)
 
-    return out
+
+def compare_duplicates_fast(df_raw, sample1, sample2, tolerance_pct=20.0):
+    """Motor vetorizado. Mesmo retorno de compare_duplicates_reference."""
+
+    df = prepare_numeric(df_raw, engine="fast")
+    comp = _pair_frames(df, sample1, sample2)
+
+    v1 = pd.to_numeric(comp["Valor_1"], errors="coerce").to_numpy(dtype=float)
+    v2 = pd.to_numeric(comp["Valor_2"], errors="coerce").to_numpy(dtype=float)
+    c1 = comp["Cens_1"].fillna(False).astype(bool).to_numpy()
+    c2 = comp["Cens_2"].fillna(False).astype(bool).to_numpy()
+
+    # %RPD com a mesma aritmética de rpd(); só calculado quando nenhum lado é <LQ
+    with np.errstate(invalid="ignore", divide="ignore"):
+        soma = v1 + v2
+        rpd_all = np.where(soma == 0, 0.0, np.abs(v1 - v2) / (soma / 2.0) * 100.0)
+        dentro = rpd_all <= tolerance_pct
+
+    vazio = np.isnan(v1) & np.isnan(v2)
+    calc = ~vazio & ~c1 & ~c2
+    rpd_pct = np.where(calc, rpd_all, np.nan)
+
+    status = np.select(
+        [vazio, c1 & c2, c1 | c2, dentro],
+        ["Sem dados", "OK", "INCONCLUSIVO", "Conforme"],
+        default="Não conforme",
+    )
+    obs = np.select([vazio, c1 & c2, c1 | c2], ["Valores ausentes", "Ambos <LQ", "Um <LQ"], default="")
+
+    out = pd.DataFrame({
+        "Método de Análise": comp["Método de Análise"].to_numpy(),
+        "Analito": comp["Analito_norm"].to_numpy(),
+        "Unidade": comp["Unidade_1"].where(comp["Unidade_1"].notna(), comp["Unidade_2"]).to_numpy(),
+        f"Valor ({sample1}) mg/L": v1,
+        f"Valor ({sample2}) mg/L": v2,
+        "%RPD": rpd_pct,
+        "Status": status,
+        "Observação": obs,
+    }).infer_objects()
+
+    return _sort_by_severity(out)
@@ -0,0 +1,26 @@
+# core/engine.py
+# Seleção do motor de avaliação
+# - "reference": implementações linha a linha (comportamento acreditado)
+# - "fast": implementações vetorizadas, validadas contra a referência
+#   pelo harness diferencial (core/differential.py)
+
+import os
+
+
+ENGINES = ("fast", "reference")
+
+_default = os.environ.get("OPERALAB_ENGINE", "fast")
+
+
+def set_default_engine(name: str):
+    """Define o motor padrão do processo."""
+    global _default
+    _default = resolve(name)
+
+
+def resolve(engine=None) -> str:
+    """Motor efetivo: o pedido explicitamente ou o padrão do processo."""
+    name = (engine or _default or "fast").strip().lower()
+    if name not in ENGINES:
+        raise ValueError(f"Motor desconhecido: {engine!r} (opções: {', '.join(ENGINES)})")
+    return name
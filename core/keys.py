@@ -0,0 +1,189 @@
+# core/keys.py
+# Chaves inteiras para junções rápidas (Dissolvido/Total, duplicatas)
+# - Fatoração de Id / Analito / Método em códigos densos
+# - Classificação de cada método distinto uma única vez
+# - Pareamento (outer join) sobre arrays inteiros ordenados
+
+import numpy as np
+import pandas as pd
+
+
+# Cache de classificação: método -> (é_dissolvido, é_total)
+_METHOD_CLASS = {}
+
+
+def _classify_method(m):
+    hit = _METHOD_CLASS.get(m)
+    if hit is None:
+        s = str(m).lower()
+        hit = ("dissolvidos" in s, "totais" in s)
+        _METHOD_CLASS[m] = hit
+    return hit
+
+
+def method_masks(series):
+    """
+    Máscaras (dissolvido, total) para a coluna "Método de Análise".
+    Equivale a str.contains("Dissolvidos"/"Totais", case=False, na=False),
+    mas avalia cada método distinto só uma vez.
+    """
+    codes, uniques = pd.factorize(series)
+
+    d = np.zeros(len(uniques) + 1, dtype=bool)
+    t = np.zeros(len(uniques) + 1, dtype=bool)
+    for i, m in enumerate(uniques):
+        if isinstance(m, str):
+            d[i], t[i] = _classify_method(m)
+
+    # Código -1 (NA) aponta para a última posição: (False, False)
+    return d[codes], t[codes]
+
+
+def factorize_keys(*frames, cols, sort=False):
+    """
+    Fatora as colunas-chave de vários dataframes em um único espaço de códigos.
+    Retorna uma lista de arrays int64 (um por dataframe) com códigos densos.
+    NaN é tratado como valor (mesma semântica do pd.merge).
+    Com sort=True os códigos seguem a ordem lexicográfica das chaves.
+    """
+    sizes = [len(f) for f in frames]
+    combined = None
+
+    for c in cols:
+        values = pd.concat([f[c] for f in frames], ignore_index=True)
+        codes, uniques = pd.factorize(values, sort=sort, use_na_sentinel=False)
+        codes = codes.astype(np.int64)
+        combined = codes if combined is None else combined * len(uniques) + codes
+        # Re-densifica para evitar estouro com muitas colunas
+        combined, _ = pd.factorize(combined, sort=sort)
+
+    if combined is None:
+        combined = np.zeros(sum(sizes), dtype=np.int64)
+
+    out = []
+    start = 0
+    for n in sizes:
+        out.append(combined[start:start + n])
+        start += n
+    return out
+
+
+def _first_appearance(key_order, left, right, n_keys):
+    """Reordena as chaves pela primeira aparição (esquerda, depois direita)."""
+    both = np.concatenate((left, right))
+    first = np.empty(n_keys, dtype=np.int64)
+    first[both[::-1]] = np.arange(len(both) - 1, -1, -1)
+    return key_order[np.argsort(first[key_order], kind="stable")]
+
+
+def pair_keys(left, right, sort=False):
+    """
+    Outer join sobre chaves inteiras densas.
+    Retorna (idx_esq, idx_dir) posicionais; -1 indica ausência de par.
+    Chaves repetidas geram o produto cartesiano (como pd.merge).
+    A ordem de saída segue o código da chave (sort=True) ou a primeira
+    aparição da chave (esquerda, depois direita).
+    """
+    left = np.asarray(left, dtype=np.int64)
+    right = np.asarray(right, dtype=np.int64)
+
+    n_keys = int(max(left.max(initial=-1), right.max(initial=-1))) + 1
+
+    lcount = np.bincount(left, minlength=n_keys)
+    rcount = np.bincount(right, minlength=n_keys)
+
+    # Caminho rápido: chaves únicas em ambos os lados (caso típico) -> O(n)
+    if (lcount <= 1).all() and (rcount <= 1).all():
+        key_order = np.flatnonzero((lcount > 0) | (rcount > 0))
+        if not sort:
+            key_order = _first_appearance(key_order, left, right, n_keys)
+        lpos = np.full(n_keys, -1, dtype=np.int64)
+        rpos = np.full(n_keys, -1, dtype=np.int64)
+        lpos[left] = np.arange(len(left))
+        rpos[right] = np.arange(len(right))
+        return lpos[key_order], rpos[key_order]
+
+    lorder = np.argsort(left, kind="stable")
+    rorder = np.argsort(right, kind="stable")
+    lstart = np.concatenate(([0], np.cumsum(lcount)[:-1]))
+    rstart = np.concatenate(([0], np.cumsum(rcount)[:-1]))
+
+    # Ordem das chaves: código ou primeira aparição (sem ordenar as linhas)
+    key_order = np.flatnonzero((lcount > 0) | (rcount > 0))
+    if not sort:
+        key_order = _first_appearance(key_order, left, right, n_keys)
+
+    lc = lcount[key_order]
+    rc = rcount[key_order]
+
+    # Pares por chave: lc*rc se ambos presentes, senão lc ou rc
+    n_pairs = np.where((lc > 0) & (rc > 0), lc * rc, np.maximum(lc, rc))
+
+    k = np.repeat(key_order, n_pairs)
+    offs = np.arange(n_pairs.sum()) - np.repeat(np.cumsum(n_pairs) - n_pairs, n_pairs)
+
+    klc = lcount[k]
+    krc = rcount[k]
+
+    li = np.full(len(k), -1, dtype=np.int64)
+    ri = np.full(len(k), -1, dtype=np.int64)
+
+    has_l = klc > 0
+    has_r = krc > 0
+    both_mask = has_l & has_r
+
+    # Ambos: produto cartesiano
+    li[both_mask] = lorder[lstart[k[both_mask]] + offs[both_mask] // krc[both_mask]]
+    ri[both_mask] = rorder[rstart[k[both_mask]] + offs[both_mask] % krc[both_mask]]
+
+    # Só esquerda / só direita
+    only_l = has_l & ~has_r
+    only_r = has_r & ~has_l
+    li[only_l] = lorder[lstart[k[only_l]] + offs[only_l]]
+    ri[only_r] = rorder[rstart[k[only_r]] + offs[only_r]]
+
+    return li, ri
+
+
+def take_or_na(df, idx):
+    """df.iloc[idx] com NaN nas posições -1; índice reiniciado."""
+    idx = np.asarray(idx)
+    if len(df) == 0:
+        return pd.DataFrame({c: [np.nan] * len(idx) for c in df.columns}, dtype=object)
+
+    out = df.iloc[np.where(idx >= 0, idx, 0)].reset_index(drop=True)
+    missing = idx < 0
+    if missing.any():
+        out = out.astype(object)
+        out.loc[missing, :] = np.nan
+    return out
+
+
+def outer_join(left, right, on, suffixes=("_x", "_y"), sort=True, keys=None):
+    """
+    Equivalente a pd.merge(left, right, on=on, how="outer", suffixes=...)
+    usando chaves inteiras. As colunas-chave são coalescidas.
+    Com sort=True (padrão, como no pd.merge) as linhas saem ordenadas pela chave.
+    keys: (códigos_esq, códigos_dir) já fatorados sobre o lote inteiro
+    (ver factorize_keys); evita refatorar as strings a cada junção.
+    """
+    if keys is None:
+        keys = factorize_keys(left, right, cols=on, sort=sort)
+    li, ri = pair_keys(keys[0], keys[1], sort=sort)
+
+    L = take_or_na(left, li)
+    R = take_or_na(right, ri)
+
+    out = pd.DataFrame(index=range(len(li)))
+    for c in on:
+        out[c] = L[c].where(li >= 0, R[c])
+
+    overlap = (set(left.columns) & set(right.columns)) - set(on)
+    for c in left.columns:
+        if c not in on:
+            out[c + suffixes[0] if c in overlap else c] = L[c]
+    for c in right.columns:
+        if c not in on:
+            out[c + suffixes[1] if c in overlap else c] = R[c]
+
+    return out
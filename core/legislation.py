@@ -1,44 +1,78 @@
 # core/legislation.py
 # Avaliação por legislação / especificação usando catálogo JSON
 
+import numpy as np
 import pandas as pd
-from .normalize import normalize_analito, apply_alias
-from .units import to_mg_per_L
-from .parsing import parse_val
+from .normalize import normalize_analito, normalize_series, apply_alias
+from .units import to_mg_per_L, to_mg_per_L_series
+from .parsing import parse_rows, parse_series, numeric_locale
+from .matching import build_analyte_index, resolve_analytes, match_cache_batch
+from .keys import method_masks
+from .engine import resolve
 
 
-def prepare_numeric(df_raw):
+# Índices de busca por conjunto de limites (reaproveitados entre avaliações)
+_INDEX_CACHE = {}
+
+
+def limits_index(limits):
+    """Retorna (e memoriza) o índice de analitos para um dicionário de limites."""
+    key = tuple(limits.keys())
+    idx = _INDEX_CACHE.get(key)
+    if idx is None:
+        idx = build_analyte_index(key)
+        _INDEX_CACHE[key] = idx
+    return idx
+
+
+def prepare_numeric(df_raw, engine=None):
     """Converte valores e normaliza analitos para uso em legislação."""
     df = df_raw.copy()
-    df["Valor_num"], df["Censurado"] = zip(*df["Valor"].map(parse_val))
-    df["Valor_mg_L"] = df.apply(lambda r: to_mg_per_L(r["Valor_num"], r["Unidade de Medida"]), axis=1)
-    df["Analito_norm"] = df["Análise"].map(normalize_analito)
-    df["Analito_alias"] = df["Analito_norm"].map(apply_alias)
+    if resolve(engine) == "reference":
+        df["Valor_num"], df["Censurado"] = parse_rows(df["Valor"], numeric_locale(df_raw))
+        df["Valor_mg_L"] = df.apply(lambda r: to_mg_per_L(r["Valor_num"], r["Unidade de Medida"]), axis=1)
+        df["Analito_norm"] = df["Análise"].map(normalize_analito)
+        df["Analito_alias"] = df["Analito_norm"].map(apply_alias)
+    else:
+        df["Valor_num"], df["Censurado"] = parse_series(df["Valor"], numeric_locale(df_raw))
+        df["Valor_mg_L"] = to_mg_per_L_series(df["Valor_num"], df["Unidade de Medida"])
+        df["Analito_norm"] = normalize_series(df["Análise"])
+        uniq = df["Analito_norm"].unique()
+        df["Analito_alias"] = df["Analito_norm"].map(dict(zip(uniq, map(apply_alias, uniq))))
     return df
 
 
-def apply_legislation(df_raw, spec_dict):
+def apply_legislation(df_raw, spec_dict, prepared=False, engine=None):
     """
     Aplica uma legislação/especificação.
     spec_dict deve conter:
         - limits_mgL: {analito: limite}
         - prefer_total: True/False
+    prepared=True indica que df_raw já passou por prepare_numeric.
+    engine: "fast" (vetorizado) ou "reference" (linha a linha); padrão em core.engine.
     Retorna:
         - tabela detalhada
         - resumo por ID
     """
+    if resolve(engine) == "reference":
+        return apply_legislation_reference(df_raw, spec_dict, prepared)
+    return apply_legislation_fast(df_raw, spec_dict, prepared)
 
-    if not spec_dict:
-        return pd.DataFrame(), pd.DataFrame()
 
-    limits = spec_dict.get("limits_mgL", {})
-    prefer_total = spec_dict.get("prefer_total", True)
-
-    df = prepare_numeric(df_raw)
+def _legislation_base(df, prefer_total, reference=False):
+    """
+    Linhas avaliadas: Totais ou Dissolvidos conforme a especificação, com complemento.
+    reference=True classifica os métodos com o str.contains original.
+    """
 
     # Separa Dissolvidos e Totais
-    D = df[df["Método de Análise"].str.contains("Dissolvidos", case=False, na=False)].copy()
-    T = df[df["Método de Análise"].str.contains("Totais", case=False, na=False)].copy()
+    if reference:
+        D = df[df["Método de Análise"].str.contains("Dissolvidos", case=False, na=False)].copy()
+        T = df[df["Método de Análise"].str.contains("Totais", case=False, na=False)].copy()
+    else:
+        is_diss, is_tot = method_masks(df["Método de Análise"])
+        D = df[is_diss]
+        T = df[is_tot]
 
     # Escolha da base conforme especificação
     if prefer_total:
@@ -54,13 +88,44 @@ def apply_legislation(df_raw, spec_dict):
             T[~T["Analito_alias"].isin(D["Analito_alias"])]
         ], ignore_index=True)
 
+    return base
+
+
+def _summary(out):
+    """Resumo por ID: REPROVADO se houver alguma linha "Não conforme"."""
+    if out.empty:
+        return pd.DataFrame()
+    return (
+        out.groupby("Id")["Status"]
+        .apply(lambda s: "REPROVADO" if (s == "Não conforme").any() else "APROVADO")
+        .reset_index(name="Status (Legislação)")
+    )
+
+
+def apply_legislation_reference(df_raw, spec_dict, prepared=False):
+    """Motor de referência (linha a linha). Mesmo retorno de apply_legislation."""
+
+    if not spec_dict:
+        return pd.DataFrame(), pd.DataFrame()
+
+    limits = spec_dict.get("limits_mgL", {})
+    prefer_total = spec_dict.get("prefer_total", True)
+
+    df = df_raw if prepared else prepare_numeric(df_raw, engine="reference")
+    base = _legislation_base(df, prefer_total, reference=True)
+
+    # Resolve cada analito distinto para a chave do catálogo
+    resolved = resolve_analytes(limits_index(limits), base["Analito_norm"].unique()) if limits else {}
+
     rows = []
 
     for _, r in base.iterrows():
         anal = r["Analito_alias"]
         idv = r["Id"]
         val = r["Valor_mg_L"]
-        lim = limits.get(anal)
+
+        cat_name, score = resolved.get(r["Analito_norm"], (None, 0.0))
+        lim = limits.get(cat_name) if cat_name is not None else None
 
         if lim is None:
             status = "Sem limite"
@@ -73,6 +138,8 @@ def apply_legislation(df_raw, spec_dict):
             "Id": idv,
             "Analito": r["Analito_norm"],
             "Analito (alias)": anal,
+            "Analito (catálogo)": cat_name,
+            "Score": round(score, 2),
             "Valor (mg/L)": val,
             "Limite (mg/L)": lim,
             "Status": status
@@ -81,13 +148,62 @@ def apply_legislation(df_raw, spec_dict):
     out = pd.DataFrame(rows)
 
     # Resumo por ID
-    if out.empty:
-        resumo = pd.DataFrame()
-    else:
-        resumo = (
-            out.groupby("Id")["Status"]
-            .apply(lambda s: "REPROVADO" if (s == "Não conforme").any() else "APROVADO")
-            .reset_index(name="Status (Legislação)")
-        )
+    return out, _summary(out)
+
+
+def apply_legislation_fast(df_raw, spec_dict, prepared=False):
+    """Motor vetorizado. Mesmo retorno de apply_legislation_reference."""
+
+    if not spec_dict:
+        return pd.DataFrame(), pd.DataFrame()
+
+    limits = spec_dict.get("limits_mgL", {})
+    prefer_total = spec_dict.get("prefer_total", True)
+
+    df = df_raw if prepared else prepare_numeric(df_raw, engine="fast")
+    base = _legislation_base(df, prefer_total)
+    if base.empty:
+        return pd.DataFrame(), pd.DataFrame()
+
+    # Resolução e limite por analito distinto, propagados às linhas
+    codes, uniq = pd.factorize(base["Analito_norm"], use_na_sentinel=False)
+    resolved = resolve_analytes(limits_index(limits), uniq) if limits else {}
+    hits = [resolved.get(a, (None, 0.0)) for a in uniq]
+    cat = np.array([c for c, _ in hits], dtype=object)
+    score = np.array([round(sc, 2) for _, sc in hits], dtype=float)
+    lim = np.array([limits.get(c) if c is not None else None for c in cat], dtype=object)
+
+    cat, score, lim = cat[codes], score[codes], lim[codes]
+    val = pd.to_numeric(base["Valor_mg_L"], errors="coerce").to_numpy(dtype=float)
+
+    sem_limite = np.array([x is None for x in lim], dtype=bool)
+    lim_num = np.where(sem_limite, np.nan, lim).astype(float)
+    with np.errstate(invalid="ignore"):
+        conforme = val <= lim_num
 
-    return out, resumo
+    status = np.select([sem_limite, conforme], ["Sem limite", "Conforme"], default="Não conforme")
+
+    out = pd.DataFrame({
+        "Id": base["Id"].to_numpy(),
+        "Analito": base["Analito_norm"].to_numpy(),
+        "Analito (alias)": base["Analito_alias"].to_numpy(),
+        "Analito (catálogo)": cat,
+        "Score": score,
+        "Valor (mg/L)": val,
+        "Limite (mg/L)": lim,
+        "Status": status,
+    }).infer_objects()
+
+    return out, _summary(out)
+
+
+def apply_legislation_multi(df_raw, catalog, spec_keys=None, engine=None):
+    """
+    Aplica várias especificações preparando o dataframe uma única vez.
+    Retorna {especificação: (tabela detalhada, resumo por ID)}.
+    """
+    spec_keys = list(catalog.keys()) if spec_keys is None else spec_keys
+    df = prepare_numeric(df_raw, engine=engine)
+    # Resoluções novas de todas as especificações gravadas no cache uma vez por lote
+    with match_cache_batch():
+        return {k: apply_legislation(df, catalog.get(k, {}), prepared=True, engine=engine) for k in spec_keys}
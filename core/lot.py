@@ -0,0 +1,41 @@
+# core/lot.py
+# Avaliação completa de um lote: Dissolvido vs Total + QC integrados
+
+from .dissolved_total import compare_dissolved_total
+from .qc import evaluate_qc
+from .cube import lot_cube, lot_verdict
+
+
+def evaluate_lot(df_raw, qc_rules=None, lote=""):
+    """
+    Roda Dissolvido vs Total e QC e integra os status.
+    lote: rótulo do lote nas células do cubo agregado.
+    Retorna um dicionário com:
+        - dt: tabela Dissolvido vs Total
+        - qc: tabela QC
+        - qc_resumo: resumo por regra de QC
+        - id_status: status final por ID
+        - lote_status: status do lote (D/T + QC), via core.cube.lot_status
+        - df_num: dataframe numérico completo
+        - cube: cubo agregado de status (core.cube)
+    """
+    out_dt, _, id_status, df_num = compare_dissolved_total(df_raw)
+    qc_df, qc_resumo, qc_id_status, _ = evaluate_qc(df_num, qc_rules)
+
+    # Integra status QC com status D/T
+    id_status = dict(id_status)
+    for k, v in qc_id_status.items():
+        if v == "REPROVADO":
+            id_status[k] = "REPROVADO"
+
+    res = {
+        "dt": out_dt,
+        "qc": qc_df,
+        "qc_resumo": qc_resumo,
+        "id_status": id_status,
+        "df_num": df_num,
+    }
+    res["cube"] = lot_cube(res, lote)
+    # Veredito calculado sobre o cubo, como nas demais telas
+    res["lote_status"] = lot_verdict(res["cube"], lote)
+    return res
@@ -0,0 +1,324 @@
+# core/matching.py
+# Casamento aproximado (fuzzy) entre nomes de analitos do LIMS e do catálogo
+# - Índice invertido de trigramas sobre nomes + aliases do catálogo
+# - Resolve cada analito distinto uma única vez
+# - Cache persistente das resoluções (JSON), mantido em memória e gravado só com entradas novas
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from .normalize import normalize_analito, ALIASES
+
+
+MATCH_CACHE_PATH = Path(".cache/analitos_match.json")
+
+# Score mínimo para aceitar um casamento aproximado
+MIN_SCORE = 0.6
+
+# Similaridade mínima (Dice de trigramas) para dois tokens serem considerados o mesmo
+TOKEN_MIN_SCORE = 0.8
+
+# Versão do algoritmo (entra no fingerprint: resoluções antigas do cache são descartadas)
+MATCHER_VERSION = 2
+
+# Palavras que não distinguem analitos no catálogo (a fração vem do método)
+STOPWORDS = {"total", "totais", "tot", "dissolvido", "dissolvidos", "dis", "diss", "de", "do", "da"}
+
+# Símbolo químico por nome (chave de comparação) para o atalho "nome + símbolo"
+ELEMENT_SYMBOLS = {
+    "aluminio": "al", "antimonio": "sb", "arsenio": "as", "bario": "ba",
+    "berilio": "be", "boro": "b", "cadmio": "cd", "calcio": "ca",
+    "chumbo": "pb", "cobalto": "co", "cobre": "cu", "cromio": "cr",
+    "cromo": "cr", "estanho": "sn", "ferro": "fe", "itrio": "y",
+    "litio": "li", "magnesio": "mg", "manganes": "mn", "mercurio": "hg",
+    "molibdenio": "mo", "niquel": "ni", "potassio": "k", "prata": "ag",
+    "selenio": "se", "sodio": "na", "titanio": "ti", "uranio": "u",
+    "vanadio": "v", "zinco": "zn",
+    "cloreto": "cl", "fluoreto": "f", "sulfato": "so4", "nitrato": "no3",
+}
+
+
+def match_key(name) -> str:
+    """
+    Chave de comparação: normalizada, sem pontuação e sem palavras de fração.
+    Ex.: "Cromo Total (Cr)" -> "cromo cr"; "Chumbo - Pb" -> "chumbo pb"
+    """
+    s = normalize_analito(name)
+    s = re.sub(r"[^a-z0-9]+", " ", s)
+    tokens = [t for t in s.split() if t not in STOPWORDS]
+    return " ".join(tokens)
+
+
+def trigrams(key: str) -> set:
+    """Trigramas com borda (" cromo " -> " cr", "cro", ...)."""
+    s = f" {key} "
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+def token_score(a: str, b: str) -> float:
+    """Similaridade (Dice de trigramas) entre dois tokens."""
+    if a == b:
+        return 1.0
+    ga, gb = trigrams(a), trigrams(b)
+    return 2.0 * len(ga & gb) / (len(ga) + len(gb))
+
+
+def tokens_agree(query_key: str, form_key: str, symbol=None) -> bool:
+    """
+    Concordância token a token entre consulta e forma do catálogo:
+    todo token da forma aparece na consulta e todo token da consulta é explicado
+    pela forma (ou é o símbolo do elemento). Qualificadores que sobram
+    ("vi", "hexavalente", "de vinila") rejeitam o casamento.
+    """
+    q, f = query_key.split(), form_key.split()
+    if not q or not f:
+        return False
+    for t in f:
+        if max(token_score(t, u) for u in q) < TOKEN_MIN_SCORE:
+            return False
+    for u in q:
+        if u == symbol:
+            continue
+        if max(token_score(t, u) for t in f) < TOKEN_MIN_SCORE:
+            return False
+    return True
+
+
+def build_analyte_index(names, aliases=None):
+    """
+    Constrói o índice de busca sobre os nomes do catálogo.
+    Cada nome recebe como formas alternativas os aliases que apontam
+    para o mesmo analito canônico (ex.: "Crômio" <- "cromo", "cromio total").
+    Retorna um dicionário com:
+        - names: nomes originais do catálogo
+        - exact: forma -> índice do nome
+        - forms / form_keys / form_len / postings: índice invertido de trigramas
+        - symbols: símbolo químico de cada nome (ou None)
+        - fingerprint: hash do catálogo (chave do cache persistente)
+    """
+    aliases = ALIASES if aliases is None else aliases
+    names = list(dict.fromkeys(n for n in names if n))
+
+    # canônico -> variantes (ALIASES: variante -> canônico)
+    by_canon = {}
+    for variant, canon in aliases.items():
+        by_canon.setdefault(canon, set()).add(variant)
+
+    index = {
+        "names": names,
+        "exact": {},
+        "forms": [],
+        "form_keys": [],
+        "form_len": [],
+        "postings": {},
+        "symbols": [],
+    }
+
+    for i, name in enumerate(names):
+        norm = normalize_analito(name)
+        canon = aliases.get(norm, norm)
+
+        variants = {norm, canon} | by_canon.get(canon, set())
+        index["symbols"].append(next(
+            (ELEMENT_SYMBOLS[k] for k in map(match_key, sorted(variants)) if k in ELEMENT_SYMBOLS),
+            None,
+        ))
+
+        for v in variants:
+            for form in (v, match_key(v)):
+                if form:
+                    index["exact"].setdefault(form, i)
+
+            key = match_key(v)
+            if not key:
+                continue
+
+            fid = len(index["forms"])
+            grams = trigrams(key)
+            index["forms"].append(i)
+            index["form_keys"].append(key)
+            index["form_len"].append(len(grams))
+            for g in grams:
+                index["postings"].setdefault(g, []).append(fid)
+
+    digest = hashlib.sha1(f"v{MATCHER_VERSION}\0".encode("utf-8"))
+    for name in names:
+        digest.update(name.encode("utf-8") + b"\0")
+    for variant, canon in sorted(aliases.items()):
+        digest.update(f"{variant}>{canon}\0".encode("utf-8"))
+    index["fingerprint"] = digest.hexdigest()
+
+    return index
+
+
+def match_analyte(index, name, min_score=MIN_SCORE):
+    """
+    Resolve um analito para o nome do catálogo mais próximo.
+    Retorna (nome_catalogo, score) ou (None, melhor_score).
+    """
+    norm = normalize_analito(name)
+    if not norm:
+        return None, 0.0
+
+    exact = index["exact"]
+
+    # 1) Forma exata (inclui aliases como "cr+6")
+    if norm in exact:
+        return index["names"][exact[norm]], 1.0
+
+    key = match_key(norm)
+    if not key:
+        return None, 0.0
+
+    if key in exact:
+        return index["names"][exact[key]], 1.0
+
+    # 2) Nome + símbolo químico: "chumbo pb", "cromo cr"
+    #    (só quando o token curto é de fato o símbolo daquele elemento)
+    tokens = key.split()
+    if len(tokens) > 1:
+        for sym in set(tokens) & set(ELEMENT_SYMBOLS.values()):
+            rest = " ".join(t for t in tokens if t != sym)
+            i = exact.get(rest)
+            if i is not None and index["symbols"][i] == sym:
+                return index["names"][i], 0.95
+
+    # 3) Similaridade de trigramas (Dice) via índice invertido,
+    #    aceita só com concordância token a token
+    grams = trigrams(key)
+    counts = {}
+    postings = index["postings"]
+    for g in grams:
+        for fid in postings.get(g, ()):
+            counts[fid] = counts.get(fid, 0) + 1
+
+    n_q = len(grams)
+    form_len = index["form_len"]
+    scored = sorted(
+        ((2.0 * c / (n_q + form_len[fid]), fid) for fid, c in counts.items()),
+        reverse=True,
+    )
+    best_score = scored[0][0] if scored else 0.0
+
+    for score, fid in scored:
+        if score < min_score:
+            break
+        i = index["forms"][fid]
+        if tokens_agree(key, index["form_keys"][fid], index["symbols"][i]):
+            return index["names"][i], score
+
+    return None, best_score
+
+
+def load_match_cache(path=MATCH_CACHE_PATH):
+    """
+    Carrega o cache persistente de resoluções
+    ({fingerprint: {min_score: {analito: [nome, score]}}}).
+    """
+    path = Path(path)
+    if not path.exists():
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def save_match_cache(cache, path=MATCH_CACHE_PATH):
+    """Grava o cache persistente (temporário exclusivo + os.replace: seguro entre threads)."""
+    path = Path(path)
+    tmp = None
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=path.parent, prefix=path.name, suffix=".tmp", delete=False
+        ) as f:
+            tmp = f.name
+            json.dump(cache, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    except OSError:
+        if tmp is not None and os.path.exists(tmp):
+            os.remove(tmp)
+
+
+# Cache em memória por arquivo (lido uma vez por processo)
+_CACHES = {}          # caminho -> {fingerprint: {min_score: {analito: [nome, score]}}}
+_DIRTY = set()        # caminhos com entradas ainda não gravadas
+_CACHE_LOCK = threading.Lock()
+_BATCH = threading.local()
+
+
+def _memory_cache(path):
+    """Cache em memória de `path` (chamado com _CACHE_LOCK)."""
+    key = str(path)
+    cache = _CACHES.get(key)
+    if cache is None:
+        cache = _CACHES[key] = load_match_cache(path)
+    return cache
+
+
+def flush_match_cache(path=None):
+    """
+    Grava os caches com entradas novas (path=None: todos).
+    Resoluções gravadas por outro processo nesse meio-tempo são mescladas, não perdidas.
+    """
+    with _CACHE_LOCK:
+        for key in [k for k in _DIRTY if path is None or k == str(path)]:
+            cache = _CACHES[key]
+            for fp, by_score in load_match_cache(key).items():
+                for sc, hits in by_score.items():
+                    mine = cache.setdefault(fp, {}).setdefault(sc, {})
+                    for n, hit in hits.items():
+                        mine.setdefault(n, hit)
+            save_match_cache(cache, key)
+            _DIRTY.discard(key)
+
+
+@contextmanager
+def match_cache_batch():
+    """Agrupa as gravações do cache (ex.: todas as especificações de um lote) em uma só, no fim."""
+    _BATCH.depth = getattr(_BATCH, "depth", 0) + 1
+    try:
+        yield
+    finally:
+        _BATCH.depth -= 1
+        if _BATCH.depth == 0:
+            flush_match_cache()
+
+
+def resolve_analytes(index, names, cache_path=MATCH_CACHE_PATH, min_score=MIN_SCORE):
+    """
+    Resolve cada analito *distinto* para o catálogo.
+    Usa o cache (se cache_path não for None), lido do disco uma vez por processo e
+    separado por min_score: mudar o limiar não reaproveita resoluções antigas.
+    Só grava quando há resoluções novas (uma vez por bloco match_cache_batch).
+    Retorna {analito: (nome_catalogo | None, score)}.
+    """
+    distinct = list(dict.fromkeys(n for n in names if n))
+
+    known = {}
+    if cache_path is not None:
+        with _CACHE_LOCK:
+            known = _memory_cache(cache_path).setdefault(index["fingerprint"], {}).setdefault(f"{min_score:g}", {})
+            hits = {n: known.get(n) for n in distinct}
+    else:
+        hits = dict.fromkeys(distinct)
+
+    new = {n: list(match_analyte(index, n, min_score=min_score)) for n, h in hits.items() if h is None}
+    hits.update(new)
+
+    if new and cache_path is not None:
+        with _CACHE_LOCK:
+            known.update(new)
+            _DIRTY.add(str(cache_path))
+        if getattr(_BATCH, "depth", 0) == 0:
+            flush_match_cache(cache_path)
+
+    return {n: (h[0], h[1]) for n, h in hits.items()}
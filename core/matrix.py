@@ -0,0 +1,110 @@
+# core/matrix.py
+# Representação densa de um lote: matriz Id × (analito, fração)
+# - Valores em mg/L (float, NaN = ausente) + máscara de censura (<LQ)
+# - Construída uma vez por lote, a partir do lote preparado (core.duplicates.prepare_numeric)
+# - Base das regras de consistência entre analitos (core/cross_rules.py)
+
+import re
+
+import numpy as np
+import pandas as pd
+
+from .duplicates import prepare_numeric
+from .keys import method_masks, factorize_keys
+from .normalize import ALIASES
+
+
+FRAC_DISS = "D"
+FRAC_TOT = "T"
+FRAC_OUTRO = ""
+
+_FRACTION_SUFFIX = re.compile(r"\s+(?:dissolvido|total)$")
+
+
+def analyte_base(name_norm: str) -> str:
+    """
+    Nome do analito sem a fração ("cromo dissolvido" -> "cromo"),
+    com os sinônimos de ALIASES ("cromio" -> "cromo", "cr vi" -> "cromo hexavalente").
+    """
+    s = _FRACTION_SUFFIX.sub("", name_norm)
+    return _FRACTION_SUFFIX.sub("", ALIASES.get(s, s))
+
+
+def analyte_fraction(name_norm: str) -> str:
+    """Fração indicada pelo sufixo do nome ("zinco dissolvido" -> "D", "zinco total" -> "T", senão "")."""
+    m = _FRACTION_SUFFIX.search(name_norm)
+    if m is None:
+        return FRAC_OUTRO
+    return FRAC_DISS if m.group(0).strip() == "dissolvido" else FRAC_TOT
+
+
+def build_matrix(df_raw, prepared=False):
+    """
+    Pivota o lote em matrizes densas.
+    Cada (Id, analito, fração) fica com o primeiro resultado do lote com valor
+    em mg/L; unidades em % (recuperações de QC) não entram.
+    Retorna um dicionário com:
+        - ids: Index dos Ids (linhas)
+        - cols: MultiIndex (analito, fração) (colunas)
+        - values: float64 [n_ids × n_cols], NaN onde não há resultado
+        - censored: bool [n_ids × n_cols], True onde o valor é <LQ (valor = LQ)
+        - col_index: {(analito, fração): coluna}
+    """
+    df = df_raw if prepared else prepare_numeric(df_raw)
+
+    val = df["Valor_mg_L"].to_numpy(dtype=float)
+    keep = ~np.isnan(val) & (df["Unidade de Medida"].astype(str).str.strip() != "%").to_numpy()
+    df = df.loc[keep]
+    val = val[keep]
+
+    # Nome base e fração do nome avaliados uma vez por analito distinto
+    a_codes, a_uniq = pd.factorize(df["Analito_norm"])
+    base = np.array([analyte_base(a) for a in a_uniq] + [""], dtype=object)[a_codes]
+    name_frac = np.array([analyte_fraction(a) for a in a_uniq] + [FRAC_OUTRO], dtype=object)[a_codes]
+
+    # Fração pelo método; método genérico (nem D nem T) usa o sufixo do nome
+    # ("Zinco Dissolvido" e "Zinco Total" não colapsam na mesma coluna)
+    diss, tot = method_masks(df["Método de Análise"])
+    frac = np.where(tot, FRAC_TOT, np.where(diss, FRAC_DISS, name_frac))
+
+    keys = pd.DataFrame({"analito": base, "fracao": frac})
+    c_codes = factorize_keys(keys, cols=["analito", "fracao"])[0]
+    r_codes, ids = pd.factorize(df["Id"])
+
+    n_cols = int(c_codes.max()) + 1 if len(c_codes) else 0
+    first = np.zeros(n_cols, dtype=np.int64)
+    if n_cols:
+        _, pos = np.unique(c_codes, return_index=True)
+        first = pos
+
+    cols = pd.MultiIndex.from_arrays(
+        [keys["analito"].to_numpy()[first], keys["fracao"].to_numpy()[first]],
+        names=["analito", "fracao"],
+    )
+
+    # Primeira ocorrência de cada célula (Id, coluna)
+    cell = r_codes.astype(np.int64) * max(n_cols, 1) + c_codes
+    _, first_row = np.unique(cell, return_index=True)
+
+    values = np.full((len(ids), n_cols), np.nan)
+    censored = np.zeros((len(ids), n_cols), dtype=bool)
+    values[r_codes[first_row], c_codes[first_row]] = val[first_row]
+    censored[r_codes[first_row], c_codes[first_row]] = df["Censurado"].to_numpy(dtype=bool)[first_row]
+
+    return {
+        "ids": pd.Index(ids, name="Id"),
+        "cols": cols,
+        "values": values,
+        "censored": censored,
+        "col_index": {k: j for j, k in enumerate(cols)},
+    }
+
+
+def matrix_frame(matrix, censored_as_text=False):
+    """Visualização da matriz como DataFrame (opcionalmente com "<" nos valores censurados)."""
+    values = matrix["values"]
+    if censored_as_text:
+        txt = np.where(np.isnan(values), "", values.astype(str)).astype(object)
+        txt[matrix["censored"]] = "<" + txt[matrix["censored"]]
+        values = txt
+    return pd.DataFrame(values, index=matrix["ids"], columns=matrix["cols"])
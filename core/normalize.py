@@ -58,8 +58,13 @@ ALIASES = {
     "cr vi": "cromo hexavalente",
     "crvi": "cromo hexavalente",
     "cr 6": "cromo hexavalente",
+    "cromo vi": "cromo hexavalente",
+    "cromio vi": "cromo hexavalente",
+    "cromo 6": "cromo hexavalente",
     "cr iii": "cromo trivalente",
     "cr3+": "cromo trivalente",
+    "cromo iii": "cromo trivalente",
+    "cromio iii": "cromo trivalente",
 
     # Ítrio
     "itrio": "itrio",
@@ -69,6 +74,7 @@ ALIASES = {
     "chumbo": "chumbo total",
     "pb": "chumbo total",
     "arsenio": "arsenio total",
+    "arsenico": "arsenio total",
     "cadmio": "cadmio total",
     "mercurio": "mercurio total",
 }
@@ -82,3 +88,10 @@ def apply_alias(name: str) -> str:
         return ""
     n = normalize_analito(name)
     return ALIASES.get(n, n)
+
+
+def normalize_series(series):
+    """normalize_analito aplicado a uma coluna, avaliando cada nome distinto uma vez."""
+    codes, uniques = pd.factorize(series)
+    table = pd.Series([normalize_analito(u) for u in uniques] + [""], dtype=object).to_numpy()
+    return pd.Series(table[codes], index=series.index, dtype=object).astype(str)
@@ -1,6 +1,9 @@
 # core/parsing.py
 # Funções robustas para interpretar valores numéricos e censurados
+# + detecção da convenção numérica (decimal/milhar) por arquivo
 
+import re
+import numpy as np
 import pandas as pd
 import unicodedata
 
@@ -12,18 +15,22 @@ def normalize_text(s: str) -> str:
     return "".join(c for c in s if not unicodedata.combining(c))
 
 
-def parse_val(raw):
+def parse_val(raw, decimal=",", thousands="."):
     """
     Converte valores como:
     - "< 0,3"
-    - "<0.3"
+    - "<0.3" (com decimal=".", thousands=",")
     - "1.200,5"
     - "0,05"
+    Números já convertidos pelo leitor (float/int) são mantidos.
     Retorna (valor_float, censurado_bool)
     """
     if pd.isna(raw):
         return None, False
 
+    if isinstance(raw, (int, float, np.number)) and not isinstance(raw, bool):
+        return float(raw), False
+
     s = str(raw).strip()
     cens = s.startswith("<")
 
@@ -31,10 +38,12 @@ def parse_val(raw):
     s = s.replace("<", "").strip()
 
     # Remove milhar
-    s = s.replace(".", "")
+    if thousands:
+        s = s.replace(thousands, "")
 
-    # Troca vírgula por ponto
-    s = s.replace(",", ".")
+    # Troca separador decimal por ponto
+    if decimal != ".":
+        s = s.replace(decimal, ".")
 
     try:
         v = float(s)
@@ -42,3 +51,189 @@ def parse_val(raw):
         v = None
 
     return v, cens
+
+
+# ---------------------------------------------------------
+# Detecção da convenção numérica
+# ---------------------------------------------------------
+
+LOCALE_PT = {"decimal": ",", "thousands": "."}
+LOCALE_EN = {"decimal": ".", "thousands": ","}
+
+LOCALE_COLUMNS = ["Valor", "LQ - Limite Quantificação"]
+
+# Amostra máxima de valores distintos por coluna
+LOCALE_SAMPLE = 500
+
+_CLEAN = re.compile(r"[<>\s]")
+_AMBIG_COMMA = re.compile(r"^-?[1-9]\d{0,2},\d{3}$")   # "1,200": milhar ou decimal?
+_AMBIG_DOT = re.compile(r"^-?[1-9]\d{0,2}\.\d{3}$")     # "1.200": milhar ou decimal?
+
+
+def _vote(s: str):
+    """
+    Classifica um valor textual:
+        "pt"   -> decimal vírgula
+        "en"   -> decimal ponto
+        "amb"  -> compatível com ambas
+        None   -> sem evidência (inteiro, texto)
+    """
+    s = _CLEAN.sub("", s)
+    has_c = "," in s
+    has_d = "." in s
+
+    if has_c and has_d:
+        # O último separador é o decimal: "1.200,5" / "1,200.5"
+        return "pt" if s.rfind(",") > s.rfind(".") else "en"
+
+    if has_c:
+        if s.count(",") > 1:
+            return "en"
+        return "amb" if _AMBIG_COMMA.match(s) else "pt"
+
+    if has_d:
+        if s.count(".") > 1:
+            return "pt"
+        return "amb" if _AMBIG_DOT.match(s) else "en"
+
+    return None
+
+
+def detect_numeric_locale(df, columns=None, sample=LOCALE_SAMPLE):
+    """
+    Decide a convenção decimal/milhar de um arquivo a partir de uma amostra
+    dos valores distintos de "Valor" e "LQ - Limite Quantificação".
+    Retorna um dicionário com:
+        - decimal / thousands: separadores escolhidos
+        - confianca: 0–1
+        - nivel: "alta", "média" ou "baixa"
+        - diagnosticos: lista de mensagens (colunas ambíguas ou conflitantes)
+    """
+    columns = LOCALE_COLUMNS if columns is None else columns
+
+    votes = {"pt": 0, "en": 0, "amb": 0}
+    diagnosticos = []
+
+    for col in columns:
+        if col not in df.columns:
+            continue
+
+        s = df[col]
+        if pd.api.types.is_numeric_dtype(s):
+            # Já convertida pelo leitor: ponto decimal
+            continue
+
+        uniq = pd.unique(s.dropna())[:sample]
+        col_votes = {"pt": 0, "en": 0, "amb": 0}
+        for v in uniq:
+            if isinstance(v, str):
+                k = _vote(v)
+                if k is not None:
+                    col_votes[k] += 1
+
+        for k in votes:
+            votes[k] += col_votes[k]
+
+        decisive = col_votes["pt"] + col_votes["en"]
+        if col_votes["pt"] and col_votes["en"]:
+            diagnosticos.append(
+                f"Coluna '{col}': convenções misturadas "
+                f"({col_votes['pt']} com vírgula decimal, {col_votes['en']} com ponto decimal)"
+            )
+        elif decisive == 0 and col_votes["amb"]:
+            diagnosticos.append(
+                f"Coluna '{col}': {col_votes['amb']} valores ambíguos (ex.: '1.200' / '1,200'); "
+                "convenção não determinável pela coluna"
+            )
+
+    decisive = votes["pt"] + votes["en"]
+
+    if decisive == 0:
+        # Sem evidência: assume o padrão brasileiro
+        loc = dict(LOCALE_PT)
+        confianca = 0.5 if votes["amb"] else 1.0
+        if votes["amb"]:
+            diagnosticos.append("Convenção numérica ambígua; assumido vírgula decimal e ponto de milhar.")
+    else:
+        loc = dict(LOCALE_PT) if votes["pt"] >= votes["en"] else dict(LOCALE_EN)
+        confianca = max(votes["pt"], votes["en"]) / decisive
+
+    if confianca >= 0.95:
+        nivel = "alta"
+    elif confianca >= 0.75:
+        nivel = "média"
+    else:
+        nivel = "baixa"
+
+    loc.update({"confianca": round(confianca, 3), "nivel": nivel, "diagnosticos": diagnosticos})
+    return loc
+
+
+def numeric_locale(df):
+    """
+    Convenção numérica do arquivo (detectada uma vez e guardada em df.attrs,
+    que acompanha as cópias do dataframe).
+    """
+    loc = df.attrs.get("numeric_locale")
+    if loc is None:
+        loc = detect_numeric_locale(df)
+        df.attrs["numeric_locale"] = loc
+    return loc
+
+
+def parse_rows(series, locale=None):
+    """
+    parse_val linha a linha (motor de referência), com os separadores da
+    convenção do arquivo. Independente de parse_series, para servir de comparação.
+    Retorna (valores, censurado) como Series alinhadas ao índice (None = sem valor).
+    """
+    locale = LOCALE_PT if locale is None else locale
+    pairs = [parse_val(v, locale["decimal"], locale["thousands"]) for v in series]
+    return (
+        pd.Series([p[0] for p in pairs], index=series.index, dtype=object),
+        pd.Series([p[1] for p in pairs], index=series.index, dtype=bool),
+    )
+
+
+def parse_series(series, locale=None):
+    """
+    Versão em lote de parse_val.
+    Converte os valores distintos de uma vez (operações vetorizadas de texto)
+    conforme a convenção do arquivo e propaga para todas as linhas.
+    Retorna (valores_float, censurado_bool) como Series alinhadas ao índice.
+    """
+    locale = LOCALE_PT if locale is None else locale
+
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return (
+            series.astype(float),
+            pd.Series(False, index=series.index),
+        )
+
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    uniques = pd.Series(uniques, dtype=object)
+
+    vals = np.full(len(uniques) + 1, np.nan)
+    cens = np.zeros(len(uniques) + 1, dtype=bool)
+
+    # Números já convertidos pelo leitor são mantidos
+    is_num = uniques.map(lambda x: isinstance(x, (int, float, np.number)) and not isinstance(x, bool)).to_numpy(dtype=bool)
+    if is_num.any():
+        vals[:-1][is_num] = uniques[is_num].astype(float).to_numpy()
+
+    if (~is_num).any():
+        s = uniques[~is_num].astype(str).str.strip()
+        c = s.str.startswith("<").to_numpy(dtype=bool)
+        s = s.str.replace("<", "", regex=False).str.strip()
+        if locale.get("thousands"):
+            s = s.str.replace(locale["thousands"], "", regex=False)
+        if locale.get("decimal", ".") != ".":
+            s = s.str.replace(locale["decimal"], ".", regex=False)
+        vals[:-1][~is_num] = pd.to_numeric(s, errors="coerce").to_numpy(dtype=float)
+        cens[:-1][~is_num] = c
+
+    # Código -1 (NA) aponta para a última posição: (NaN, False)
+    return (
+        pd.Series(vals[codes], index=series.index),
+        pd.Series(cens[codes], index=series.index),
+    )
@@ -0,0 +1,171 @@
+# core/profiles.py
+# Perfis de mapeamento de colunas por layout de LIMS
+# - Cada perfil associa as colunas canônicas do OPERALAB aos cabeçalhos do LIMS
+# - O perfil é detectado pela linha de cabeçalho, antes de ler os dados
+# - Colunas obrigatórias ausentes geram SchemaError já na leitura do cabeçalho
+# - Perfis adicionais podem ser declarados em perfis_lims.json
+
+import json
+import re
+from pathlib import Path
+
+from .normalize import strip_accents
+
+
+PROFILES_PATH = Path("perfis_lims.json")
+
+# Colunas canônicas (nomes usados por todo o core)
+COL_ID = "Id"
+COL_AMOSTRA = "Nº Amostra"
+COL_METODO = "Método de Análise"
+COL_ANALISE = "Análise"
+COL_VALOR = "Valor"
+COL_UNIDADE = "Unidade de Medida"
+COL_LQ = "LQ - Limite Quantificação"
+COL_EQUIPAMENTO = "Equipamento"
+
+REQUIRED = [COL_ID, COL_METODO, COL_ANALISE, COL_VALOR, COL_UNIDADE]
+OPTIONAL = [COL_AMOSTRA, COL_LQ, COL_EQUIPAMENTO]
+CANONICAL = [COL_ID, COL_AMOSTRA, COL_METODO, COL_ANALISE, COL_VALOR, COL_UNIDADE, COL_LQ, COL_EQUIPAMENTO]
+
+
+# Perfil: {coluna canônica: [cabeçalhos aceitos, em ordem de preferência]}
+DEFAULT_PROFILES = {
+    "OPERALAB": {
+        COL_ID: ["Id"],
+        COL_AMOSTRA: ["Nº Amostra"],
+        COL_METODO: ["Método de Análise"],
+        COL_ANALISE: ["Análise"],
+        COL_VALOR: ["Valor"],
+        COL_UNIDADE: ["Unidade de Medida"],
+        COL_LQ: ["LQ - Limite Quantificação", "LQ"],
+        COL_EQUIPAMENTO: ["Equipamento", "Instrumento"],
+    },
+    "LIMS pt (abreviado)": {
+        COL_ID: ["Id", "ID Amostra", "Código"],
+        COL_AMOSTRA: ["Nº Amostra", "No Amostra", "Número da Amostra", "Amostra"],
+        COL_METODO: ["Método", "Metodo", "Método Analítico"],
+        COL_ANALISE: ["Parâmetro", "Parametro", "Analito", "Ensaio"],
+        COL_VALOR: ["Resultado", "Valor"],
+        COL_UNIDADE: ["Unidade", "Un"],
+        COL_LQ: ["LQ", "Limite de Quantificação", "LQ (mg/L)"],
+        COL_EQUIPAMENTO: ["Equipamento", "Instrumento"],
+    },
+    "LIMS en": {
+        COL_ID: ["Sample ID", "Lab ID", "SampleID", "ID"],
+        COL_AMOSTRA: ["Client Sample ID", "Sample Name", "Sample Number"],
+        COL_METODO: ["Method", "Test Method", "Analysis Method"],
+        COL_ANALISE: ["Analyte", "Parameter", "Compound"],
+        COL_VALOR: ["Result", "Result Value", "Value"],
+        COL_UNIDADE: ["Units", "Unit", "Result Units"],
+        COL_LQ: ["LOQ", "Reporting Limit", "RL", "PQL"],
+        COL_EQUIPAMENTO: ["Instrument"],
+    },
+}
+
+
+class SchemaError(ValueError):
+    """Cabeçalho sem as colunas obrigatórias de nenhum perfil."""
+
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def header_key(name) -> str:
+    """Forma comparável de um cabeçalho: sem acento, minúsculas, só letras/dígitos."""
+    s = strip_accents(str(name)).lower().replace("º", "o").replace("°", "o")
+    return _NON_ALNUM.sub(" ", s).strip()
+
+
+# Perfis já lidos: {caminho: (mtime_ns, perfis)}
+_LOADED = {}
+
+
+def load_profiles(path=PROFILES_PATH):
+    """
+    Perfis padrão + perfis do arquivo (mesmo formato de DEFAULT_PROFILES).
+    O arquivo é lido uma vez (e de novo só se for alterado).
+    SchemaError se o arquivo não for um JSON nesse formato.
+    """
+    path = Path(path)
+    try:
+        mtime = path.stat().st_mtime_ns
+    except OSError:
+        return DEFAULT_PROFILES
+
+    cached = _LOADED.get(str(path))
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    try:
+        extra = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        raise SchemaError(f"Arquivo de perfis '{path}' inválido: {e}") from e
+    if not isinstance(extra, dict) or not all(
+        isinstance(m, dict) and all(isinstance(v, (str, list)) for v in m.values())
+        for m in extra.values()
+    ):
+        raise SchemaError(
+            f"Arquivo de perfis '{path}' inválido: esperado "
+            '{"Nome do perfil": {"Coluna": ["Cabeçalho", ...]}}.'
+        )
+
+    profiles = dict(DEFAULT_PROFILES)
+    for name, mapping in extra.items():
+        profiles[name] = {c: ([v] if isinstance(v, str) else list(v)) for c, v in mapping.items()}
+    _LOADED[str(path)] = (mtime, profiles)
+    return profiles
+
+
+def _match(header, mapping):
+    """{coluna canônica: cabeçalho original} para um perfil."""
+    by_key = {}
+    for h in header:
+        by_key.setdefault(header_key(h), h)
+
+    found = {}
+    used = set()
+    for canon in CANONICAL:
+        for alias in mapping.get(canon, []):
+            h = by_key.get(header_key(alias))
+            if h is not None and h not in used:
+                found[canon] = h
+                used.add(h)
+                break
+    return found
+
+
+def detect_profile(header, profiles=None, profile=None):
+    """
+    Escolhe o perfil pelo cabeçalho.
+    profile: nome de um perfil para forçar (sem detecção).
+    Retorna (nome do perfil, {coluna canônica: cabeçalho original}).
+    SchemaError se nenhum perfil cobre as colunas obrigatórias.
+    """
+    profiles = load_profiles() if profiles is None else profiles
+    header = [h for h in header if h is not None and str(h).strip()]
+
+    if profile is not None:
+        if profile not in profiles:
+            raise SchemaError(f"Perfil de colunas desconhecido: '{profile}'.")
+        candidates = {profile: profiles[profile]}
+    else:
+        candidates = profiles
+
+    best = None
+    for name, mapping in candidates.items():
+        found = _match(header, mapping)
+        req = sum(c in found for c in REQUIRED)
+        score = (req, len(found))
+        if best is None or score > best[0]:
+            best = (score, name, found)
+
+    _, name, found = best
+    missing = [c for c in REQUIRED if c not in found]
+    if missing:
+        raise SchemaError(
+            f"Colunas obrigatórias ausentes: {', '.join(missing)} "
+            f"(perfil mais próximo: '{name}'; cabeçalho: {', '.join(map(str, header[:12]))}"
+            f"{'…' if len(header) > 12 else ''})."
+        )
+    return name, found
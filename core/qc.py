@@ -1,19 +1,38 @@
 # core/qc.py
 # Avaliação de QC Ítrio (70–130%) com detecção robusta
+# + motor de regras configurável (padrões internos, LCS, spikes)
 
+import re
+import numpy as np
 import pandas as pd
-from .parsing import parse_val
+from .parsing import parse_val, parse_series, numeric_locale, LOCALE_PT
 from .normalize import strip_accents
+from .engine import resolve
 
 
-def evaluate_qc_itrio(df_raw):
+def evaluate_qc_itrio(df_raw, engine=None):
     """
     Avalia QC Ítrio com faixa 70–130%.
+    engine: "fast" (vetorizado) ou "reference" (linha a linha); padrão em core.engine.
     Retorna:
         - tabela QC
         - status por ID
         - flag se há NC global
     """
+    if resolve(engine) == "reference":
+        return evaluate_qc_itrio_reference(df_raw)
+    return evaluate_qc_itrio_fast(df_raw)
+
+
+def _itrio_rows(df_raw):
+    """Linhas de Ítrio em %."""
+    analise = df_raw["Análise"].astype(str).apply(strip_accents).str.lower()
+    unidade = df_raw["Unidade de Medida"].astype(str).str.strip().str.lower()
+    return df_raw[analise.str.contains("itrio") & (unidade == "%")]
+
+
+def evaluate_qc_itrio_reference(df_raw):
+    """Motor de referência (linha a linha). Mesmo retorno de evaluate_qc_itrio."""
 
     df = df_raw.copy()
 
@@ -66,3 +85,237 @@ def evaluate_qc_itrio(df_raw):
     out_df = pd.DataFrame(out_rows)
 
     return out_df, id_status, has_nc_global
+
+
+def evaluate_qc_itrio_fast(df_raw):
+    """Motor vetorizado. Mesmo retorno de evaluate_qc_itrio_reference."""
+
+    qc_df = _itrio_rows(df_raw)
+    if qc_df.empty:
+        return pd.DataFrame(), {}, False
+
+    # Mesma convenção fixa da referência (parse_val: vírgula decimal)
+    rec, _ = parse_series(qc_df["Valor"], LOCALE_PT)
+    rec = rec.to_numpy(dtype=float)
+
+    sem_dado = np.isnan(rec)
+    ok = (rec >= 70.0) & (rec <= 130.0)
+    nc = ~sem_dado & ~ok
+
+    out_df = pd.DataFrame({
+        "Id": qc_df["Id"].to_numpy(),
+        "Nº Amostra": qc_df["Nº Amostra"].to_numpy() if "Nº Amostra" in qc_df.columns else "",
+        "Método de Análise": qc_df["Método de Análise"].to_numpy(),
+        "Análise": qc_df["Análise"].to_numpy(),
+        "Recuperação (%)": rec,
+        "Status": np.select([sem_dado, ok], ["Sem dado", "OK"], default="NÃO CONFORME"),
+        "Observação": np.select(
+            [sem_dado, ok],
+            ["Valor de recuperação ausente ou inválido", "Recuperação dentro de 70–130%"],
+            default="Recuperação fora de 70–130%",
+        ),
+    }).infer_objects()
+
+    # Status por ID na ordem de primeira aparição
+    any_nc = pd.Series(nc).groupby(qc_df["Id"].to_numpy(), sort=False, dropna=False).any()
+    id_status = {k: ("REPROVADO" if v else "APROVADO") for k, v in any_nc.items()}
+
+    return out_df, id_status, bool(nc.any())
+
+
+# ---------------------------------------------------------
+# Motor de regras de QC (vetorizado)
+# ---------------------------------------------------------
+
+# Cada regra:
+#   - nome: rótulo exibido
+#   - analito: regex aplicada à "Análise" normalizada (sem acento, minúscula)
+#   - metodo: regex opcional aplicada ao "Método de Análise" normalizado
+#   - unidade: unidade exigida (comparação normalizada), ex.: "%"
+#   - min / max: faixa de aceitação (inclusiva)
+# A primeira regra que casar com a linha é a que a avalia.
+
+DEFAULT_QC_RULES = [
+    {"nome": "Ítrio",    "analito": r"itrio",   "metodo": None, "unidade": "%", "min": 70.0, "max": 130.0},
+    {"nome": "Escândio", "analito": r"escandio", "metodo": None, "unidade": "%", "min": 70.0, "max": 130.0},
+    {"nome": "Índio",    "analito": r"\bindio", "metodo": None, "unidade": "%", "min": 70.0, "max": 130.0},
+    {"nome": "Ródio",    "analito": r"rodio",   "metodo": None, "unidade": "%", "min": 70.0, "max": 130.0},
+    {"nome": "Bismuto",  "analito": r"bismuto", "metodo": None, "unidade": "%", "min": 70.0, "max": 130.0},
+    {"nome": "LCS",      "analito": r"\blcs\b|controle de laboratorio", "metodo": None, "unidade": "%", "min": 80.0, "max": 120.0},
+    {"nome": "Spike de matriz", "analito": r"\bmsd?\b|spike|fortificad", "metodo": None, "unidade": "%", "min": 75.0, "max": 125.0},
+]
+
+
+def _norm_text(s) -> str:
+    return strip_accents(s).strip().lower()
+
+
+def compile_qc_rules(rules=None):
+    """
+    Compila a tabela de regras uma única vez (regex + limites em arrays).
+    Aceita a lista de dicionários no formato de DEFAULT_QC_RULES.
+    """
+    rules = DEFAULT_QC_RULES if rules is None else rules
+
+    compiled = {
+        "nome": [],
+        "analito": [],
+        "metodo": [],
+        "unidade": [],
+        "obs_ok": [],
+        "obs_nc": [],
+        "faixa": [],
+    }
+    lows = []
+    highs = []
+
+    for r in rules:
+        lo = float(r["min"])
+        hi = float(r["max"])
+        faixa = f"{lo:g}–{hi:g}"
+
+        compiled["nome"].append(r.get("nome") or r["analito"])
+        compiled["analito"].append(re.compile(r["analito"]))
+        compiled["metodo"].append(re.compile(r["metodo"]) if r.get("metodo") else None)
+        compiled["unidade"].append(_norm_text(r["unidade"]) if r.get("unidade") else None)
+        compiled["faixa"].append(faixa)
+        compiled["obs_ok"].append(f"Recuperação dentro de {faixa}%")
+        compiled["obs_nc"].append(f"Recuperação fora de {faixa}%")
+        lows.append(lo)
+        highs.append(hi)
+
+    compiled["min"] = np.array(lows, dtype=float)
+    compiled["max"] = np.array(highs, dtype=float)
+    return compiled
+
+
+_DEFAULT_COMPILED = None
+
+
+def _default_compiled():
+    global _DEFAULT_COMPILED
+    if _DEFAULT_COMPILED is None:
+        _DEFAULT_COMPILED = compile_qc_rules(DEFAULT_QC_RULES)
+    return _DEFAULT_COMPILED
+
+
+def _distinct_mask(codes, uniques_norm, pattern):
+    """Avalia a regex só nos valores distintos e expande para as linhas."""
+    hit = np.fromiter((bool(pattern.search(u)) for u in uniques_norm), dtype=bool, count=len(uniques_norm))
+    hit = np.append(hit, False)  # código -1 (NA) nunca casa
+    return hit[codes]
+
+
+def match_qc_rules(df, compiled):
+    """
+    Retorna, para cada linha, o índice da primeira regra que casa (-1 se nenhuma).
+    """
+    n = len(df)
+    rule_idx = np.full(n, -1, dtype=int)
+    if n == 0 or len(compiled["nome"]) == 0:
+        return rule_idx
+
+    a_codes, a_uniq = pd.factorize(df["Análise"].astype(str))
+    m_codes, m_uniq = pd.factorize(df["Método de Análise"].astype(str))
+    u_codes, u_uniq = pd.factorize(df["Unidade de Medida"].astype(str))
+
+    a_norm = [_norm_text(x) for x in a_uniq]
+    m_norm = [_norm_text(x) for x in m_uniq]
+    u_norm = np.append(np.array([_norm_text(x) for x in u_uniq], dtype=object), "")
+
+    for i in range(len(compiled["nome"])):
+        mask = _distinct_mask(a_codes, a_norm, compiled["analito"][i])
+
+        if compiled["metodo"][i] is not None:
+            mask &= _distinct_mask(m_codes, m_norm, compiled["metodo"][i])
+
+        if compiled["unidade"][i] is not None:
+            mask &= (u_norm == compiled["unidade"][i])[u_codes]
+
+        rule_idx[mask & (rule_idx == -1)] = i
+
+    return rule_idx
+
+
+def evaluate_qc(df_raw, rules=None):
+    """
+    Avalia QC por tabela de regras, em uma única passada vetorizada.
+    rules: lista no formato de DEFAULT_QC_RULES, ou resultado de compile_qc_rules.
+    Retorna:
+        - tabela QC (uma linha por resultado avaliado)
+        - resumo por regra
+        - status por ID
+        - status do lote
+    """
+    if rules is None:
+        compiled = _default_compiled()
+    elif isinstance(rules, dict):
+        compiled = rules
+    else:
+        compiled = compile_qc_rules(rules)
+
+    rule_idx = match_qc_rules(df_raw, compiled)
+    sel = rule_idx >= 0
+
+    qc_df = df_raw.loc[sel]
+    ridx = rule_idx[sel]
+
+    if qc_df.empty:
+        return pd.DataFrame(), pd.DataFrame(), {}, "APROVADO"
+
+    rec, _ = parse_series(qc_df["Valor"], numeric_locale(df_raw))
+    rec = rec.to_numpy()
+
+    lo = compiled["min"][ridx]
+    hi = compiled["max"][ridx]
+
+    sem_dado = np.isnan(rec)
+    dentro = (rec >= lo) & (rec <= hi)
+
+    status = np.where(sem_dado, "Sem dado", np.where(dentro, "OK", "NÃO CONFORME"))
+
+    obs_ok = np.array(compiled["obs_ok"], dtype=object)[ridx]
+    obs_nc = np.array(compiled["obs_nc"], dtype=object)[ridx]
+    obs = np.where(sem_dado, "Valor de recuperação ausente ou inválido", np.where(dentro, obs_ok, obs_nc))
+
+    nomes = np.array(compiled["nome"], dtype=object)
+    faixas = np.array(compiled["faixa"], dtype=object)
+
+    amostra = qc_df["Nº Amostra"].to_numpy() if "Nº Amostra" in qc_df.columns else ""
+
+    out_df = pd.DataFrame({
+        "Id": qc_df["Id"].to_numpy(),
+        "Nº Amostra": amostra,
+        "Método de Análise": qc_df["Método de Análise"].to_numpy(),
+        "Análise": qc_df["Análise"].to_numpy(),
+        "Regra": nomes[ridx],
+        "Faixa (%)": faixas[ridx],
+        "Recuperação (%)": rec,
+        "Status": status,
+        "Observação": obs,
+    })
+
+    # Equipamento (quando o LIMS exporta), usado pelas cartas de controle
+    for col in ("Equipamento", "Instrumento"):
+        if col in qc_df.columns:
+            out_df.insert(2, col, qc_df[col].to_numpy())
+            break
+
+    is_nc = pd.Series(status == "NÃO CONFORME")
+
+    # Resumo por regra
+    resumo = (
+        pd.DataFrame({"Regra": out_df["Regra"], "NC": is_nc, "Sem dado": sem_dado})
+        .groupby("Regra", sort=False)
+        .agg(Linhas=("NC", "size"), **{"Não conformes": ("NC", "sum"), "Sem dado": ("Sem dado", "sum")})
+        .reset_index()
+    )
+    resumo["Status"] = np.where(resumo["Não conformes"] > 0, "REPROVADO", "APROVADO")
+
+    # Status por ID: qualquer NC reprova (independe da ordem das linhas)
+    id_nc = is_nc.groupby(out_df["Id"].to_numpy(), sort=False).any()
+    id_status = {idv: ("REPROVADO" if nc else "APROVADO") for idv, nc in id_nc.items()}
+
+    lote_status = "REPROVADO" if is_nc.any() else "APROVADO"
+
+    return out_df, resumo, id_status, lote_status
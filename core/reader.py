@@ -0,0 +1,118 @@
+# core/reader.py
+# Leitura de lotes (CSV/Excel/texto colado) compartilhada pela UI e pelo serviço de ingestão
+# - O cabeçalho é lido primeiro e validado contra os perfis de colunas (core/profiles.py)
+# - Só as colunas mapeadas são lidas (usecols no CSV, iteração read-only no Excel)
+#   e renomeadas para os nomes canônicos
+
+import csv
+import io
+from pathlib import Path
+
+import pandas as pd
+
+from .profiles import CANONICAL, COL_LQ, COL_VALOR, SchemaError, detect_profile
+
+
+# Separadores testados em CSV/texto, na ordem
+SEPS = ["\t", ";", ",", "|"]
+
+# Mínimo de colunas para considerar a leitura válida
+MIN_COLS = 4
+
+# Colunas lidas como texto: a convenção numérica é detectada sobre o texto original
+# (o pandas leria "1.500" como 1,5 antes da detecção — erro silencioso de 1000×)
+TEXT_COLS = [COL_VALOR, COL_LQ]
+
+
+def _sniff_header(text):
+    """(separador, cabeçalho) da primeira linha; None se nenhum separador serve."""
+    first = text.lstrip("\ufeff").split("\n", 1)[0].rstrip("\r")
+    for sep in SEPS:
+        header = next(csv.reader([first], delimiter=sep), [])
+        if len(header) >= MIN_COLS:
+            return sep, header
+    return None
+
+
+def _canonical(df, name, mapping):
+    """Renomeia para os nomes canônicos e guarda o perfil usado em df.attrs."""
+    df = df.rename(columns={src: canon for canon, src in mapping.items()})
+    df = df[[c for c in CANONICAL if c in mapping]]
+    df.attrs["perfil_colunas"] = name
+    return df
+
+
+def _read_csv_text(text, profile=None):
+    sniff = _sniff_header(text)
+    if sniff is None:
+        return None
+    sep, header = sniff
+
+    # Valida o esquema antes de interpretar qualquer linha de dados
+    name, mapping = detect_profile(header, profile=profile)
+    usecols = list(mapping.values())
+
+    dtype = {mapping[c]: str for c in TEXT_COLS if c in mapping}
+    df = pd.read_csv(io.StringIO(text.lstrip("\ufeff")), sep=sep, usecols=usecols, dtype=dtype)
+    return _canonical(df, name, mapping)
+
+
+def _read_excel(source, profile=None):
+    """Primeira planilha em modo read-only, materializando só as colunas mapeadas."""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(source, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        header = list(next(ws.iter_rows(max_row=1, values_only=True), ()))
+
+        name, mapping = detect_profile([h for h in header if h is not None], profile=profile)
+        pos = {h: i for i, h in reversed(list(enumerate(header)))}
+        idx = [pos[mapping[c]] for c in mapping]
+
+        # Células à direita da última coluna mapeada não são materializadas
+        cols = {c: [] for c in mapping}
+        for row in ws.iter_rows(min_row=2, max_col=max(idx) + 1, values_only=True):
+            if row is None or all(v is None for v in row):
+                continue
+            for c, i in zip(mapping, idx):
+                cols[c].append(row[i] if i < len(row) else None)
+    finally:
+        wb.close()
+
+    df = pd.DataFrame({mapping[c]: pd.Series(v, dtype=object) for c, v in cols.items()}).infer_objects()
+    return _canonical(df, name, mapping)
+
+
+def read_pasted(text, profile=None):
+    """
+    Interpreta uma tabela colada (TAB, ';', ',' ou '|'). Retorna None se falhar.
+    Levanta SchemaError se o cabeçalho não tiver as colunas obrigatórias
+    (ou se perfis_lims.json for inválido).
+    """
+    try:
+        return _read_csv_text(text, profile)
+    except SchemaError:
+        raise
+    except Exception:
+        return None
+
+
+def read_lot(source, name=None, profile=None):
+    """
+    Lê um lote de um caminho ou de um arquivo aberto (ex.: upload do Streamlit).
+    CSV: detecta o separador. Excel: primeira planilha via openpyxl (read-only).
+    profile: nome do perfil de colunas (padrão: detectado pelo cabeçalho).
+    Levanta SchemaError se faltarem colunas obrigatórias.
+    """
+    name = str(name or getattr(source, "name", source))
+
+    if name.lower().endswith(".csv"):
+        raw = Path(source).read_bytes() if isinstance(source, (str, Path)) else source.read()
+        text = raw.decode("utf-8-sig", errors="replace") if isinstance(raw, bytes) else raw
+        df = _read_csv_text(text, profile)
+        if df is None:
+            raise ValueError(f"Não foi possível interpretar o CSV '{name}'.")
+        return df
+
+    return _read_excel(source, profile)
@@ -0,0 +1,162 @@
+# core/replicates.py
+# Precisão de réplicas (%RSD) para duplicatas, triplicatas e grupos de n réplicas
+# - Grupos explícitos {grupo: [amostras]} ou detectados pelo "Nº Amostra"
+# - Média, DP e %RSD de cada (grupo, método, analito) em uma única passada agrupada
+# - Status considera valores censurados (<LQ) e tolerância configurável por analito
+
+import re
+
+import numpy as np
+import pandas as pd
+
+from .duplicates import SEVERITY_ORDER, prepare_numeric
+from .matrix import FRAC_OUTRO, analyte_base, analyte_fraction
+from .normalize import normalize_analito, strip_accents
+
+
+DEFAULT_RSD_TOL = 20.0
+
+# Marcadores de réplica no fim do "Nº Amostra"
+# (ex.: "32230-1 DUP", "32230-1-D", "32230-1 TRIP", "32230-1 R2", "32230-1 Réplica 3")
+# Marcadores curtos ("D", "R2", "Rep 2") só contam colados por hífen/espaço a um
+# código terminado em dígito ("Poço D" e "Poço R1" não são réplicas de "Poço")
+REPLICATE_MARKER = re.compile(
+    r"(?:[\s\-_/]*\(?\b(?:dup|dupl|duplicata|trip|triplicata|replica\s*\d*)\b\)?"
+    r"|(?<=\d)[\s\-_/]+\(?(?:d|r\d+|rep\s*\d*)\)?)\s*$",
+    re.IGNORECASE,
+)
+
+
+def detect_replicate_groups(df_raw):
+    """
+    Agrupa amostras pelo "Nº Amostra" sem o marcador de réplica.
+    Um grupo tem a amostra original (se presente) e todas as suas réplicas;
+    só grupos com ao menos 2 amostras são retornados.
+    Retorna {grupo: [amostras]} na ordem de aparição.
+    """
+    if "Nº Amostra" not in df_raw.columns:
+        return {}
+
+    amostras = list(dict.fromkeys(df_raw["Nº Amostra"].dropna().astype(str).str.strip()))
+
+    existentes = {strip_accents(a): a for a in amostras}
+
+    groups = {}
+    for a in amostras:
+        base = REPLICATE_MARKER.sub("", strip_accents(a)).strip() or strip_accents(a)
+        # O grupo leva o texto original da amostra base quando ela existe
+        groups.setdefault(existentes.get(base, base), []).append(a)
+
+    return {g: m for g, m in groups.items() if len(m) >= 2}
+
+
+def _tolerances(analitos, tolerance):
+    """
+    Tolerância (%RSD) por analito normalizado: número único ou {analito: tol}.
+    Uma chave sem fração ("Zinco") vale para todas as frações do analito
+    ("zinco dissolvido", "zinco total"); com fração, só para aquela fração.
+    """
+    if not isinstance(tolerance, dict):
+        return np.full(len(analitos), float(tolerance))
+
+    exact, by_base = {}, {}
+    for k, v in tolerance.items():
+        if k == "*":
+            continue
+        n = normalize_analito(k)
+        exact[n] = float(v)
+        if analyte_fraction(n) == FRAC_OUTRO:
+            by_base[analyte_base(n)] = float(v)
+
+    default = float(tolerance.get("*", DEFAULT_RSD_TOL))
+    return np.array([exact.get(a, by_base.get(analyte_base(a), default)) for a in analitos], dtype=float)
+
+
+def replicate_precision(df_raw, groups=None, tolerance=DEFAULT_RSD_TOL):
+    """
+    Precisão por (grupo, método, analito).
+    groups: {grupo: [amostras]}; None detecta pelo "Nº Amostra".
+    tolerance: %RSD máximo (número) ou {analito: %RSD, "*": padrão}.
+    Retorna tabela com n, n <LQ, média, DP, %RSD (mg/L), status e observação.
+    """
+    groups = detect_replicate_groups(df_raw) if groups is None else groups
+    cols = [
+        "Grupo", "Amostras", "Método de Análise", "Analito", "n", "n <LQ",
+        "Média (mg/L)", "DP (mg/L)", "%RSD", "Tolerância (%RSD)", "Status", "Observação",
+    ]
+    if not groups:
+        return pd.DataFrame(columns=cols)
+
+    sample_group = {str(a).strip(): g for g, members in groups.items() for a in members}
+
+    df = prepare_numeric(df_raw)
+    grupo = df["Nº Amostra"].astype(str).str.strip().map(sample_group)
+
+    # Unidades em % (recuperações de QC) não entram
+    sel = grupo.notna() & (df["Unidade de Medida"].astype(str).str.strip() != "%")
+    df = df.loc[sel]
+    if df.empty:
+        return pd.DataFrame(columns=cols)
+
+    val = df["Valor_mg_L"].to_numpy(dtype=float)
+    cens = df["Censurado"].to_numpy(dtype=bool) & ~np.isnan(val)
+    quant = ~cens & ~np.isnan(val)
+
+    work = pd.DataFrame({
+        "Grupo": grupo[sel].to_numpy(),
+        "Método de Análise": df["Método de Análise"].to_numpy(),
+        "Analito": df["Analito_norm"].to_numpy(),
+        "v": np.where(quant, val, np.nan),
+        "cens": cens,
+    })
+
+    agg = (
+        work.groupby(["Grupo", "Método de Análise", "Analito"], sort=False, dropna=False)
+        .agg(n=("v", "count"), n_cens=("cens", "sum"), media=("v", "mean"), dp=("v", "std"))
+        .reset_index()
+    )
+
+    n = agg["n"].to_numpy()
+    n_cens = agg["n_cens"].to_numpy()
+    media = agg["media"].to_numpy(dtype=float)
+    dp = agg["dp"].to_numpy(dtype=float)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rsd = np.where(media == 0, np.where(dp == 0, 0.0, np.nan), dp / np.abs(media) * 100.0)
+    rsd[n < 2] = np.nan
+
+    tol = _tolerances(agg["Analito"].to_numpy(), tolerance)
+
+    todos_cens = (n_cens > 0) & (n == 0)
+    parte_cens = (n_cens > 0) & (n > 0)
+    poucos = n < 2
+
+    status = np.select(
+        [todos_cens, parte_cens, poucos, rsd <= tol],
+        ["OK", "INCONCLUSIVO", "Sem dados", "Conforme"],
+        default="Não conforme",
+    )
+    obs = np.select(
+        [todos_cens, parte_cens, poucos],
+        ["Todas as réplicas <LQ", "Parte das réplicas <LQ", "Menos de 2 réplicas com valor"],
+        default="",
+    )
+
+    out = pd.DataFrame({
+        "Grupo": agg["Grupo"],
+        "Amostras": agg["Grupo"].map({g: ", ".join(map(str, m)) for g, m in groups.items()}),
+        "Método de Análise": agg["Método de Análise"],
+        "Analito": agg["Analito"],
+        "n": n,
+        "n <LQ": n_cens.astype(int),
+        "Média (mg/L)": media,
+        "DP (mg/L)": dp,
+        "%RSD": rsd,
+        "Tolerância (%RSD)": tol,
+        "Status": status,
+        "Observação": obs,
+    })
+
+    # Ordenação por severidade
+    out["__ord"] = pd.Categorical(out["Status"], categories=SEVERITY_ORDER, ordered=True)
+    return out.sort_values(["__ord", "Grupo", "Método de Análise", "Analito"]).drop(columns="__ord").reset_index(drop=True)
@@ -2,6 +2,7 @@
 # Conversão robusta de unidades ambientais (mg/L, µg/L, μg/L, ug/L)
 
 import unicodedata
+import numpy as np
 import pandas as pd
 
 
@@ -60,3 +61,20 @@ def is_supported_unit(unit: str) -> bool:
     """Retorna True se a unidade é reconhecida pelo sistema."""
     u = normalize_unit(unit)
     return u in ["mg/l", "ug/l", "ug", "µg/l", "μg/l"]
+
+
+
+def to_mg_per_L_series(values, units):
+    """
+    Versão em lote de to_mg_per_L (NaN para valores ausentes ou unidades não
+    suportadas). Cada unidade distinta é avaliada uma única vez.
+    """
+    codes, uniques = pd.factorize(pd.Series(units).reset_index(drop=True))
+    # Divisor por unidade (mesma aritmética de to_mg_per_L: valor / 1000)
+    div = np.full(len(uniques) + 1, np.nan)
+    for i, u in enumerate(uniques):
+        f = to_mg_per_L(1000.0, u)
+        if f is not None:
+            div[i] = 1000.0 / f
+    vals = pd.to_numeric(pd.Series(values).reset_index(drop=True), errors="coerce").to_numpy(dtype=float)
+    return vals / div[codes]
@@ -22,6 +22,36 @@ STATUS_ORDER = [
 ]
 
 
+# -----------------------------
+# Códigos inteiros de status (cubo agregado)
+# -----------------------------
+
+STATUS_CODES = {
+    name: i for i, name in enumerate(
+        list(dict.fromkeys(STATUS_ORDER + [
+            "POTENCIAL NÃO CONFORME",
+            "Sem par para comparação",
+            "Sem dados válidos",
+            "Sem dado",
+            "REPROVADO",
+            "Outro",
+        ]))
+    )
+}
+
+# Status que reprovam / pedem atenção (mesma regra do status por ID)
+STATUS_FAIL = {STATUS_CODES["NÃO CONFORME"], STATUS_CODES["Não conforme"], STATUS_CODES["REPROVADO"]}
+STATUS_WARN = {STATUS_CODES["POTENCIAL NÃO CONFORME"], STATUS_CODES["ATENÇÃO"]}
+
+
+def status_code(series):
+    """Converte uma coluna de status em códigos inteiros (desconhecidos -> "Outro")."""
+    codes, uniques = pd.factorize(series)
+    outro = STATUS_CODES["Outro"]
+    table = [STATUS_CODES.get(u, outro) for u in uniques] + [outro]
+    return pd.Series(table, dtype="int16").to_numpy()[codes]
+
+
 def sort_by_status(df, status_col="Status"):
     """
     Ordena um dataframe por severidade de status.
@@ -2,10 +2,9 @@
 # Ponto de entrada do aplicativo Streamlit
 
 import streamlit as st
-import json
 from ui.layout import render_header, render_footer
 from ui.pages import render_pages
-from pathlib import Path
+from ui.resources import CAT_PATH, load_catalog, warm_up
 
 
 # ---------------------------------------------------------
@@ -29,15 +28,12 @@ render_header()
 
 
 # ---------------------------------------------------------
-# Carrega catálogo de especificações
+# Carrega catálogo de especificações (compartilhado entre sessões)
 # ---------------------------------------------------------
 
-CAT_PATH = Path("catalogo_especificacoes.json")
-
 if CAT_PATH.exists():
     try:
-        with open(CAT_PATH, "r", encoding="utf-8") as f:
-            catalog = json.load(f)
+        catalog = load_catalog(CAT_PATH)
     except Exception as e:
         st.error(f"Erro ao carregar catálogo: {e}")
         catalog = {}
@@ -58,3 +54,10 @@ render_pages(catalog)
 # ---------------------------------------------------------
 
 render_footer()
+
+
+# ---------------------------------------------------------
+# Pré-aquecimento (módulos pesados e tabelas compiladas)
+# ---------------------------------------------------------
+
+warm_up(CAT_PATH)
@@ -0,0 +1,137 @@
+# scripts/bench_startup.py
+"""
+Benchmark de inicialização: tempo até a primeira renderização e memória por sessão.
+
+Uso:
+  python scripts/bench_startup.py                    # árvore atual
+  python scripts/bench_startup.py --tree /tmp/base   # outra checagem (ex.: git worktree da versão anterior)
+
+Cada medição roda em um processo novo (início a frio) usando o AppTest do Streamlit,
+sobre uma cópia temporária da árvore: o estado gravado pelo app (cartas de controle,
+cache de analitos) nunca toca a checagem medida.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Não copiados para a árvore temporária (histórico, estado e caches do app)
+_SKIP = shutil.ignore_patterns(".git", "estado", ".cache", "__pycache__", "*.pyc")
+
+
+def _rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def child(tree):
+    """Roda dentro do processo novo e imprime as medições em JSON."""
+    import tracemalloc
+
+    os.chdir(tree)
+    sys.path.insert(0, str(tree))
+
+    t0 = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    t_streamlit = time.perf_counter() - t0
+    rss_base = _rss_mb()
+
+    # Primeira sessão: primeira renderização a frio
+    at = AppTest.from_file(str(Path(tree) / "main.py"), default_timeout=60)
+    t0 = time.perf_counter()
+    at.run()
+    first_paint = time.perf_counter() - t0
+    rss_first = _rss_mb()
+    pandas_at_first_paint = "pandas" in sys.modules
+
+    # Espera tarefas de pré-aquecimento em segundo plano (se houver)
+    import threading
+    for t in threading.enumerate():
+        if t.name.startswith("operalab"):
+            t.join()
+    rss_warm = _rss_mb()
+
+    # Segunda sessão: custo incremental de uma sessão nova
+    tracemalloc.start()
+    at2 = AppTest.from_file(str(Path(tree) / "main.py"), default_timeout=60)
+    t0 = time.perf_counter()
+    at2.run()
+    second_paint = time.perf_counter() - t0
+    session_mem, _ = tracemalloc.get_traced_memory()
+
+    # Mesma sessão com o lote de exemplo carregado
+    at2.sidebar.text_area[0].input((Path(tree) / "sample_dados.csv").read_text(encoding="utf-8"))
+    at2.sidebar.button[0].click()
+    at2.run()
+    loaded_mem, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(json.dumps({
+        "import_streamlit_s": t_streamlit,
+        "first_paint_s": first_paint,
+        "second_session_paint_s": second_paint,
+        "rss_before_app_mb": rss_base,
+        "rss_after_first_paint_mb": rss_first,
+        "rss_after_warm_up_mb": rss_warm,
+        "session_mem_mb": session_mem / 2**20,
+        "session_with_lot_mem_mb": loaded_mem / 2**20,
+        "pandas_loaded_at_first_paint": pandas_at_first_paint,
+    }))
+
+
+def run(tree, runs):
+    results = []
+    for _ in range(runs):
+        # Cópia nova a cada execução: início a frio e nada gravado na árvore medida
+        with tempfile.TemporaryDirectory(prefix="operalab-bench-") as tmp:
+            copy = Path(tmp) / "app"
+            shutil.copytree(tree, copy, ignore=_SKIP)
+            out = subprocess.run(
+                [sys.executable, __file__, "--child", str(copy)],
+                capture_output=True, text=True, check=True,
+            )
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--tree", default=str(ROOT), help="diretório do app (padrão: esta árvore)")
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        child(args.child)
+        return
+
+    results = run(Path(args.tree).resolve(), args.runs)
+
+    print(f"Árvore: {args.tree}  ({args.runs} execuções a frio)")
+    for key in results[0]:
+        vals = [r[key] for r in results]
+        if isinstance(vals[0], bool):
+            print(f"  {key:32s} {vals[0]}")
+        else:
+            print(f"  {key:32s} mediana={statistics.median(vals):8.3f}  min={min(vals):8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,437 @@
+# service/ingest.py
+# Serviço de ingestão por pasta monitorada
+# - Varre periodicamente uma pasta onde o LIMS deposita exportações
+# - Aguarda o arquivo "assentar" (tamanho/mtime estáveis) antes de ler
+# - Deduplica por hash do conteúdo (re-envios são ignorados)
+# - Avalia com o pipeline do core em um pool limitado de workers
+# - Grava resultados, resumo por lote e métricas na pasta de saída
+#
+# Uso:
+#   python -m service.ingest --in /mnt/lims/export --out /mnt/lims/avaliados
+
+import argparse
+import hashlib
+import json
+import logging
+import math
+import queue
+import re
+import statistics
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+from core.reader import read_lot
+from core.lot import evaluate_lot
+from core.legislation import apply_legislation_multi
+from core.duplicates import compare_duplicates, detect_duplicate_pairs
+from core.cube import CUBE_COLS, merge_cubes, legislation_cube, duplicates_cube, lot_verdict
+from core.control_charts import load_chart_state, update_control_charts, chart_summary
+from core.normalize import strip_accents
+
+
+log = logging.getLogger("operalab.ingest")
+
+EXTENSIONS = {".csv", ".xlsx", ".xls"}
+
+SEEN_FILE = "_processados.json"
+STATUS_FILE = "status_lotes.csv"
+METRICS_FILE = "metricas.json"
+CUBE_FILE = "cubo_status.csv"
+CHART_FILE = "cartas_controle.json"
+
+# Tentativas de avaliação de um arquivo que falha (sem ser alterado) antes de desistir
+MAX_RETRIES = 3
+
+
+def file_hash(path, chunk=1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def evaluate_file(path, catalog=None, lote=""):
+    """
+    Pipeline completo para um arquivo.
+    Retorna (resultado_do_lote, legislações, duplicatas_automáticas, cubo).
+    """
+    df = read_lot(path)
+    res = evaluate_lot(df, lote=lote)
+    leg = apply_legislation_multi(df, catalog) if catalog else {}
+    dups = {(a, b): compare_duplicates(df, a, b) for a, b in detect_duplicate_pairs(df)}
+    cube = merge_cubes(res["cube"], legislation_cube(leg, lote), duplicates_cube(dups, lote))
+    return res, leg, dups, cube
+
+
+def spec_slug(spec) -> str:
+    """Nome de arquivo a partir da chave da especificação ("CONAMA 430 - ..." -> "CONAMA_430_...")."""
+    return re.sub(r"[^0-9A-Za-z]+", "_", strip_accents(spec)).strip("_") or "especificacao"
+
+
+def write_results(out_dir, res, leg, dups, cube, lote=""):
+    """Grava as tabelas de um lote em out_dir."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    res["dt"].to_csv(out_dir / "dissolvido_vs_total.csv", index=False)
+    if not res["qc"].empty:
+        res["qc"].to_csv(out_dir / "qc.csv", index=False)
+        res["qc_resumo"].to_csv(out_dir / "qc_resumo.csv", index=False)
+
+    for spec, (out_leg, _) in leg.items():
+        if not out_leg.empty:
+            # Cópia: a tabela do chamador não ganha a coluna
+            out_leg = out_leg.copy()
+            out_leg.insert(0, "Especificação", spec)
+            out_leg.to_csv(out_dir / f"legislacao_{spec_slug(spec)}.csv", index=False)
+
+    for i, ((a, b), dup_df) in enumerate(dups.items()):
+        dup_df.to_csv(out_dir / f"duplicatas_{i:02d}.csv", index=False)
+
+    cube.to_csv(out_dir / CUBE_FILE, index=False)
+
+    with open(out_dir / "status.json", "w", encoding="utf-8") as f:
+        json.dump({
+            "lote_status": lot_verdict(cube, lote),
+            "id_status": {str(k): v for k, v in res["id_status"].items()},
+        }, f, ensure_ascii=False, indent=2)
+
+
+class FolderIngestor:
+    """
+    Monitora in_dir e avalia cada arquivo novo/alterado uma única vez.
+    """
+
+    def __init__(self, in_dir, out_dir, catalog=None, workers=2, queue_size=32,
+                 interval=2.0, settle=3.0):
+        self.in_dir = Path(in_dir)
+        self.out_dir = Path(out_dir)
+        self.catalog = catalog or {}
+        self.interval = interval
+        self.settle = settle
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.workers = workers
+        self._threads = []
+        self._stop = threading.Event()
+        # _lock: estado em memória (varredura, workers, métricas), sem E/S de arquivo
+        # _io_lock: arquivos compartilhados da pasta de saída; quem precisa dos dois
+        # adquire _io_lock antes de _lock
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+
+        # path -> (tamanho, mtime, instante em que ficou estável)
+        self._pending = {}
+        # path -> (tamanho, mtime) já tratado (avaliado com sucesso, duplicado ou desistido)
+        self._handled = {}
+        # path -> (tamanho, mtime) na fila ou em avaliação
+        self._queued = {}
+        # path -> ((tamanho, mtime), falhas consecutivas dessa versão do arquivo)
+        self._failures = {}
+        # hashes já avaliados (persistido)
+        self._seen = self._load_seen()
+        self._inflight = set()
+
+        self._latencies = deque(maxlen=500)
+        self._done_times = deque(maxlen=1000)
+        self._counters = {"processados": 0, "falhas": 0, "duplicados_ignorados": 0}
+
+    # -----------------------------------------------------
+    # Estado persistente
+    # -----------------------------------------------------
+
+    def _load_seen(self):
+        p = self.out_dir / SEEN_FILE
+        if p.exists():
+            try:
+                return set(json.loads(p.read_text(encoding="utf-8")))
+            except Exception:
+                log.warning("Não foi possível ler %s; recomeçando.", p)
+        return set()
+
+    def _append_cube(self, cube):
+        """
+        Acrescenta as células do lote ao cubo global (uma partição por lote):
+        O(células do lote), sem reler nem regravar os lotes anteriores.
+        Cada conteúdo é avaliado uma única vez (hash), então o lote não se repete.
+        """
+        if cube is None or cube.empty:
+            return
+        p = self.out_dir / CUBE_FILE
+        new = not p.exists()
+        with open(p, "a", encoding="utf-8", newline="") as f:
+            cube[CUBE_COLS + ["n"]].to_csv(f, header=new, index=False)
+
+    def _save_seen(self):
+        """Grava os hashes avaliados (chamado com self._io_lock; o instantâneo é tirado aqui)."""
+        with self._lock:
+            seen = sorted(self._seen)
+        p = self.out_dir / SEEN_FILE
+        tmp = p.with_suffix(".tmp")
+        tmp.write_text(json.dumps(seen), encoding="utf-8")
+        tmp.replace(p)
+
+    # -----------------------------------------------------
+    # Varredura com debounce
+    # -----------------------------------------------------
+
+    def scan(self):
+        """Uma varredura: enfileira arquivos estáveis, novos ou alterados."""
+        now = time.monotonic()
+        present = set()
+
+        try:
+            entries = list(self.in_dir.iterdir())
+        except OSError as e:
+            log.warning("Pasta monitorada indisponível (%s): %s", self.in_dir, e)
+            return
+
+        for path in entries:
+            if not path.is_file() or path.suffix.lower() not in EXTENSIONS or path.name.startswith((".", "~$")):
+                continue
+            present.add(path)
+
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            sig = (st.st_size, st.st_mtime_ns)
+
+            with self._lock:
+                if self._handled.get(path) == sig or self._queued.get(path) == sig:
+                    continue
+
+            prev = self._pending.get(path)
+            if prev is None or prev[:2] != sig:
+                # Novo ou ainda sendo escrito: reinicia a contagem
+                self._pending[path] = (sig[0], sig[1], now)
+                continue
+
+            if now - prev[2] < self.settle:
+                continue
+
+            self._enqueue(path, sig, detected=prev[2])
+
+        # Esquece arquivos removidos
+        for path in list(self._pending):
+            if path not in present:
+                del self._pending[path]
+
+    def _enqueue(self, path, sig, detected):
+        try:
+            digest = file_hash(path)
+        except OSError:
+            return
+
+        with self._lock:
+            if digest in self._seen:
+                self._counters["duplicados_ignorados"] += 1
+                self._handled[path] = sig
+                self._pending.pop(path, None)
+                log.info("Ignorado (conteúdo já avaliado): %s", path.name)
+                return
+            if digest in self._inflight:
+                # Mesmo conteúdo em avaliação por outro arquivo: decide na próxima varredura
+                return
+
+            try:
+                self.queue.put_nowait((path, sig, digest, detected))
+            except queue.Full:
+                # Fila cheia: tenta de novo na próxima varredura
+                return
+
+            self._inflight.add(digest)
+            self._queued[path] = sig
+            self._pending.pop(path, None)
+
+    # -----------------------------------------------------
+    # Workers
+    # -----------------------------------------------------
+
+    def _worker(self):
+        while not self._stop.is_set():
+            try:
+                path, sig, digest, detected = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            try:
+                self._process(path, sig, digest, detected)
+            finally:
+                self.queue.task_done()
+
+    def _process(self, path, sig, digest, detected):
+        t0 = time.monotonic()
+        lote = f"{path.stem}_{digest[:8]}"
+        lot_dir = self.out_dir / lote
+        ok = True
+        erro = ""
+        cube = None
+
+        try:
+            res, leg, dups, cube = evaluate_file(path, self.catalog, lote=lote)
+            write_results(lot_dir, res, leg, dups, cube, lote)
+            # Mesmo veredito da interface: core.cube.lot_status sobre o cubo do lote
+            lote_status = lot_verdict(cube, lote)
+            n_ids = len(res["id_status"])
+            n_rep = sum(1 for v in res["id_status"].values() if v == "REPROVADO")
+        except Exception as e:
+            ok = False
+            erro = str(e).replace(";", ",").replace("\n", " ")
+            lote_status, n_ids, n_rep = "ERRO", 0, 0
+            log.exception("Falha ao avaliar %s", path.name)
+
+        done = time.monotonic()
+        latency = done - detected
+
+        # Estado em memória sob self._lock (sem E/S); arquivos depois, sob self._io_lock
+        with self._lock:
+            self._inflight.discard(digest)
+            self._queued.pop(path, None)
+            if ok:
+                # Só um arquivo avaliado com sucesso fica marcado como tratado
+                self._handled[path] = sig
+                self._failures.pop(path, None)
+                self._seen.add(digest)
+                self._counters["processados"] += 1
+            else:
+                self._counters["falhas"] += 1
+                n_fail = self._failures.get(path, (None, 0))
+                n_fail = n_fail[1] + 1 if n_fail[0] == sig else 1
+                self._failures[path] = (sig, n_fail)
+                if n_fail >= MAX_RETRIES:
+                    # Desiste até o arquivo ser alterado
+                    self._handled[path] = sig
+                    log.error("%s falhou %d vezes; aguardando nova versão do arquivo.", path.name, n_fail)
+            self._latencies.append(latency)
+            self._done_times.append(done)
+
+        with self._io_lock:
+            if ok:
+                self._save_seen()
+                self._append_cube(cube)
+                self._update_charts(lot_dir, res["qc"], lote)
+            self._append_status(path, digest, lote_status, n_ids, n_rep, done - t0, latency, erro)
+
+        log.info("%s: %s (%.2fs)", path.name, lote_status, latency)
+
+    def _update_charts(self, lot_dir, qc_df, lote):
+        """
+        Incorpora o QC do lote às cartas (chamado com self._io_lock).
+        update_control_charts relê e grava o estado sob trava de arquivo: a interface
+        pode incorporar lotes ao mesmo estado sem perder atualizações.
+        """
+        path = self.out_dir / CHART_FILE
+        try:
+            pts = update_control_charts(qc_df, lote, path=path)
+            if not pts.empty:
+                pts.to_csv(lot_dir / "cartas_controle.csv", index=False)
+                chart_summary(load_chart_state(path)).to_csv(self.out_dir / "cartas_resumo.csv", index=False)
+        except Exception:
+            log.exception("Falha ao atualizar cartas de controle (%s)", lote)
+
+    def _append_status(self, path, digest, lote_status, n_ids, n_rep, proc_s, latency, erro):
+        p = self.out_dir / STATUS_FILE
+        new = not p.exists()
+        with open(p, "a", encoding="utf-8") as f:
+            if new:
+                f.write("Arquivo;Hash;Status do Lote;IDs;IDs reprovados;Processamento (s);Latência (s);Erro\n")
+            f.write(f"{path.name};{digest[:12]};{lote_status};{n_ids};{n_rep};{proc_s:.3f};{latency:.3f};{erro}\n")
+
+    # -----------------------------------------------------
+    # Métricas
+    # -----------------------------------------------------
+
+    def metrics(self, window=60.0):
+        """Vazão (arquivos/min na janela), profundidade da fila e latência por arquivo."""
+        now = time.monotonic()
+        with self._lock:
+            recent = [t for t in self._done_times if now - t <= window]
+            lat = list(self._latencies)
+            counters = dict(self._counters)
+            em_andamento = len(self._inflight)
+
+        out = dict(counters)
+        out.update({
+            "fila": self.queue.qsize(),
+            "em_andamento": em_andamento,
+            "aguardando_assentar": len(self._pending),
+            "vazao_arquivos_min": len(recent) * 60.0 / window,
+            "latencia_ultima_s": lat[-1] if lat else None,
+            "latencia_p50_s": statistics.median(lat) if lat else None,
+            "latencia_p95_s": sorted(lat)[max(0, math.ceil(0.95 * len(lat)) - 1)] if lat else None,
+        })
+        return out
+
+    def write_metrics(self):
+        p = self.out_dir / METRICS_FILE
+        tmp = p.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.metrics(), ensure_ascii=False, indent=2), encoding="utf-8")
+        tmp.replace(p)
+
+    # -----------------------------------------------------
+    # Ciclo de vida
+    # -----------------------------------------------------
+
+    def start(self):
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            self.in_dir.mkdir(parents=True, exist_ok=True)
+        except OSError as e:
+            log.warning("Não foi possível criar a pasta monitorada %s: %s", self.in_dir, e)
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"operalab-ingest-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, drain=True):
+        if drain:
+            self.queue.join()
+        self._stop.set()
+        for t in self._threads:
+            t.join()
+        self.write_metrics()
+
+    def run_forever(self):
+        self.start()
+        log.info("Monitorando %s -> %s", self.in_dir, self.out_dir)
+        try:
+            while True:
+                self.scan()
+                self.write_metrics()
+                time.sleep(self.interval)
+        except KeyboardInterrupt:
+            log.info("Encerrando...")
+        finally:
+            self.stop()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Ingestão de exportações do LIMS por pasta monitorada")
+    ap.add_argument("--in", dest="in_dir", required=True, help="pasta monitorada")
+    ap.add_argument("--out", dest="out_dir", required=True, help="pasta de resultados")
+    ap.add_argument("--catalog", default="catalogo_especificacoes.json", help="catálogo de especificações")
+    ap.add_argument("--workers", type=int, default=2)
+    ap.add_argument("--queue-size", type=int, default=32)
+    ap.add_argument("--interval", type=float, default=2.0, help="intervalo entre varreduras (s)")
+    ap.add_argument("--settle", type=float, default=3.0, help="tempo sem alterações para considerar o arquivo completo (s)")
+    args = ap.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    catalog = {}
+    if Path(args.catalog).exists():
+        with open(args.catalog, "r", encoding="utf-8") as f:
+            catalog = json.load(f)
+
+    FolderIngestor(
+        args.in_dir, args.out_dir, catalog,
+        workers=args.workers, queue_size=args.queue_size,
+        interval=args.interval, settle=args.settle,
+    ).run_forever()
+
+
+if __name__ == "__main__":
+    main()
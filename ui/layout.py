@@ -2,18 +2,17 @@
 # Layout visual do aplicativo (header, footer, barras, etc.)
 
 import streamlit as st
-from pathlib import Path
+from ui.resources import logo_bytes
 
 
 def render_header():
     """Renderiza o cabeçalho com logo, título e barra azul."""
-    LOGO_PATH = Path("assets/operalab_logo.png")
-
     cols = st.columns([0.9, 6])
 
     with cols[0]:
-        if LOGO_PATH.exists():
-            st.image(str(LOGO_PATH), width=160)
+        logo = logo_bytes()
+        if logo is not None:
+            st.image(logo, width=160)
         else:
             st.caption("Logo não encontrado em: assets/operalab_logo.png")
 
@@ -2,30 +2,17 @@
 # Interface principal: abas, carregamento de dados e integração com os módulos do core
 
 import streamlit as st
-import pandas as pd
-import io
 
-from core.dissolved_total import compare_dissolved_total
-from core.qc import evaluate_qc_itrio
-from core.duplicates import compare_duplicates
-from core.legislation import apply_legislation
-from ui.style import style_status
+# pandas, openpyxl, core e estilos são importados sob demanda (só quando há
+# dados), para que a primeira renderização da sessão não pague esse custo.
 
 
-# ---------------------------------------------------------
-# Função auxiliar para ler texto colado
-# ---------------------------------------------------------
-
-def try_read_pasted(text):
-    seps = ["\t", ";", ",", "|"]
-    for sep in seps:
-        try:
-            df = pd.read_csv(io.StringIO(text), sep=sep)
-            if len(df.columns) >= 4:
-                return df
-        except:
-            pass
-    return None
+ABAS = [
+    "Avaliar Lote",
+    "Legislação / Especificação",
+    "Duplicatas",
+    "Relatórios"
+]
 
 
 # ---------------------------------------------------------
@@ -35,183 +22,503 @@ def try_read_pasted(text):
 def render_pages(catalog):
     st.sidebar.header("Entrada de dados")
 
-    file = st.sidebar.file_uploader("Enviar arquivo (Excel/CSV)", type=["xlsx", "xls", "csv"])
+    files = st.sidebar.file_uploader(
+        "Enviar arquivos (Excel/CSV)", type=["xlsx", "xls", "csv"], accept_multiple_files=True
+    )
+
+    # Cada arquivo novo começa a ser lido e avaliado assim que chega
+    if files or st.session_state.get("uploads"):
+        sync_uploads(files or [], catalog)
 
     pasted = st.sidebar.text_area("Ou cole a tabela aqui", height=150)
-    btn_load = st.sidebar.button("Carregar dados")
+    btn_load = st.sidebar.button("Carregar dados colados")
 
-    df_in = None
+    if btn_load and pasted.strip():
+        from core.reader import read_pasted
+        from ui import scheduler
 
-    if btn_load:
-        if file is not None:
+        lot = scheduler.upload_key(pasted.encode("utf-8"))
+        df_new = scheduler.get_lot(lot)
+        if df_new is None:
+            from core.profiles import SchemaError
             try:
-                if file.name.lower().endswith(".csv"):
-                    df_in = pd.read_csv(file)
-                else:
-                    df_in = pd.read_excel(file, sheet_name=0, engine="openpyxl")
-            except Exception as e:
-                st.error(f"Erro ao ler arquivo: {e}")
-
-        elif pasted.strip():
-            df_in = try_read_pasted(pasted)
-            if df_in is None:
-                st.error("Não consegui interpretar o texto colado. Tente usar separador ';' ou TAB.")
+                df_new = read_pasted(pasted)
+                if df_new is None:
+                    st.error("Não consegui interpretar o texto colado. Tente usar separador ';' ou TAB.")
+            except SchemaError as e:
+                st.error(str(e))
 
-    # ---------------------------------------------------------
-    # Abas
-    # ---------------------------------------------------------
+        if df_new is not None:
+            # Convenção numérica do arquivo (decidida uma vez, antes das avaliações)
+            from core.parsing import numeric_locale
+            numeric_locale(df_new)
 
-    aba1, aba2, aba3, aba4 = st.tabs([
-        "Avaliar Lote",
-        "Legislação / Especificação",
-        "Duplicatas",
-        "Relatórios"
-    ])
+            old = st.session_state.get("lot_key")
+            if old and old != lot and old not in _upload_lots():
+                scheduler.release_lot(old)
 
-    # ---------------------------------------------------------
-    # ABA 1 — Dissolvido vs Total + QC Ítrio
-    # ---------------------------------------------------------
+            # O lote fica no armazenamento compartilhado; a sessão guarda só a chave
+            scheduler.put_lot(lot, df_new)
+            st.session_state["lot_key"] = lot
+
+            # Pré-processa as avaliações de todas as abas em segundo plano
+            scheduler.prefetch(lot, df_new, catalog)
+
+    if st.session_state.get("uploads"):
+        render_uploads(catalog)
+
+    lot = st.session_state.get("lot_key")
+    df_in = None
 
-    with aba1:
-        st.subheader("Avaliação: Dissolvidos vs Totais + QC Ítrio")
+    if lot is not None and _reading(lot):
+        # O painel de envios (fragmento) atualiza a página quando a leitura terminar
+        st.sidebar.info(f"Lendo {_reading(lot)}…")
+        lot = None
+    elif lot is not None:
+        from ui import scheduler
 
+        df_in = scheduler.get_lot(lot)
         if df_in is None:
-            st.info("Carregue dados no menu lateral.")
+            st.sidebar.warning("O lote foi descartado da memória do servidor. Carregue os dados novamente.")
+            st.session_state.pop("lot_key", None)
+            lot = None
         else:
-            st.dataframe(df_in.head(20), use_container_width=True)
-
-            if st.button("Rodar Avaliação do Lote", type="primary"):
-                # Dissolvido vs Total
-                out_dt, lote_status, id_status, df_num = compare_dissolved_total(df_in)
-
-                # QC Ítrio
-                qc_df, qc_id_status, qc_has_nc = evaluate_qc_itrio(df_num)
-
-                # Integra status QC com status D/T
-                for k, v in qc_id_status.items():
-                    if v == "REPROVADO":
-                        id_status[k] = "REPROVADO"
-
-                # Status final do lote
-                if any(v == "REPROVADO" for v in id_status.values()):
-                    lote_status = "REPROVADO"
-
-                # Exibe status do lote
-                if lote_status == "APROVADO":
-                    st.success(f"Status do Lote: {lote_status}")
-                elif lote_status == "REPROVADO":
-                    st.error(f"Status do Lote: {lote_status}")
-                else:
-                    st.warning(f"Status do Lote: {lote_status}")
-
-                # Status por ID
-                st.markdown("### Status por ID")
-                for idv, stid in id_status.items():
-                    st.write(f"• ID {idv}: {stid}")
-
-                st.divider()
-
-                # Tabela Dissolvido vs Total
-                st.subheader("Comparação Dissolvido vs Total")
-                st.dataframe(style_status(out_dt), use_container_width=True)
-
-                # QC Ítrio
-                st.subheader("QC Ítrio (70–130%)")
-                if qc_df.empty:
-                    st.info("Nenhuma linha de Ítrio em % encontrada.")
-                else:
-                    st.dataframe(style_status(qc_df), use_container_width=True)
-
-                # Exportação
-                st.subheader("Exportar Resultados")
-                st.download_button(
-                    "Baixar Dissolvido vs Total (CSV)",
-                    out_dt.to_csv(index=False).encode("utf-8"),
-                    file_name="dissolvido_vs_total.csv",
-                    mime="text/csv"
-                )
-
-                if not qc_df.empty:
-                    st.download_button(
-                        "Baixar QC Ítrio (CSV)",
-                        qc_df.to_csv(index=False).encode("utf-8"),
-                        file_name="qc_itrio.csv",
-                        mime="text/csv"
-                    )
+            if df_in.attrs.get("perfil_colunas"):
+                st.sidebar.caption(f"Layout de colunas: {df_in.attrs['perfil_colunas']}")
+            render_locale(df_in.attrs.get("numeric_locale"))
+
+    render_memory_diagnostics()
 
     # ---------------------------------------------------------
-    # ABA 2 — Legislação / Especificação
+    # Abas (só a aba ativa é avaliada/renderizada)
     # ---------------------------------------------------------
 
-    with aba2:
-        st.subheader("Avaliação por Legislação / Especificação")
+    aba = st.radio("Aba", ABAS, horizontal=True, key="aba_ativa", label_visibility="collapsed")
 
-        if df_in is None:
-            st.info("Carregue dados no menu lateral.")
-        else:
-            spec_keys = list(catalog.keys())
+    if aba == ABAS[0]:
+        render_lote(df_in, lot, catalog)
+    elif aba == ABAS[1]:
+        render_legislacao(df_in, lot, catalog)
+    elif aba == ABAS[2]:
+        render_duplicatas(df_in, lot)
+    else:
+        render_relatorios()
 
-            filtro = st.text_input("Filtrar especificações por texto")
-            if filtro:
-                spec_keys = [k for k in spec_keys if filtro.lower() in k.lower()]
 
-            spec_key = st.selectbox("Selecione a especificação", spec_keys)
+# ---------------------------------------------------------
+# Vários arquivos: progresso, tabela consolidada e detalhamento
+# ---------------------------------------------------------
 
-            if st.button("Aplicar Especificação", type="primary"):
-                spec_dict = catalog.get(spec_key, {})
-                out_leg, resumo_leg = apply_legislation(df_in, spec_dict)
+def _upload_lots():
+    return {p["lot"] for p in st.session_state.get("uploads", {}).values()}
 
-                if out_leg.empty:
-                    st.info("Nenhum dado aplicável ou especificação sem limites.")
-                else:
-                    st.dataframe(style_status(out_leg), use_container_width=True)
 
-                    if not resumo_leg.empty:
-                        st.markdown("### Resumo por ID")
-                        st.dataframe(resumo_leg, use_container_width=True)
+def sync_uploads(files, catalog):
+    """Agenda os arquivos novos e libera os removidos do seletor."""
+    from ui import scheduler
 
-                    st.download_button(
-                        "Baixar Avaliação (CSV)",
-                        out_leg.to_csv(index=False).encode("utf-8"),
-                        file_name="avaliacao_legislacao.csv",
-                        mime="text/csv"
-                    )
+    uploads = st.session_state.setdefault("uploads", {})
+    current = {f.file_id: f for f in files}
 
-    # ---------------------------------------------------------
-    # ABA 3 — Duplicatas
-    # ---------------------------------------------------------
+    for fid, f in current.items():
+        if fid not in uploads:
+            uploads[fid] = scheduler.start_upload(f.name, f.getvalue(), catalog)
 
-    with aba3:
-        st.subheader("Comparação de Duplicatas (%RPD)")
+    for fid in [k for k in uploads if k not in current]:
+        lot = uploads.pop(fid)["lot"]
+        if lot not in _upload_lots():
+            scheduler.release_lot(lot)
+            if st.session_state.get("lot_key") == lot:
+                st.session_state.pop("lot_key", None)
 
-        if df_in is None:
-            st.info("Carregue dados no menu lateral.")
+    # Primeiro arquivo enviado vira o lote ativo
+    if uploads and st.session_state.get("lot_key") is None:
+        st.session_state["lot_key"] = next(iter(uploads.values()))["lot"]
+
+
+def _reading(lot):
+    """Nome do arquivo se o lote ainda estiver sendo lido (None caso contrário)."""
+    progress = next((p for p in st.session_state.get("uploads", {}).values() if p["lot"] == lot), None)
+    if progress is not None and progress["concluidas"] == 0 and not progress["erro"]:
+        return progress["arquivo"]
+    return None
+
+
+def render_uploads(catalog):
+    """Progresso por arquivo, status consolidado dos lotes e escolha do arquivo detalhado."""
+    uploads = st.session_state["uploads"]
+    prog = list(uploads.values())
+
+    ok = [p for p in prog if not p["erro"]]
+    if ok:
+        nomes = {p["lot"]: p["arquivo"] for p in ok}
+        lots = list(nomes)
+        atual = st.session_state.get("lot_key")
+        idx = lots.index(atual) if atual in lots else 0
+        st.sidebar.selectbox(
+            "Detalhar arquivo", lots, index=idx, format_func=lambda k: nomes[k], key="arquivo_detalhado",
+            on_change=lambda: st.session_state.update(lot_key=st.session_state["arquivo_detalhado"]),
+        )
+
+    pending = any(p["etapa"] not in ("Concluído", "Erro") for p in prog)
+    active = st.session_state.get("lot_key")
+    waiting = _reading(active) is not None
+
+    @st.fragment(run_every=1.0 if pending else None)
+    def _panel():
+        render_upload_status(catalog)
+        # Ao terminar a leitura do lote ativo ou o último arquivo, a página inteira é atualizada uma vez
+        if (waiting and _reading(active) is None) or (
+            pending and all(p["etapa"] in ("Concluído", "Erro") for p in uploads.values())
+        ):
+            st.rerun(scope="app")
+
+    _panel()
+
+
+def render_upload_status(catalog):
+    import pandas as pd
+    from ui import scheduler
+    from ui.style import style_status
+    from core.cube import merge_cubes, lot_verdict, id_status_table
+
+    uploads = st.session_state.get("uploads", {})
+    if not uploads:
+        return
+
+    st.subheader(f"Arquivos enviados ({len(uploads)})")
+
+    rows = []
+    cubes = []
+    for p in uploads.values():
+        cube = scheduler.upload_cube(p["lot"]) if p["etapa"] == "Concluído" else None
+        status = ""
+        n_ids = n_rep = None
+        if cube is not None:
+            cubes.append(cube)
+            status = lot_verdict(cube, scheduler.lot_label(p["lot"]))
+            ids = id_status_table(cube)
+            n_ids = len(ids)
+            n_rep = int((ids["Status final"] == "REPROVADO").sum()) if n_ids else 0
+        rows.append({
+            "Arquivo": p["arquivo"],
+            "Lote": scheduler.lot_label(p["lot"]),
+            "Linhas": p["linhas"],
+            "Etapa": p["etapa"],
+            "Progresso": p["concluidas"] / p["total"],
+            "Status": status or (p["erro"] or ""),
+            "IDs": n_ids,
+            "IDs reprovados": n_rep,
+        })
+
+    table = pd.DataFrame(rows)
+    st.dataframe(
+        style_status(table),
+        use_container_width=True,
+        column_config={"Progresso": st.column_config.ProgressColumn("Progresso", min_value=0.0, max_value=1.0)},
+    )
+
+    if len(cubes) > 1:
+        with st.expander("Status por ID (todos os arquivos)"):
+            st.dataframe(style_status(id_status_table(merge_cubes(*cubes)), "Status final"), use_container_width=True)
+
+
+def render_locale(loc):
+    """Mostra no menu lateral a convenção numérica detectada e seus diagnósticos."""
+    if not loc:
+        return
+
+    st.sidebar.caption(
+        f"Números: decimal '{loc['decimal']}', milhar '{loc['thousands']}' "
+        f"(confiança {loc['nivel']})"
+    )
+    for msg in loc["diagnosticos"]:
+        st.sidebar.warning(msg)
+
+
+def render_memory_diagnostics():
+    """Uso de memória do armazenamento compartilhado (todas as sessões)."""
+    from ui.store import get_store, session_id
+
+    store = get_store()
+    stats = store.stats()
+
+    with st.sidebar.expander("Diagnóstico de memória"):
+        total_mb = stats["total_bytes"] / 2**20
+        limite_mb = stats["limite_bytes"] / 2**20
+        st.progress(min(1.0, total_mb / limite_mb) if limite_mb else 0.0)
+        st.caption(
+            f"{total_mb:.1f} MB de {limite_mb:.0f} MB • {stats['itens']} itens • "
+            f"{stats['descartes']} descartes • {stats['sessoes']} sessões ativas"
+        )
+        st.caption(f"Esta sessão: {store.owner_bytes(session_id()) / 2**20:.1f} MB")
+        for kind, k in stats["por_tipo"].items():
+            st.caption(f"{kind}: {k['itens']} itens, {k['bytes'] / 2**20:.1f} MB")
+
+        if st.checkbox("Mostrar itens"):
+            st.dataframe(store.entries(), use_container_width=True)
+
+
+# ---------------------------------------------------------
+# ABA 1 — Dissolvido vs Total + QC
+# ---------------------------------------------------------
+
+def render_lote(df_in, lot, catalog):
+    st.subheader("Avaliação: Dissolvidos vs Totais + QC")
+
+    if df_in is None:
+        st.info("Carregue dados no menu lateral.")
+        return
+
+    from ui import scheduler
+    from ui.style import style_status
+
+    st.dataframe(df_in.head(20), use_container_width=True)
+
+    res = scheduler.lot_evaluation(lot, df_in)
+    out_dt = res["dt"]
+    qc_df = res["qc"]
+    qc_resumo = res["qc_resumo"]
+    # Mesmo veredito da tabela de arquivos enviados (D/T, QC e duplicatas, lido do cubo)
+    lote_status = scheduler.lot_status_verdict(lot, df_in, catalog)
+
+    # Exibe status do lote
+    if lote_status == "APROVADO":
+        st.success(f"Status do Lote: {lote_status}")
+    elif lote_status == "REPROVADO":
+        st.error(f"Status do Lote: {lote_status}")
+    else:
+        st.warning(f"Status do Lote: {lote_status}")
+
+    # Painel do lote (lido do cubo agregado, não das tabelas completas)
+    from core.cube import id_status_table, status_counts, filter_ids, PAIR_MODULES
+
+    # Legislação entra só para a especificação escolhida na aba de Legislação
+    spec = st.session_state.get("spec_ativa")
+    specs = (spec,) if spec in catalog else ()
+    cube = scheduler.status_cube(lot, df_in, catalog, specs)
+
+    st.markdown("### Status por ID")
+    st.caption(
+        f"Status final: Dissolvido vs Total, QC e {spec}." if specs else
+        "Status final: Dissolvido vs Total e QC. Escolha uma especificação na aba "
+        "Legislação para incluí-la."
+    )
+    st.dataframe(style_status(id_status_table(cube), "Status final"), use_container_width=True)
+
+    with st.expander("Resultados por módulo e filtros"):
+        st.dataframe(status_counts(cube), use_container_width=True)
+
+        modulos = sorted(set(cube["Modulo"].astype(str)) - set(PAIR_MODULES))
+        col1, col2 = st.columns(2)
+        with col1:
+            reprov = st.multiselect("Reprovado em", modulos)
+        with col2:
+            aprov = st.multiselect("Aprovado em", modulos)
+
+        if reprov or aprov:
+            ids = filter_ids(cube, failed=reprov, passed=aprov)
+            st.write(f"{len(ids)} ID(s) encontrados")
+            st.dataframe(ids, use_container_width=True)
+
+    with st.expander("Consistência entre analitos"):
+        cons = scheduler.cross_analyte_evaluation(lot, df_in)
+        nao_aplicadas = cons[cons["Status"] == "Não aplicada"]
+        cons = cons[cons["Status"] != "Não aplicada"]
+        if cons.empty:
+            st.info("Nenhuma regra aplicável aos analitos do lote.")
+        else:
+            st.dataframe(
+                cons.groupby(["Regra", "Status"]).size().unstack(fill_value=0).reset_index(),
+                use_container_width=True,
+            )
+            problemas = cons[cons["Status"] != "Conforme"]
+            if not problemas.empty:
+                st.dataframe(style_status(problemas), use_container_width=True)
+        if not nao_aplicadas.empty:
+            st.caption("Regras não aplicadas a nenhum Id do lote:")
+            st.dataframe(nao_aplicadas[["Regra", "Observação"]], use_container_width=True)
+
+    st.divider()
+
+    # Tabela Dissolvido vs Total
+    st.subheader("Comparação Dissolvido vs Total")
+    st.dataframe(style_status(out_dt), use_container_width=True)
+
+    # QC
+    st.subheader("QC (padrões internos, LCS e spikes)")
+    if qc_df.empty:
+        st.info("Nenhuma linha de QC em % encontrada.")
+    else:
+        st.dataframe(style_status(qc_resumo), use_container_width=True)
+        st.dataframe(style_status(qc_df), use_container_width=True)
+
+        # Cartas de controle: prévia até o usuário incorporar o lote ao histórico
+        st.markdown("### Cartas de controle (Westgard)")
+        aceito = scheduler.control_charts_accepted(lot)
+        if not aceito and st.button("Incorporar lote às cartas de controle"):
+            scheduler.accept_control_charts(lot, df_in)
+            aceito = True
+        pts = scheduler.control_chart_evaluation(lot, df_in)
+        if pts.empty:
+            st.info("Nenhuma recuperação válida para as cartas de controle.")
         else:
-            amostras = sorted(df_in["Nº Amostra"].dropna().astype(str).unique())
-
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                am1 = st.selectbox("Amostra 1", amostras)
-            with col2:
-                am2 = st.selectbox("Amostra 2", amostras)
-            with col3:
-                tol = st.number_input("Tolerância (%RPD)", min_value=0.0, max_value=100.0, value=20.0)
-
-            if st.button("Comparar Duplicatas"):
-                dup_df = compare_duplicates(df_in, am1, am2, tolerance_pct=tol)
+            st.caption(
+                "Lote incorporado às cartas de controle." if aceito else
+                "Prévia: pontos avaliados contra as cartas atuais, sem alterá-las."
+            )
+            st.dataframe(style_status(pts), use_container_width=True)
+
+    # Exportação
+    st.subheader("Exportar Resultados")
+    st.download_button(
+        "Baixar Dissolvido vs Total (CSV)",
+        out_dt.to_csv(index=False).encode("utf-8"),
+        file_name="dissolvido_vs_total.csv",
+        mime="text/csv"
+    )
+
+    if not qc_df.empty:
+        st.download_button(
+            "Baixar QC (CSV)",
+            qc_df.to_csv(index=False).encode("utf-8"),
+            file_name="qc.csv",
+            mime="text/csv"
+        )
+
+
+# ---------------------------------------------------------
+# ABA 2 — Legislação / Especificação
+# ---------------------------------------------------------
+
+def render_legislacao(df_in, lot, catalog):
+    st.subheader("Avaliação por Legislação / Especificação")
+
+    if df_in is None:
+        st.info("Carregue dados no menu lateral.")
+        return
+
+    spec_keys = list(catalog.keys())
+
+    filtro = st.text_input("Filtrar especificações por texto")
+    if filtro:
+        spec_keys = [k for k in spec_keys if filtro.lower() in k.lower()]
+
+    atual = st.session_state.get("spec_ativa")
+    spec_key = st.selectbox(
+        "Selecione a especificação", spec_keys,
+        index=spec_keys.index(atual) if atual in spec_keys else 0,
+    )
+
+    if spec_key is None:
+        return
+
+    # Especificação usada também no status por ID da aba "Avaliar Lote"
+    st.session_state["spec_ativa"] = spec_key
+
+    from ui import scheduler
+    from ui.style import style_status
+
+    # Todas as especificações já foram avaliadas em segundo plano
+    out_leg, resumo_leg = scheduler.legislation_evaluation(lot, df_in, catalog)[spec_key]
+
+    if out_leg.empty:
+        st.info("Nenhum dado aplicável ou especificação sem limites.")
+        return
+
+    st.dataframe(style_status(out_leg), use_container_width=True)
+
+    if not resumo_leg.empty:
+        st.markdown("### Resumo por ID")
+        st.dataframe(resumo_leg, use_container_width=True)
+
+    st.download_button(
+        "Baixar Avaliação (CSV)",
+        out_leg.to_csv(index=False).encode("utf-8"),
+        file_name="avaliacao_legislacao.csv",
+        mime="text/csv"
+    )
+
+
+# ---------------------------------------------------------
+# ABA 3 — Duplicatas
+# ---------------------------------------------------------
+
+def render_duplicatas(df_in, lot):
+    st.subheader("Comparação de Duplicatas (%RPD)")
+
+    if df_in is None:
+        st.info("Carregue dados no menu lateral.")
+        return
+
+    from ui import scheduler
+    from ui.style import style_status
+
+    # Pares detectados automaticamente (pré-processados)
+    auto = scheduler.auto_duplicates_evaluation(lot, df_in)
+    if auto:
+        st.markdown("### Pares detectados automaticamente")
+        for (a, b), dup_df in auto.items():
+            with st.expander(f"{a} × {b}"):
                 st.dataframe(style_status(dup_df), use_container_width=True)
 
-                st.download_button(
-                    "Baixar Duplicatas (CSV)",
-                    dup_df.to_csv(index=False).encode("utf-8"),
-                    file_name="duplicatas.csv",
-                    mime="text/csv"
-                )
+    # Grupos de réplicas (duplicatas, triplicatas, ...) em uma passada
+    with st.expander("Precisão de réplicas (%RSD)"):
+        tol_rsd = st.number_input("Tolerância (%RSD)", min_value=0.0, max_value=100.0, value=20.0, key="tol_rsd")
+        rep_df = scheduler.replicates_evaluation(lot, df_in, tol_rsd)
+        if rep_df.empty:
+            st.info("Nenhum grupo de réplicas detectado pelo Nº Amostra.")
+        else:
+            st.dataframe(style_status(rep_df), use_container_width=True)
 
-    # ---------------------------------------------------------
-    # ABA 4 — Relatórios (futuro)
-    # ---------------------------------------------------------
+    st.markdown("### Comparação manual")
+
+    if "Nº Amostra" not in df_in.columns:
+        st.info("O arquivo não tem a coluna Nº Amostra: a comparação manual não está disponível.")
+        return
+
+    amostras = sorted(df_in["Nº Amostra"].dropna().astype(str).unique())
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        am1 = st.selectbox("Amostra 1", amostras)
+    with col2:
+        am2 = st.selectbox("Amostra 2", amostras)
+    with col3:
+        tol = st.number_input("Tolerância (%RPD)", min_value=0.0, max_value=100.0, value=20.0)
+
+    if st.button("Comparar Duplicatas"):
+        dup_df = scheduler.duplicates_evaluation(lot, df_in, am1, am2, tolerance_pct=tol)
+        st.dataframe(style_status(dup_df), use_container_width=True)
+
+        st.download_button(
+            "Baixar Duplicatas (CSV)",
+            dup_df.to_csv(index=False).encode("utf-8"),
+            file_name="duplicatas.csv",
+            mime="text/csv"
+        )
+
+
+# ---------------------------------------------------------
+# ABA 4 — Relatórios
+# ---------------------------------------------------------
 
-    with aba4:
-        st.subheader("Relatórios")
-        st.info("Geração de PDF e relatórios consolidados será adicionada futuramente.")
+def render_relatorios():
+    st.subheader("Relatórios")
+
+    from ui import scheduler
+
+    st.markdown("### Cartas de controle do QC")
+    resumo = scheduler.control_chart_summary()
+    if resumo.empty:
+        st.info("Nenhum lote incorporado às cartas de controle ainda.")
+    else:
+        st.dataframe(resumo, use_container_width=True)
+        st.download_button(
+            "Baixar resumo das cartas (CSV)",
+            resumo.to_csv(index=False).encode("utf-8"),
+            file_name="cartas_resumo.csv",
+            mime="text/csv"
+        )
+
+    st.info("Geração de PDF e relatórios consolidados será adicionada futuramente.")
@@ -0,0 +1,68 @@
+# ui/resources.py
+# Recursos compartilhados por todas as sessões do processo
+# (carregados uma única vez e reaproveitados entre reruns e sessões)
+
+import json
+import threading
+from pathlib import Path
+
+import streamlit as st
+
+
+CAT_PATH = Path("catalogo_especificacoes.json")
+LOGO_PATH = Path("assets/operalab_logo.png")
+
+
+@st.cache_resource(show_spinner=False)
+def _load_catalog(path: str, mtime: float) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_catalog(path=CAT_PATH) -> dict:
+    """
+    Catálogo de especificações compartilhado (somente leitura).
+    É relido apenas se o arquivo mudar (mtime faz parte da chave).
+    """
+    path = Path(path)
+    return _load_catalog(str(path), path.stat().st_mtime)
+
+
+@st.cache_resource(show_spinner=False)
+def logo_bytes(path: str = str(LOGO_PATH)):
+    """Bytes do logo (None se o arquivo não existir)."""
+    p = Path(path)
+    return p.read_bytes() if p.exists() else None
+
+
+def _warm_tables(catalog):
+    # Importa o core (pandas/numpy) e compila as tabelas de normalização:
+    # regras de QC padrão e índices de analitos de cada especificação.
+    from core.qc import _default_compiled
+    from core.legislation import limits_index
+
+    _default_compiled()
+    for spec in catalog.values():
+        limits_index(spec.get("limits_mgL", {}))
+
+
+@st.cache_resource(show_spinner=False)
+def _start_warm_up(path: str, mtime: float):
+    t = threading.Thread(
+        target=_warm_tables,
+        args=(_load_catalog(path, mtime),),
+        name="operalab-warmup",
+        daemon=True
+    )
+    t.start()
+    return t
+
+
+def warm_up(path=CAT_PATH):
+    """
+    Prepara em segundo plano (uma vez por processo) os módulos pesados e as
+    tabelas compiladas, depois da primeira renderização.
+    """
+    path = Path(path)
+    if path.exists():
+        _start_warm_up(str(path), path.stat().st_mtime)
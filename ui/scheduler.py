@@ -0,0 +1,363 @@
+# ui/scheduler.py
+# Avaliação preguiçosa por aba + pré-processamento em segundo plano
+# - Cada avaliação é identificada por (lote, nome, parâmetros)
+# - Resultados (futures) ficam no armazenamento compartilhado (ui/store.py),
+#   com tamanho contabilizado e descarte LRU sob o teto global de memória
+# - Ao carregar um lote, as avaliações das outras abas são disparadas
+#   em um pool de threads compartilhado pelo processo
+# - Vários arquivos enviados de uma vez: leitura + avaliações completas de cada
+#   arquivo rodam em paralelo no mesmo pool, com progresso por arquivo
+
+import hashlib
+import io
+import json
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+
+from core.lot import evaluate_lot
+from core.legislation import apply_legislation_multi
+from core.duplicates import compare_duplicates, detect_duplicate_pairs
+from core.replicates import replicate_precision
+from core.cross_rules import cross_analyte_check
+from core.cube import merge_cubes, legislation_cube, duplicates_cube, lot_verdict
+from core.control_charts import update_control_charts, load_chart_state, chart_summary, is_incorporated
+from ui.store import get_store, session_id, KIND_LOTE, KIND_RESULTADO
+
+
+# Pool compartilhado por todas as sessões do processo
+_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="operalab-prefetch")
+
+
+def upload_key(data: bytes) -> str:
+    """Identificador do lote pelo conteúdo enviado (uploads idênticos compartilham o lote)."""
+    return hashlib.sha1(data).hexdigest()
+
+
+def get_lot(lot):
+    """Dataframe do lote no armazenamento compartilhado (None se descartado)."""
+    return get_store().get(("lote", lot), owner=session_id())
+
+
+def put_lot(lot, df):
+    """Guarda o lote enviado (uma cópia por conteúdo, compartilhada entre sessões)."""
+    store = get_store()
+    if store.get(("lote", lot), owner=session_id()) is None:
+        store.put(("lote", lot), df, kind=KIND_LOTE, owner=session_id())
+    return df
+
+
+def lot_label(lot) -> str:
+    """Rótulo curto do lote (células do cubo)."""
+    return lot[:8]
+
+
+def catalog_params(catalog):
+    """
+    Parâmetros de cache de avaliações que dependem do catálogo: as especificações
+    e um hash dos limites (editar um limite invalida os resultados anteriores).
+    """
+    digest = hashlib.sha1(json.dumps(catalog, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    return (digest.hexdigest()[:16],) + tuple(catalog.keys())
+
+
+def _task_key(lot, name, params):
+    return (lot, name, params)
+
+
+def _estimate(lot):
+    """Tamanho estimado de um resultado ainda em cálculo: o do próprio lote."""
+    return get_store().size_of(("lote", lot))
+
+
+def submit(lot, name, params, fn, *args, **kwargs):
+    """Agenda uma avaliação em segundo plano (se ainda não estiver no cache)."""
+    store = get_store()
+    key = _task_key(lot, name, params)
+    fut = store.get(key, owner=session_id())
+    if fut is None:
+        fut = store.put(
+            key, _EXECUTOR.submit(fn, *args, **kwargs),
+            kind=KIND_RESULTADO, owner=session_id(), estimate=_estimate(lot),
+        )
+    return fut
+
+
+def get_result(lot, name, params, fn, *args, **kwargs):
+    """
+    Retorna o resultado de uma avaliação.
+    Usa o resultado pré-processado se existir (aguardando se ainda estiver rodando);
+    caso contrário, calcula agora, na thread do script, e guarda no cache.
+    Se o pré-processamento for descartado (cancelado) pelo armazenamento, recalcula.
+    """
+    store = get_store()
+    key = _task_key(lot, name, params)
+    fut = store.get(key, owner=session_id())
+
+    if fut is not None:
+        try:
+            return fut.result()
+        except CancelledError:
+            pass
+
+    fut = Future()
+    try:
+        fut.set_result(fn(*args, **kwargs))
+    except Exception as e:
+        fut.set_exception(e)
+    store.put(key, fut, kind=KIND_RESULTADO, owner=session_id())
+
+    return fut.result()
+
+
+def release_lot(lot):
+    """A sessão deixa de usar o lote: suas entradas passam a ser as primeiras descartadas."""
+    get_store().release(session_id(), match=lambda k: isinstance(k, tuple) and lot in k[:2])
+
+
+# ---------------------------------------------------------
+# Avaliações de cada aba
+# ---------------------------------------------------------
+
+def _evaluate_lot(df, lote):
+    # A cópia numérica (df_num) não é usada pela UI: não fica retida no cache
+    res = evaluate_lot(df, lote=lote)
+    res.pop("df_num", None)
+    return res
+
+
+def lot_evaluation(lot, df):
+    return get_result(lot, "lote", (), _evaluate_lot, df, lot_label(lot))
+
+
+def legislation_evaluation(lot, df, catalog):
+    return get_result(lot, "legislacao", catalog_params(catalog), apply_legislation_multi, df, catalog)
+
+
+def duplicate_pairs(lot, df):
+    return get_result(lot, "pares_duplicata", (), detect_duplicate_pairs, df)
+
+
+def duplicates_evaluation(lot, df, sample1, sample2, tolerance_pct=20.0):
+    params = (str(sample1), str(sample2), float(tolerance_pct))
+    return get_result(lot, "duplicatas", params, compare_duplicates, df, sample1, sample2, tolerance_pct=tolerance_pct)
+
+
+def replicates_evaluation(lot, df, tolerance_pct=20.0):
+    return get_result(lot, "replicas", (float(tolerance_pct),), replicate_precision, df, tolerance=tolerance_pct)
+
+
+def cross_analyte_evaluation(lot, df):
+    return get_result(lot, "consistencia", (), cross_analyte_check, df)
+
+
+def _auto_duplicates(df):
+    return {
+        (a, b): compare_duplicates(df, a, b)
+        for a, b in detect_duplicate_pairs(df)
+    }
+
+
+def auto_duplicates_evaluation(lot, df):
+    return get_result(lot, "duplicatas_auto", (), _auto_duplicates, df)
+
+
+def control_chart_evaluation(lot, df):
+    """
+    Pontos do lote nas cartas de controle (regras de Westgard avaliadas).
+    Lote ainda não incorporado: prévia contra as cartas atuais, sem alterá-las.
+    Lote incorporado: a tabela guardada quando foi incorporado.
+    """
+    res = lot_evaluation(lot, df)
+    return update_control_charts(res["qc"], lot_label(lot), commit=False)
+
+
+def control_charts_accepted(lot) -> bool:
+    """True se o lote já foi incorporado às cartas de controle."""
+    return is_incorporated(lot_label(lot))
+
+
+def accept_control_charts(lot, df):
+    """Incorpora os pontos do lote ao histórico das cartas (ação explícita do usuário)."""
+    res = lot_evaluation(lot, df)
+    return update_control_charts(res["qc"], lot_label(lot))
+
+
+def control_chart_summary():
+    """Resumo de todas as cartas (média, DP e limites), lido do estado gravado."""
+    return chart_summary(load_chart_state())
+
+
+def _status_cube(res, leg, dups, label, specs=()):
+    return merge_cubes(res["cube"], legislation_cube(leg, label, specs=specs), duplicates_cube(dups, label))
+
+
+def status_cube(lot, df, catalog, specs=()):
+    """
+    Cubo agregado do lote: D/T + QC + duplicatas automáticas + as especificações
+    escolhidas (só as que se aplicam à amostra entram no status por Id).
+    """
+    specs = tuple(s for s in specs if s in catalog)
+    res = lot_evaluation(lot, df)
+    leg = legislation_evaluation(lot, df, catalog)
+    dups = auto_duplicates_evaluation(lot, df)
+    # Sem especificações o cubo não depende do catálogo (mesma chave do pipeline de upload)
+    params = (catalog_params(catalog)[0],) + specs if specs else ()
+    return get_result(lot, "cubo", params, _status_cube, res, leg, dups, lot_label(lot), specs)
+
+
+def lot_status_verdict(lot, df, catalog):
+    """
+    Status do lote: core.cube.lot_status sobre o cubo sem especificações
+    (mesma chave e mesmo veredito da tabela de arquivos enviados).
+    """
+    return lot_verdict(status_cube(lot, df, catalog), lot_label(lot))
+
+
+def prefetch(lot, df, catalog):
+    """
+    Dispara em segundo plano todas as avaliações do lote recém-carregado.
+    Só funções puras do core rodam nas threads (nenhuma chamada a st.*).
+    """
+    submit(lot, "lote", (), _evaluate_lot, df, lot_label(lot))
+    submit(lot, "legislacao", catalog_params(catalog), apply_legislation_multi, df, catalog)
+    submit(lot, "pares_duplicata", (), detect_duplicate_pairs, df)
+    submit(lot, "duplicatas_auto", (), _auto_duplicates, df)
+
+
+# ---------------------------------------------------------
+# Vários arquivos: pipeline completo por arquivo em segundo plano
+# ---------------------------------------------------------
+
+STAGE_LABELS = {
+    "leitura": "Leitura",
+    "lote": "Dissolvido vs Total + QC",
+    "legislacao": "Legislação",
+    "pares_duplicata": "Pares de duplicata",
+    "duplicatas_auto": "Duplicatas",
+    "cubo": "Consolidação",
+}
+
+
+def _stages(catalog):
+    return [
+        ("lote", ()), ("legislacao", catalog_params(catalog)),
+        ("pares_duplicata", ()), ("duplicatas_auto", ()), ("cubo", ()),
+    ]
+
+
+def start_upload(name, data, catalog):
+    """
+    Agenda a leitura e todas as avaliações de um arquivo enviado.
+    Os resultados são registrados no armazenamento com as mesmas chaves das abas
+    (que aguardam o que ainda estiver rodando). Retorna o registro de progresso,
+    atualizado pela thread de trabalho.
+    """
+    store, owner = get_store(), session_id()
+    lot = upload_key(data)
+    stages = _stages(catalog)
+
+    futs = {}
+    own = set()
+    for task, params in stages:
+        key = _task_key(lot, task, params)
+        fut = store.get(key, owner=owner)
+        if fut is None:
+            # Tamanho estimado até ficar pronto: o do arquivo enviado
+            fut = store.put(key, Future(), kind=KIND_RESULTADO, owner=owner, estimate=len(data))
+            own.add(task)
+        futs[task] = fut
+
+    progress = {
+        "arquivo": name,
+        "lot": lot,
+        "etapa": "Na fila",
+        "concluidas": 0,
+        "total": len(stages) + 1,
+        "linhas": None,
+        "erro": None,
+    }
+    _EXECUTOR.submit(_run_upload, store, owner, name, data, lot, catalog, futs, own, progress)
+    return progress
+
+
+def _run_upload(store, owner, name, data, lot, catalog, futs, own, progress):
+    """Executa na thread de trabalho (nenhuma chamada a st.*)."""
+    from core.reader import read_lot
+    from core.parsing import numeric_locale
+
+    try:
+        progress["etapa"] = STAGE_LABELS["leitura"]
+        df = store.get(("lote", lot), owner=owner)
+        if df is None:
+            df = read_lot(io.BytesIO(data), name=name)
+            numeric_locale(df)
+            store.put(("lote", lot), df, kind=KIND_LOTE, owner=owner)
+        progress["linhas"] = len(df)
+        progress["concluidas"] = 1
+
+        label = lot_label(lot)
+        results = {}
+        steps = {
+            "lote": lambda: _evaluate_lot(df, label),
+            "legislacao": lambda: apply_legislation_multi(df, catalog),
+            "pares_duplicata": lambda: detect_duplicate_pairs(df),
+            "duplicatas_auto": lambda: _auto_duplicates(df),
+            "cubo": lambda: _status_cube(results["lote"], results["legislacao"], results["duplicatas_auto"], label),
+        }
+
+        for task, fn in steps.items():
+            progress["etapa"] = STAGE_LABELS[task]
+            results[task] = _fulfil(futs[task], fn, task in own)
+            progress["concluidas"] += 1
+
+        progress["etapa"] = "Concluído"
+
+    except Exception as e:
+        progress["erro"] = f"{type(e).__name__}: {e}"
+        progress["etapa"] = "Erro"
+        # As abas não devem esperar para sempre por etapas que não vão rodar
+        for task in own:
+            fut = futs[task]
+            if not fut.done() and (fut.running() or fut.set_running_or_notify_cancel()):
+                fut.set_exception(e)
+
+
+def _fulfil(fut, fn, own):
+    """
+    Resultado de uma etapa.
+    - future deste pipeline: marcado como em execução, calculado e publicado nele;
+    - de outra sessão já em execução (ou pronto): aguardado, sem recalcular;
+    - de outra sessão ainda na fila, descartado ou com erro: calculado aqui
+      (aguardar quem ainda está na fila poderia ocupar todas as threads do pool).
+    """
+    if own:
+        # Future descartado pelo armazenamento (cancelado) só deixa de ser publicado
+        publish = fut.set_running_or_notify_cancel()
+        try:
+            value = fn()
+        except Exception as e:
+            if publish:
+                fut.set_exception(e)
+            raise
+        if publish:
+            fut.set_result(value)
+        return value
+
+    if fut.running() or fut.done():
+        try:
+            return fut.result()
+        except Exception:  # noqa: BLE001 - cancelado ou falhou na outra sessão: recalcula
+            pass
+    return fn()
+
+
+def peek(lot, name, params):
+    """Resultado de uma avaliação se já estiver pronto; None caso contrário (não bloqueia)."""
+    fut = get_store().get(_task_key(lot, name, params), owner=session_id())
+    if fut is None or not fut.done() or fut.cancelled() or fut.exception() is not None:
+        return None
+    return fut.result()
+
+
+def upload_cube(lot):
+    """Cubo de um arquivo enviado (sem especificações), se o pipeline já terminou."""
+    return peek(lot, "cubo", ())
@@ -0,0 +1,238 @@
+# ui/store.py
+# Armazenamento compartilhado (processo inteiro) dos objetos grandes das sessões
+# - Lotes enviados (deduplicados pelo hash do conteúdo) e resultados das avaliações
+# - Tamanho de cada objeto contabilizado (memory_usage(deep=True) dos DataFrames)
+# - Teto global de memória com descarte LRU: primeiro objetos sem sessão dona,
+#   depois resultados (recalculáveis), por último os lotes enviados
+# - Resultados ainda em cálculo (futures pendentes) entram com um tamanho estimado
+# - Sessões inativas (aba fechada) perdem a posse dos itens após OPERALAB_SESSION_TTL_S
+
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import streamlit as st
+
+
+# Teto global (MB); configurável pela variável de ambiente
+DEFAULT_LIMIT_MB = float(os.environ.get("OPERALAB_MEM_LIMIT_MB", "1024"))
+
+# Sessão sem nenhum acesso há mais que isso (s) deixa de ser dona dos itens
+DEFAULT_SESSION_TTL_S = float(os.environ.get("OPERALAB_SESSION_TTL_S", "1800"))
+
+KIND_LOTE = "lote"
+KIND_RESULTADO = "resultado"
+
+# Ordem de descarte (menor sai primeiro)
+_KIND_PRIORITY = {KIND_RESULTADO: 0, KIND_LOTE: 1}
+
+
+def sizeof(obj, _seen=None) -> int:
+    """Tamanho aproximado (bytes) de DataFrames/Series e contêineres que os contêm."""
+    _seen = set() if _seen is None else _seen
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+
+    if isinstance(obj, Future):
+        if not obj.done() or obj.cancelled() or obj.exception() is not None:
+            return 0
+        return sizeof(obj.result(), _seen)
+
+    mem = getattr(obj, "memory_usage", None)
+    if callable(mem):
+        try:
+            total = mem(deep=True)
+            return int(total.sum()) if hasattr(total, "sum") else int(total)
+        except TypeError:
+            pass
+
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(sizeof(k, _seen) + sizeof(v, _seen) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return sys.getsizeof(obj) + sum(sizeof(v, _seen) for v in obj)
+    return sys.getsizeof(obj)
+
+
+class ResourceStore:
+    """Cache LRU com contabilidade de tamanho e teto global de memória."""
+
+    def __init__(self, limit_mb=DEFAULT_LIMIT_MB, session_ttl=DEFAULT_SESSION_TTL_S):
+        self.limit = int(limit_mb * 2**20)
+        self.session_ttl = session_ttl
+        self._lock = threading.RLock()
+        # chave -> {"value", "kind", "size", "owners", "last"}
+        self._items = OrderedDict()
+        # dona (sessão) -> último acesso
+        self._last_seen = {}
+        self.total = 0
+        self.evictions = 0
+
+    # -----------------------------------------------------
+
+    def put(self, key, value, kind=KIND_RESULTADO, owner=None, estimate=None):
+        """
+        Guarda value sob key. Um Future pendente é contabilizado com `estimate`
+        bytes (padrão: tamanho médio dos itens prontos do mesmo tipo) até o
+        resultado ficar pronto, e pode ser descartado (cancelado) como os demais;
+        quem o aguardava recebe CancelledError e recalcula.
+        """
+        pending = isinstance(value, Future) and not value.done()
+        with self._lock:
+            self._touch(owner)
+            if key in self._items:
+                self._drop(key)
+            entry = {"value": value, "kind": kind, "size": 0, "owners": set(), "last": time.time()}
+            if owner is not None:
+                entry["owners"].add(owner)
+            self._items[key] = entry
+            if pending:
+                entry["size"] = int(self._mean_size(kind) if estimate is None else estimate)
+                self.total += entry["size"]
+                self._evict(protect=key)
+
+        if isinstance(value, Future):
+            # Contabiliza o tamanho real quando o resultado ficar pronto
+            value.add_done_callback(lambda _f, k=key: self._account(k))
+        else:
+            self._account(key)
+        return value
+
+    def get(self, key, owner=None):
+        with self._lock:
+            self._touch(owner)
+            entry = self._items.get(key)
+            if entry is None:
+                return None
+            entry["last"] = time.time()
+            if owner is not None:
+                entry["owners"].add(owner)
+            self._items.move_to_end(key)
+            return entry["value"]
+
+    def release(self, owner, match=None):
+        """Remove `owner` das entradas (opcionalmente só das que satisfazem match(chave))."""
+        with self._lock:
+            for key, entry in self._items.items():
+                if match is None or match(key):
+                    entry["owners"].discard(owner)
+
+    def _touch(self, owner):
+        if owner is not None:
+            self._last_seen[owner] = time.time()
+
+    def _expire_owners(self):
+        """Sessões sem acesso há mais de session_ttl deixam de ser donas (chamado com o lock)."""
+        now = time.time()
+        dead = {o for o, t in self._last_seen.items() if now - t > self.session_ttl}
+        if not dead:
+            return
+        for entry in self._items.values():
+            entry["owners"] -= dead
+        for o in dead:
+            del self._last_seen[o]
+
+    def size_of(self, key) -> int:
+        """Tamanho contabilizado de uma entrada (0 se ausente)."""
+        with self._lock:
+            entry = self._items.get(key)
+            return entry["size"] if entry is not None else 0
+
+    def _mean_size(self, kind):
+        sizes = [
+            e["size"] for e in self._items.values()
+            if e["kind"] == kind and not (isinstance(e["value"], Future) and not e["value"].done())
+        ]
+        return sum(sizes) / len(sizes) if sizes else 0
+
+    def _account(self, key):
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                return
+            size = sizeof(entry["value"])
+            self.total += size - entry["size"]
+            entry["size"] = size
+            self._evict(protect=key)
+
+    def _drop(self, key):
+        entry = self._items.pop(key)
+        self.total -= entry["size"]
+        if isinstance(entry["value"], Future):
+            entry["value"].cancel()
+
+    def _evict(self, protect=None):
+        if self.total <= self.limit:
+            return
+        # Itens de sessões encerradas contam como sem dona
+        self._expire_owners()
+        # Sem dona primeiro, depois por tipo, depois o menos usado recentemente
+        order = sorted(
+            (k for k in self._items if k != protect),
+            key=lambda k: (
+                bool(self._items[k]["owners"]),
+                _KIND_PRIORITY.get(self._items[k]["kind"], 0),
+                self._items[k]["last"],
+            ),
+        )
+        for k in order:
+            if self.total <= self.limit:
+                break
+            if self._items[k]["size"] == 0:
+                continue
+            self._drop(k)
+            self.evictions += 1
+
+    # -----------------------------------------------------
+    # Diagnóstico
+    # -----------------------------------------------------
+
+    def stats(self):
+        with self._lock:
+            self._expire_owners()
+            by_kind = {}
+            for e in self._items.values():
+                k = by_kind.setdefault(e["kind"], {"itens": 0, "bytes": 0})
+                k["itens"] += 1
+                k["bytes"] += e["size"]
+            return {
+                "total_bytes": self.total,
+                "limite_bytes": self.limit,
+                "itens": len(self._items),
+                "descartes": self.evictions,
+                "sessoes": len(self._last_seen),
+                "por_tipo": by_kind,
+            }
+
+    def entries(self):
+        """Lista das entradas (mais recentes por último) para a tela de diagnóstico."""
+        with self._lock:
+            return [
+                {
+                    "Chave": " / ".join(str(p)[:24] for p in (k if isinstance(k, tuple) else (k,))),
+                    "Tipo": e["kind"],
+                    "MB": e["size"] / 2**20,
+                    "Sessões": len(e["owners"]),
+                    "Último acesso": time.strftime("%H:%M:%S", time.localtime(e["last"])),
+                }
+                for k, e in self._items.items()
+            ]
+
+    def owner_bytes(self, owner):
+        with self._lock:
+            return sum(e["size"] for e in self._items.values() if owner in e["owners"])
+
+
+@st.cache_resource(show_spinner=False)
+def get_store() -> ResourceStore:
+    """Instância única do armazenamento para o processo."""
+    return ResourceStore()
+
+
+def session_id() -> str:
+    """Identificador estável da sessão atual."""
+    return st.session_state.setdefault("session_id", uuid.uuid4().hex)
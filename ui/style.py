@@ -1,7 +1,6 @@
 # ui/style.py
 # Estilos visuais para tabelas no Streamlit
 
-import pandas as pd
 from core.utils import STATUS_COLORS
 
 